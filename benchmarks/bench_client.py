@@ -0,0 +1,139 @@
+"""
+benchmarks.bench_client
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+End to end client benchmarks against local simulated boxes: status
+polling, service loading, picon resolution, EPG search and fleet fan-out.
+Reports throughput and latency percentiles for each.
+
+Run with: python -m benchmarks.bench_client [--services 10000] [--events 100000]
+          [--latency 0.005] [--error-rate 0.01] [--boxes 20]
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import argparse
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from enigma2.api import Enigma2Connection
+from enigma2.error import Enigma2Error
+from enigma2.fleet import Enigma2Fleet
+from enigma2.simulator import OpenWebIfSimulator, SimulatorFleet
+
+
+def percentile(samples, fraction):
+    """ Nearest rank percentile of sorted samples """
+    if not samples:
+        return 0.0
+    return samples[min(int(fraction * len(samples)), len(samples) - 1)]
+
+
+def measure(func, iterations, concurrency=1, boxes=()):
+    """
+    Call func iterations times from concurrency threads
+    :param boxes: the simulators func talks to, whose requests are counted
+    :return: (wall time, sorted latencies, failed calls, requests, failed requests)
+    """
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            func()
+        except Enigma2Error:
+            return time.perf_counter() - start, True
+        return time.perf_counter() - start, False
+
+    served = [(box.requests, box.errors) for box in boxes]
+    start = time.perf_counter()
+    if concurrency == 1:
+        results = [timed(i) for i in range(iterations)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(timed, range(iterations)))
+    wall = time.perf_counter() - start
+    requests = sum(box.requests - before for box, (before, _) in zip(boxes, served))
+    errors = sum(box.errors - before for box, (_, before) in zip(boxes, served))
+    return (wall, sorted(latency for latency, _ in results), sum(1 for _, failed in results if failed),
+            requests, errors)
+
+
+def report(name, iterations, result):
+    """ Print one line of results """
+    wall, latencies, failed, requests, errors = result
+    print('%-28s %7d %9.1f/s %9.2f %9.2f %9.2f %6d %8d %6d' % (
+        name, iterations, iterations / wall,
+        percentile(latencies, 0.5) * 1000, percentile(latencies, 0.95) * 1000,
+        percentile(latencies, 0.99) * 1000, failed, requests, errors))
+
+
+def main():
+    """ Run the benchmarks """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[4])
+    parser.add_argument('--services', type=int, default=10000)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to each response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests failing with 500')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--picons', type=int, default=2000, help='services to resolve picons for')
+    parser.add_argument('--boxes', type=int, default=20, help='boxes in the fleet fan-out')
+    args = parser.parse_args()
+    # Injected errors are counted, not logged
+    logging.getLogger('enigma2').setLevel(logging.CRITICAL)
+
+    box = OpenWebIfSimulator(num_services=args.services, num_events=args.events,
+                             latency=args.latency, error_rate=args.error_rate).start()
+    fleet_boxes = SimulatorFleet(args.boxes, latency=args.latency, error_rate=args.error_rate).start()
+    try:
+        device = Enigma2Connection(url=box.url, lazy=True)
+        print('%d services, %d events, %.1f ms latency, %.1f%% errors' % (
+            args.services, args.events, args.latency * 1000, args.error_rate * 100))
+        # 'failed' counts calls which raised, 'requests' and 'errors' what the box served
+        print('%-28s %7s %11s %9s %9s %9s %6s %8s %6s' % ('benchmark', 'calls', 'throughput', 'p50 ms',
+                                                          'p95 ms', 'p99 ms', 'failed', 'requests', 'errors'))
+
+        report('status poll', args.iterations,
+               measure(device.refresh_status_info, args.iterations, boxes=[box]))
+
+        # A client per thread, so concurrent polls aren't merged into one request
+        clients = threading.local()
+
+        def poll():
+            if not hasattr(clients, 'device'):
+                clients.device = Enigma2Connection(url=box.url, lazy=True)
+            clients.device.refresh_status_info()
+        report('status poll x8 threads', args.iterations,
+               measure(poll, args.iterations, concurrency=8, boxes=[box]))
+
+        loads = max(args.iterations // 50, 3)
+        report('load_services', loads, measure(device.load_services, loads, boxes=[box]))
+
+        services = list(device.load_services().items())[:args.picons]
+
+        def resolve():
+            device.picon_cache.clear()
+            device.resolve_picon_urls(services)
+        report('resolve_picon_urls x%d' % len(services), 3, measure(resolve, 3, boxes=[box]))
+
+        searches = max(args.iterations // 50, 3)
+        report('search_epg', searches,
+               measure(lambda: device.search_epg('Programme 1'), searches, boxes=[box]))
+
+        with Enigma2Fleet() as fleet:
+            for _ in fleet.connect(fleet_boxes.connection_kwargs(lazy=True)):
+                pass
+
+            def fan_out():
+                failed = [result.name for result in fleet.get_status_info() if result.error is not None]
+                if failed:
+                    raise Enigma2Error(message='%d boxes failed' % len(failed))
+            report('fleet status x%d boxes' % args.boxes, args.iterations // 10,
+                   measure(fan_out, args.iterations // 10, boxes=list(fleet_boxes.boxes.values())))
+    finally:
+        box.stop()
+        fleet_boxes.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+benchmarks.bench_picon_name
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Compares picon name normalisation against the original implementation.
+
+Run with: python -m benchmarks.bench_picon_name
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import json
+import os
+import re
+import timeit
+import unicodedata
+
+from enigma2.picon import get_picon_name, get_picon_names
+
+
+def legacy_picon_name(channel_name):
+    """ The original Enigma2Connection.get_picon_name """
+    channel_name = unicodedata.normalize('NFKD', channel_name) \
+        .encode('ASCII', 'ignore')
+    channel_name = channel_name.decode("utf-8")
+    exclude_chars = ['/', '\\', '\'', '"', '`', '?', ' ', '(', ')', ':',
+                     '<', '>', '|', '.', '\n']
+    channel_name = re.sub('[%s]' % ''.join(exclude_chars), '',
+                          channel_name)
+    channel_name = channel_name.replace('&', 'and')
+    channel_name = channel_name.replace('+', 'plus')
+    channel_name = channel_name.replace('*', 'star')
+    channel_name = channel_name.lower()
+
+    return channel_name
+
+
+def _channel_names():
+    path = os.path.join(os.path.dirname(__file__), '..', 'tests', 'getallservices.json')
+    with open(path) as json_file:
+        services = json.load(json_file)['services']
+    return [sub['servicename'] for bouquet in services for sub in bouquet['subservices']]
+
+
+def main():
+    """ Run the benchmark """
+    names = _channel_names()
+    assert [legacy_picon_name(name) for name in names] == get_picon_names(names)
+
+    number = 20
+    legacy = timeit.timeit(lambda: [legacy_picon_name(name) for name in names], number=number)
+    get_picon_name.cache_clear()
+    cold = timeit.timeit(lambda: (get_picon_name.cache_clear(), get_picon_names(names)), number=number)
+    warm = timeit.timeit(lambda: get_picon_names(names), number=number)
+
+    per_call = 1e6 / (len(names) * number)
+    print('%d names x %d runs' % (len(names), number))
+    print('legacy      %8.3f us/name' % (legacy * per_call))
+    print('cold cache  %8.3f us/name (%.1fx)' % (cold * per_call, legacy / cold))
+    print('memoised    %8.3f us/name (%.1fx)' % (warm * per_call, legacy / warm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+benchmarks.bench_startup
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Compares creating clients for a fleet with and without the start up probe.
+Boxes which have hung are simulated by a local socket which never answers.
+
+Run with: python -m benchmarks.bench_startup
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import socket
+import time
+
+from enigma2.api import Enigma2Connection
+from enigma2.error import Enigma2Error
+
+BOXES = 50
+TIMEOUT = 0.1
+
+
+def _create(port, lazy):
+    failed = 0
+    start = time.perf_counter()
+    for _ in range(BOXES):
+        try:
+            Enigma2Connection(host='127.0.0.1', port=port, timeout=TIMEOUT, lazy=lazy)
+        except Enigma2Error:
+            failed += 1
+    return time.perf_counter() - start, failed
+
+
+def main():
+    """ Run the benchmark """
+    hung = socket.socket()
+    hung.bind(('127.0.0.1', 0))
+    hung.listen(BOXES)
+    port = hung.getsockname()[1]
+
+    lazy, _ = _create(port, lazy=True)
+    eager, failed = _create(port, lazy=False)
+    hung.close()
+    print('%d clients, boxes hung, %.1fs timeout' % (BOXES, TIMEOUT))
+    print('eager  %10.3f ms total (%d probes failed)' % (eager * 1000, failed))
+    print('lazy   %10.3f ms total, %.1f us per client' % (lazy * 1000, lazy * 1e6 / BOXES))
+
+
+if __name__ == '__main__':
+    main()
@@ -8,13 +8,23 @@ Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
 Licensed under the MIT license.
 """
 
+import hashlib
+import json
 import logging
-import re
-import unicodedata
+import os
+import tempfile
+import threading
+import time
 
 from enum import Enum
-import requests
-from enigma2.error import Enigma2Error
+from enigma2.cache import CachedValue, LRUCache, SingleFlight
+from enigma2.diskcache import content_hash
+from enigma2.error import Enigma2Error, Enigma2TimerConflictError
+from enigma2.instrumentation import route
+from enigma2.jsonstream import iter_array_items
+from enigma2.picon import get_picon_name, picon_url_candidates
+from enigma2.timers import Timer, TimerIndex
+from enigma2.transport import TRANSPORTS, Transport
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -45,39 +55,166 @@ def build_url_base(host, port, is_https):
 
     return base
 
+def is_valid_service(service_ref, service_name):
+    """
+    Basic checks to remove rubbish channels (markers, placeholders etc.)
+    :return: True if the service is a real channel
+    """
+    return service_ref.endswith(':') and service_name not in ('<n/a>', '(...)')
+
+
+def iter_bouquet_services(bouquets, bouquet_name=None, matched=None):
+    """
+    Yield the distinct services of a <host>/api/getallservices response, in
+    a single pass
+
+    :param bouquets: iterable of the bouquets in the response's services array
+    :param bouquet_name: name of the bouquet to use. If None, or if there is
+    no such bouquet, all services are yielded
+    :param matched: optional list, appended to when a bouquet named
+    bouquet_name is found
+    :return: generator of (service reference, service name), in order
+    """
+    seen = set()
+    # Services of the bouquets before a match, yielded if there is no match
+    fallback = {} if bouquet_name is not None else None
+    for bouquet in bouquets:
+        if bouquet_name is not None and bouquet['servicename'] != bouquet_name:
+            if fallback is not None:
+                for e2service in bouquet['subservices']:
+                    service_ref = e2service['servicereference']
+                    if service_ref not in fallback and is_valid_service(service_ref, e2service['servicename']):
+                        fallback[service_ref] = e2service['servicename']
+            continue
+        if fallback is not None:
+            fallback = None
+            if matched is not None:
+                matched.append(bouquet_name)
+
+        for e2service in bouquet['subservices']:
+            service_ref = e2service['servicereference']
+            service_name = e2service['servicename']
+
+            # only add channel if we've not see it before
+            # and it's name/ref pass some basic checks to remove rubbish channels
+            if service_ref not in seen and is_valid_service(service_ref, service_name):
+                seen.add(service_ref)
+                yield service_ref, service_name
+
+    if fallback is not None:
+        _LOGGER.debug('Bouquet %s not found, using all services', bouquet_name)
+        for service in fallback.items():
+            yield service
+
+
+def filter_services(bouquets_json, bouquet_name=None):
+    """
+    Extract the services from a <host>/api/getallservices response
+    :param bouquets_json: decoded json response
+    :param bouquet_name: name of the bouquet to use. If None, or if there is
+    no such bouquet, all services are returned
+    :return: dict of service reference to service name
+    """
+    return dict(iter_bouquet_services(bouquets_json['services'], bouquet_name))
+
+
+def parse_about(response_json):
+    """
+    Extract the main details from a <host>/api/about response
+    :param response_json: decoded json response
+    :return: dict of webifver, imagedistro, brand, boxtype, uptime and the
+    number of tuners
+    """
+    return {
+        "webifver": response_json['info']['webifver'],
+        "imagedistro": response_json['info']['imagedistro'],
+        "brand": response_json['info']['brand'],
+        "boxtype": response_json['info']['boxtype'],
+        "uptime": response_json['info']['uptime'],
+        "tuners": len(response_json['info'].get('tuners', []))
+    }
+
+
 def enable_logging():
-    """ Setup the logging for home assistant. """
+    """
+    Setup the logging for home assistant. This is no longer done when a
+    connection is created, call it explicitly if it is wanted.
+    """
     logging.basicConfig(level=logging.INFO)
 
 
 class Enigma2Connection(object):
     """
     Create a new Connection to an Enigma.
+
+    The box is probed straight away unless lazy is True, in which case
+    nothing is sent until the first request or an explicit connect().
+
+    Requests are sent by a Transport ('requests', 'urllib3', a Transport
+    subclass or instance). Connections to the same host share one pool of
+    pool_size keep-alive connections.
+
+    A connection may be used from many threads at once. Identical concurrent
+    reads (status, about, EPG searches, service lists) are sent only once and
+    the result handed to every caller; commands are always sent.
     """
 
     def __init__(self, url=None, host=None, port=None,
                  username=None, password=None, is_https=False,
-                 timeout=5, verify_ssl=True, use_gzip=True):
-        enable_logging()
+                 timeout=5, verify_ssl=True, use_gzip=True, status_cache_ttl=0,
+                 picon_cache_size=1024, picon_hit_ttl=86400, picon_miss_ttl=600,
+                 lazy=False, transport='requests', pool_size=10, keepalive=True,
+                 retry_policy=None, circuit_breaker=None, instrumentation=None,
+                 disk_cache=None, warm_start=False, picon_store=None):
         _LOGGER.debug("Initialising new Enigma2 OpenWebIF client")
 
         if host is None and url is None:
             _LOGGER.error('Missing Enigma2 host!')
             raise Enigma2Error('Connection to Enigma2 failed - please supply connection details')
 
-        self._username = username
-        self._password = password
-        self._timeout = timeout
-        self._use_gzip = use_gzip
-        self._verify_ssl = verify_ssl
         self._in_standby = True
+        self._connected = False
+
+        # Status info is cached for status_cache_ttl seconds, and concurrent
+        # requests for it always share one in-flight request
+        self._status_cache = CachedValue(status_cache_ttl)
 
-        # Assign a new Requests Session
-        self._session = requests.Session()
+        # Optional resilience: retries for reads and fail fast for dead boxes
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
 
-        # Used to build a list of URLs which have been tested to exist
-        # (for picons)
-        self.cached_urls_which_exist = []
+        # Optional request and cache hooks, see enigma2.instrumentation
+        self.instrumentation = instrumentation
+
+        # Optional persistent cache of the service list and box info. With
+        # warm_start, cached values are returned at once and refreshed in
+        # the background.
+        self.disk_cache = disk_cache
+        self.warm_start = warm_start
+        self._refreshing = {}
+        self._refreshing_lock = threading.Lock()
+
+        # ServiceCatalog from the last refresh_catalog(), if any
+        self.catalog = None
+
+        # TimerIndex from load_timers(), kept up to date by the timer commands
+        self.timers = None
+        self._catalog_lock = threading.Lock()
+
+        # Collapses identical concurrent reads into one request
+        self._flight = SingleFlight()
+
+        # time.monotonic() of the last state changing command, if any
+        self.last_command_time = None
+
+        # Remembers which picon URLs exist (and which don't) so repeated
+        # lookups don't need another HEAD request
+        self.picon_cache = LRUCache(picon_cache_size)
+        self._picon_hit_ttl = picon_hit_ttl
+        self._picon_miss_ttl = picon_miss_ttl
+
+        # Optional PiconStore the picon images are downloaded into
+        self.picon_store = picon_store
 
         # Now build base url
         if not url:
@@ -85,9 +222,53 @@ class Enigma2Connection(object):
         else:
             self._base = url
 
+        if not isinstance(transport, Transport):
+            transport_class = TRANSPORTS.get(transport, transport)
+            transport = transport_class(self._base, username=username, password=password,
+                                        timeout=timeout, verify_ssl=verify_ssl, use_gzip=use_gzip,
+                                        keepalive=keepalive, pool_size=pool_size)
+        self._transport = transport
+
+        if not lazy:
+            self.connect()
+
+    @property
+    def circuit_state(self):
+        """
+        Returns the CircuitBreaker state ('closed', 'open' or 'half_open'),
+        always 'closed' if there is no circuit breaker
+        """
+        if self.circuit_breaker is None:
+            return 'closed'
+        return self.circuit_breaker.state
+
+    @property
+    def is_connected(self):
+        """
+        Returns True once a request to the box has succeeded
+        """
+        return self._connected
+
+    def connect(self):
+        """
+        Probe the device to test the connection
+        :return: json containing the result of <host>/api/statusinfo
+        """
         _LOGGER.debug("Going to probe device to test connection")
-        self.get_status_info()
+        status_info = self.refresh_status_info()
         _LOGGER.debug("Connected OK!")
+        return status_info
+
+    def check_health(self):
+        """
+        Probe the device without raising
+        :return: True if the box answered, else, False
+        """
+        try:
+            self.connect()
+            return True
+        except Enigma2Error:
+            return False
 
     def set_volume(self, new_volume):
         """
@@ -102,7 +283,7 @@ class Enigma2Connection(object):
             raise Enigma2Error('Volume must be between 0 and 100')
 
         cmd = '%s%s' % (COMMAND_VOL_SET, str(new_volume))
-        return self._check_response_result(URL_VOLUME, {COMMAND_VOL_SET: cmd})
+        return self._send_command(URL_VOLUME, {COMMAND_VOL_SET: cmd})
 
     def volume_up(self):
         """
@@ -111,7 +292,7 @@ class Enigma2Connection(object):
         """
         from enigma2.constants import (URL_VOLUME, COMMAND_VOL_SET, COMMAND_VOL_UP)
 
-        return self._check_response_result(URL_VOLUME, {COMMAND_VOL_SET: COMMAND_VOL_UP})
+        return self._send_command(URL_VOLUME, {COMMAND_VOL_SET: COMMAND_VOL_UP})
 
     def volume_down(self):
         """
@@ -120,7 +301,7 @@ class Enigma2Connection(object):
         """
         from enigma2.constants import (URL_VOLUME, COMMAND_VOL_SET, COMMAND_VOL_DOWN)
 
-        return self._check_response_result(URL_VOLUME, {COMMAND_VOL_SET: COMMAND_VOL_DOWN})
+        return self._send_command(URL_VOLUME, {COMMAND_VOL_SET: COMMAND_VOL_DOWN})
 
     def toggle_mute(self):
         """
@@ -128,7 +309,7 @@ class Enigma2Connection(object):
         """
         from enigma2.constants import (URL_VOLUME, COMMAND_VOL_SET, COMMAND_VOL_MUTE)
 
-        return self._check_response_result(URL_VOLUME, {COMMAND_VOL_SET: COMMAND_VOL_MUTE})
+        return self._send_command(URL_VOLUME, {COMMAND_VOL_SET: COMMAND_VOL_MUTE})
 
     def toggle_standby(self):
         """
@@ -136,7 +317,7 @@ class Enigma2Connection(object):
         """
         from enigma2.constants import (URL_TOGGLE_STANDBY, PARAM_NEWSTATE)
 
-        result = self._check_response_result(URL_TOGGLE_STANDBY, {PARAM_NEWSTATE: '0'})
+        result = self._send_command(URL_TOGGLE_STANDBY, {PARAM_NEWSTATE: '0'})
         # Update standby
         self.get_status_info()
         return result
@@ -148,8 +329,8 @@ class Enigma2Connection(object):
         from enigma2.constants import (URL_REMOTE_CONTROL,
                                        PARAM_COMMAND, COMMAND_RC_PLAY_PAUSE_TOGGLE)
 
-        result = self._check_response_result(URL_REMOTE_CONTROL,
-                                             {PARAM_COMMAND: COMMAND_RC_PLAY_PAUSE_TOGGLE})
+        result = self._send_command(URL_REMOTE_CONTROL,
+                                    {PARAM_COMMAND: COMMAND_RC_PLAY_PAUSE_TOGGLE})
         # Update info
         self.get_status_info()
         return result
@@ -161,8 +342,8 @@ class Enigma2Connection(object):
         from enigma2.constants import (URL_REMOTE_CONTROL,
                                        PARAM_COMMAND, COMMAND_RC_CHANNEL_UP)
 
-        return self._check_response_result(URL_REMOTE_CONTROL,
-                                           {PARAM_COMMAND: COMMAND_RC_CHANNEL_UP})
+        return self._send_command(URL_REMOTE_CONTROL,
+                                  {PARAM_COMMAND: COMMAND_RC_CHANNEL_UP})
 
     def channel_down(self):
         """
@@ -171,8 +352,8 @@ class Enigma2Connection(object):
         from enigma2.constants import (URL_REMOTE_CONTROL,
                                        PARAM_COMMAND, COMMAND_RC_CHANNEL_DOWN)
 
-        return self._check_response_result(URL_REMOTE_CONTROL,
-                                           {PARAM_COMMAND: COMMAND_RC_CHANNEL_DOWN})
+        return self._send_command(URL_REMOTE_CONTROL,
+                                  {PARAM_COMMAND: COMMAND_RC_CHANNEL_DOWN})
 
     def is_box_in_standby(self):
         """
@@ -187,30 +368,50 @@ class Enigma2Connection(object):
         """
         from enigma2.constants import URL_ABOUT
 
-        response = self._invoke_api(URL_ABOUT)
-        response_json = response.json()
-        output = {
-            "webifver": response_json['info']['webifver'],
-            "imagedistro": response_json['info']['imagedistro'],
-            "brand": response_json['info']['brand'],
-            "boxtype": response_json['info']['boxtype'],
-            "uptime": response_json['info']['uptime']
-        }
-        return output
+        if self.disk_cache is not None:
+            return self._cached('about', None, URL_ABOUT, parse_about)
+
+        return parse_about(self._read_api(URL_ABOUT).json())
 
     def refresh_status_info(self):
         """
-        Returns json containing the result of <host>/api/statusinfo
+        Returns json containing the result of <host>/api/statusinfo,
+        bypassing any cached value
         """
+        self.invalidate_status_info()
         return self.get_status_info()
 
+    def invalidate_status_info(self):
+        """
+        Drop the cached status info so the next request goes to the box
+        """
+        self._status_cache.invalidate()
+
     def get_status_info(self):
         """
-        Returns json containing the result of <host>/api/statusinfo
+        Returns json containing the result of <host>/api/statusinfo.
+        If a status_cache_ttl was supplied, a cached value may be returned.
+        """
+        if self.instrumentation is None:
+            return self._status_cache.get(self._fetch_status_info)
+
+        fetched = []
+
+        def fetch():
+            fetched.append(True)
+            return self._fetch_status_info()
+
+        status_info = self._status_cache.get(fetch)
+        self.instrumentation.on_cache('status', not fetched)
+        return status_info
+
+    def _fetch_status_info(self):
+        """
+        Fetch <host>/api/statusinfo from the box
         """
         from enigma2.constants import URL_STATUS_INFO
 
-        response = self._invoke_api(URL_STATUS_INFO)
+        response = self._read_api(URL_STATUS_INFO)
         response_json = response.json()
         self._in_standby = response_json['inStandby']
         return response_json
@@ -223,13 +424,298 @@ class Enigma2Connection(object):
         """
         from enigma2.constants import (URL_EPG_SEARCH, PARAM_SEARCH)
 
-        response = self._invoke_api(URL_EPG_SEARCH, {PARAM_SEARCH: program_name})
+        response = self._read_api(URL_EPG_SEARCH, {PARAM_SEARCH: program_name})
         response_json = response.json()
         if response_json['result']:
             return response_json['events']
 
         return []
 
+    def iter_epg(self, bouquet_ref=None, service_ref=None, start=None, end=None):
+        """
+        Stream the EPG events for a whole bouquet (<host>/api/epgmulti) or a
+        single service (<host>/api/epgservice)
+        :param bouquet_ref: reference of the bouquet
+        :param service_ref: reference of the service, used instead of bouquet_ref
+        :param start: only events from this unix timestamp
+        :param end: only events up to this unix timestamp
+        :return: generator of events, in the same shape as search_epg
+        """
+        from enigma2.constants import (URL_EPG_MULTI, URL_EPG_SERVICE, PARAM_BOUQUET_REF,
+                                       PARAM_SERVICE_REF, PARAM_TIME, PARAM_END_TIME)
+
+        if service_ref is not None:
+            url, params = URL_EPG_SERVICE, {PARAM_SERVICE_REF: service_ref}
+        elif bouquet_ref is not None:
+            url, params = URL_EPG_MULTI, {PARAM_BOUQUET_REF: bouquet_ref}
+        else:
+            raise Enigma2Error('Please supply a bouquet or service reference')
+
+        if start is not None:
+            params[PARAM_TIME] = int(start)
+        if end is not None:
+            params[PARAM_END_TIME] = int(end)
+
+        response = self._invoke_api(url, params, stream=True, idempotent=True)
+        try:
+            for event in iter_array_items(response.iter_content(chunk_size=65536), 'events'):
+                yield event
+        finally:
+            response.close()
+
+    def load_epg(self, bouquet_name=None, start=None, end=None):
+        """
+        Download the EPG once into a local EpgStore
+        :param bouquet_name: only services of this bouquet, else all bouquets
+        :param start: only events from this unix timestamp
+        :param end: only events up to this unix timestamp
+        :return: EpgStore
+        :raises Enigma2Error: if there is no bouquet called bouquet_name
+        """
+        from enigma2.epg import EpgStore
+
+        store = EpgStore()
+        store.load(self, bouquet_name, start, end)
+        return store
+
+    def get_recording_locations(self):
+        """
+        Returns the directories recordings are kept in, from <host>/api/getlocations
+        """
+        from enigma2.constants import URL_LOCATIONS
+
+        return self._read_api(URL_LOCATIONS).json().get('locations', [])
+
+    def iter_movie_list(self, location=None, etag=None, validators=None):
+        """
+        Stream the recordings in one directory from <host>/api/movielist
+        :param location: directory, else the box's default
+        :param etag: ETag from an earlier listing; if the box answers 304
+        nothing is yielded
+        :param validators: optional dict, filled once the listing has been
+        read with 'etag', 'hash' (sha256 of the body) and 'not_modified'
+        :return: generator of movie dicts as OpenWebIf sends them
+        """
+        from enigma2.constants import URL_MOVIE_LIST, PARAM_DIRNAME
+
+        validators = {} if validators is None else validators
+        params = {PARAM_DIRNAME: location} if location is not None else None
+        headers = {'If-None-Match': etag} if etag else None
+        response = self._invoke_api(URL_MOVIE_LIST, params, stream=True, idempotent=True, headers=headers)
+        try:
+            validators['not_modified'] = response.status_code == 304
+            validators['etag'] = response.headers.get('ETag')
+            if validators['not_modified']:
+                return
+
+            digest = hashlib.sha256()
+
+            def chunks():
+                for chunk in response.iter_content(chunk_size=65536):
+                    digest.update(chunk)
+                    yield chunk
+
+            for movie_json in iter_array_items(chunks(), 'movies'):
+                yield movie_json
+            validators['hash'] = digest.hexdigest()
+        finally:
+            response.close()
+
+    def iter_recordings(self, locations=None):
+        """
+        Stream the recordings, one location at a time
+        :param locations: directories to list, by default every recording location
+        :return: generator of Recording
+        """
+        from enigma2.recordings import recording_from_json
+
+        for location in self.get_recording_locations() if locations is None else locations:
+            for movie_json in self.iter_movie_list(location):
+                yield recording_from_json(movie_json, location)
+
+    def load_recordings(self, locations=None):
+        """
+        Scan the recordings into a local RecordingIndex. Call its scan()
+        method later to pick up changes.
+        :param locations: directories to scan, by default every recording location
+        :return: RecordingIndex
+        """
+        from enigma2.recordings import RecordingIndex
+
+        index = RecordingIndex()
+        index.scan(self, locations)
+        return index
+
+    def get_timers(self):
+        """
+        Returns the timers from <host>/api/timerlist
+        :return: list of Timer
+        """
+        from enigma2.constants import URL_TIMER_LIST
+
+        response_json = self._read_api(URL_TIMER_LIST).json()
+        return [Timer.from_json(timer_json) for timer_json in response_json.get('timers', [])]
+
+    def load_timers(self, tuners=None):
+        """
+        Fetch the timers into a local TimerIndex, which add_timer, delete_timer
+        and toggle_timer then keep up to date and check conflicts against
+        :param tuners: number of tuners, taken from get_about() if None
+        :return: TimerIndex
+        """
+        if tuners is None:
+            tuners = self.get_about().get('tuners') or 1
+        self.timers = TimerIndex(self.get_timers(), tuners)
+        return self.timers
+
+    def find_timer_conflicts(self, begin, end):
+        """
+        Check locally whether a recording of [begin, end) would find a free
+        tuner. load_timers() must have been called.
+        :return: list of the Timers it would conflict with, empty if none
+        """
+        if self.timers is None:
+            raise Enigma2Error('Timers not loaded - call load_timers() first')
+        return self.timers.conflicts(int(begin), int(end))
+
+    def add_timer(self, service_ref, begin, end, name, description='', eit=0,
+                  disabled=False, justplay=False, after_event=None, check_conflicts=True):
+        """
+        Add a timer to the box
+
+        :param begin: unix time to start recording
+        :param end: unix time to stop recording
+        :param eit: EPG event id, if the timer is for an event
+        :param justplay: if True the box only zaps to the service
+        :param after_event: one of the AFTER_EVENT_* constants, AFTER_EVENT_AUTO by default
+        :param check_conflicts: if timers are loaded, raise
+        Enigma2TimerConflictError rather than send a timer no tuner is free for
+        :return: True if the box added the timer
+        """
+        return self._add_timer(Timer(service_ref, '', name, description, int(begin), int(end),
+                                     int(eit or 0), disabled, justplay),
+                               after_event, check_conflicts)['result']
+
+    def _add_timer(self, timer, after_event=None, check_conflicts=True):
+        """
+        Send one timer, after checking it locally
+        :return: decoded <host>/api/timeradd response
+        """
+        from enigma2.constants import (URL_TIMER_ADD, PARAM_SERVICE_REF, PARAM_BEGIN, PARAM_END,
+                                       PARAM_NAME, PARAM_DESCRIPTION, PARAM_EIT, PARAM_DISABLED,
+                                       PARAM_JUSTPLAY, PARAM_AFTER_EVENT, AFTER_EVENT_AUTO)
+
+        timers = self.timers
+        if check_conflicts and timers is not None and timer.uses_tuner:
+            conflicts = timers.conflicts(timer.begin, timer.end)
+            if conflicts:
+                raise Enigma2TimerConflictError('No tuner free for %s' % timer.name, conflicts=conflicts)
+
+        response_json = self._invoke_api(URL_TIMER_ADD, {
+            PARAM_SERVICE_REF: timer.service_ref, PARAM_BEGIN: timer.begin, PARAM_END: timer.end,
+            PARAM_NAME: timer.name, PARAM_DESCRIPTION: timer.description, PARAM_EIT: timer.eit,
+            PARAM_DISABLED: int(timer.disabled), PARAM_JUSTPLAY: int(timer.justplay),
+            PARAM_AFTER_EVENT: AFTER_EVENT_AUTO if after_event is None else after_event}).json()
+        if response_json['result'] and timers is not None:
+            timers.add(timer)
+        return response_json
+
+    def add_timers_from_epg(self, events, margin_before=0, margin_after=0, rate=5,
+                            max_workers=4, after_event=None):
+        """
+        Create timers recording many EPG events, e.g. every episode of a series
+        found by search_epg(). Events already covered by a timer, or repeated
+        in events, are skipped, and events no tuner is free for are refused
+        locally. The rest are sent concurrently, at most rate per second.
+
+        :param events: iterable of event dicts as returned by search_epg()
+        :param margin_before: seconds to start each recording early
+        :param margin_after: seconds to keep each recording going late
+        :param rate: most add requests started per second, None for no limit
+        :param max_workers: most add requests in flight
+        :return: list of TimerOutcome, in the order of events
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from enigma2.resilience import RateLimiter
+        from enigma2.timers import (timer_for_event, TimerOutcome, OUTCOME_ADDED,
+                                    OUTCOME_DUPLICATE, OUTCOME_CONFLICT, OUTCOME_FAILED)
+
+        timers = self.timers if self.timers is not None else self.load_timers()
+
+        # Planned timers join the index straight away, so later events are
+        # checked against them too
+        outcomes = []
+        planned = []
+        for event in events:
+            timer = timer_for_event(event, margin_before, margin_after)
+            duplicate = timers.find_duplicate(timer)
+            if duplicate is not None:
+                outcomes.append(TimerOutcome(event, duplicate, OUTCOME_DUPLICATE,
+                                             'Already recorded by %s' % duplicate.name))
+                continue
+            conflicts = timers.conflicts(timer.begin, timer.end)
+            if conflicts:
+                outcomes.append(TimerOutcome(event, timer, OUTCOME_CONFLICT, 'No tuner free, clashes with %s'
+                                             % ', '.join(conflict.name for conflict in conflicts)))
+                continue
+            timers.add(timer)
+            planned.append((len(outcomes), event, timer))
+            outcomes.append(None)
+
+        limiter = RateLimiter(rate) if rate else None
+
+        def send(plan):
+            _, event, timer = plan
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                response_json = self._add_timer(timer, after_event, check_conflicts=False)
+            except Enigma2Error as err:
+                response_json = {'result': False, 'message': err.message}
+            if response_json['result']:
+                return TimerOutcome(event, timer, OUTCOME_ADDED, response_json.get('message', ''))
+            timers.remove(*timer.key)
+            return TimerOutcome(event, timer, OUTCOME_FAILED, response_json.get('message', ''))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for plan, outcome in zip(planned, executor.map(send, planned)):
+                outcomes[plan[0]] = outcome
+        return outcomes
+
+    def delete_timer(self, service_ref, begin, end):
+        """
+        Delete the timer for a service with this begin and end
+        :return: True if the box deleted it
+        """
+        from enigma2.constants import URL_TIMER_DELETE
+
+        result = self._timer_command(URL_TIMER_DELETE, service_ref, begin, end)['result']
+        if result and self.timers is not None:
+            self.timers.remove(service_ref, int(begin), int(end))
+        return result
+
+    def toggle_timer(self, service_ref, begin, end):
+        """
+        Enable a disabled timer, or disable an enabled one
+        :return: True if the box changed it
+        """
+        from enigma2.constants import URL_TIMER_TOGGLE
+
+        response_json = self._timer_command(URL_TIMER_TOGGLE, service_ref, begin, end)
+        timers = self.timers
+        if response_json['result'] and timers is not None:
+            timer = timers.get(service_ref, int(begin), int(end))
+            if timer is not None:
+                disabled = response_json.get('disabled', not timer.disabled)
+                timers.add(timer._replace(disabled=bool(disabled)))
+        return response_json['result']
+
+    def _timer_command(self, url, service_ref, begin, end):
+        from enigma2.constants import PARAM_SERVICE_REF, PARAM_BEGIN, PARAM_END
+
+        return self._invoke_api(url, {PARAM_SERVICE_REF: service_ref, PARAM_BEGIN: int(begin),
+                                      PARAM_END: int(end)}).json()
+
     def get_current_playback_type(self, currservice_serviceref=None):
         """
         Get the currservice_serviceref playing media type.
@@ -291,10 +777,6 @@ class Enigma2Connection(object):
             picon_name = self.get_picon_name(channel_name)
             url = '%s/picon/%s.png' % (self._base, picon_name)
 
-        if url in self.cached_urls_which_exist:
-            _LOGGER.debug('picon url (already tested): %s', url)
-            return url
-
         if self._url_exists(url):
             _LOGGER.debug('picon url: %s', url)
             return url
@@ -311,30 +793,238 @@ class Enigma2Connection(object):
         _LOGGER.info('Could not find picon for: %s', channel_name)
         return None
 
+    def resolve_picon_urls(self, services, max_workers=8):
+        """
+        Resolve the picon URL for many services at once
+
+        :param services: dict of service reference to service name, as
+        returned by load_services(), or an iterable of (reference, name) pairs
+        :param max_workers: maximum number of HEAD requests in flight
+        :return: dict of service reference to picon URL, or None if not found.
+        The picon cache grows to hold every candidate URL, so repeat calls
+        are answered from memory.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if isinstance(services, dict):
+            services = services.items()
+        candidates = [(service_ref, picon_url_candidates(self._base, service_ref, service_name))
+                      for service_ref, service_name in services]
+
+        # Every candidate must fit in the cache, else a repeat call over the
+        # same services evicts each answer before it is asked for again
+        needed = sum(len(urls) for _, urls in candidates)
+        if needed > self.picon_cache.maxsize:
+            _LOGGER.debug('Growing picon cache from %d to %d entries', self.picon_cache.maxsize, needed)
+            self.picon_cache.maxsize = needed
+
+        def resolve(candidate):
+            service_ref, urls = candidate
+            for url in urls:
+                if self._url_exists(url):
+                    return service_ref, url
+            return service_ref, None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(executor.map(resolve, candidates))
+
+    def fetch_picon(self, url, refresh=False):
+        """
+        Download a picon image into the picon store, unless it is there already.
+        The image is streamed to disk, never held in memory.
+
+        :param url: picon URL, as returned by resolve_picon_urls()
+        :param refresh: if True, download it again even if stored
+        :return: the sha256 of the image, or None if the box sent nothing
+        """
+        if self.picon_store is None:
+            raise Enigma2Error('No picon_store configured')
+        if not refresh and url in self.picon_store:
+            if self.instrumentation is not None:
+                self.instrumentation.on_cache('picon_image', True)
+            return self.picon_store.digest(url)
+        if self.instrumentation is not None:
+            self.instrumentation.on_cache('picon_image', False)
+
+        response = self._invoke_api(url[len(self._base):], stream=True, idempotent=True)
+        try:
+            return self.picon_store.put_stream(url, response.iter_content(chunk_size=65536))
+        finally:
+            response.close()
+
+    def get_current_playing_picon(self, channel_name=None, currservice_serviceref=None):
+        """
+        Make sure the picon of the currently playing channel is in the
+        picon store. Read it with picon_store.open(), mmap() or path().
+
+        :param channel_name: as for get_current_playing_picon_url()
+        :param currservice_serviceref: as for get_current_playing_picon_url()
+        :return: the picon URL, which is its key in the store, or None. The
+        LCD4Linux image shown for recordings changes, so is never stored.
+        """
+        from enigma2.constants import URL_LCD_4_LINUX
+
+        url = self.get_current_playing_picon_url(channel_name, currservice_serviceref)
+        if url is None or url == '%s%s' % (self._base, URL_LCD_4_LINUX):
+            return None
+        return url if self.fetch_picon(url) is not None else None
+
+    def fetch_picons(self, services, max_workers=8):
+        """
+        Download the picons of many services into the picon store. Services
+        sharing a picon URL share one download, and identical images are
+        stored once.
+
+        :param services: as for resolve_picon_urls()
+        :param max_workers: maximum number of requests in flight
+        :return: dict of service reference to picon URL (its key in the
+        store), or None if it has no picon or could not be downloaded
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if self.picon_store is None:
+            raise Enigma2Error('No picon_store configured')
+        urls = self.resolve_picon_urls(services, max_workers)
+
+        def fetch(url):
+            try:
+                return url, self.fetch_picon(url) is not None
+            except Enigma2Error as err:
+                _LOGGER.debug('Failed to download picon %s: %s', url, err.message)
+                return url, False
+
+        # The store's index is written once, after every download
+        with self.picon_store.batch(), ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fetched = dict(executor.map(fetch, set(url for url in urls.values() if url is not None)))
+        return {service_ref: url if fetched.get(url) else None for service_ref, url in urls.items()}
+
+    def download_screenshot(self, sink, image_format=None, resolution=None, mode=None,
+                            chunk_size=65536):
+        """
+        Stream a screen grab from <host>/grab to a file, a chunk at a time
+
+        :param sink: path of the file to write, or an object with a write method
+        :param image_format: 'jpg' or 'png', else the box's default
+        :param resolution: width in pixels, else the full frame
+        :param mode: GRAB_MODE_ALL, GRAB_MODE_VIDEO or GRAB_MODE_OSD
+        :param chunk_size: bytes held in memory at a time
+        :return: number of bytes written
+        """
+        from enigma2.constants import URL_GRAB, PARAM_FORMAT, PARAM_RESOLUTION, PARAM_GRAB_MODE
+
+        params = {}
+        if image_format is not None:
+            params[PARAM_FORMAT] = image_format
+        if resolution is not None:
+            params[PARAM_RESOLUTION] = resolution
+        if mode is not None:
+            params[PARAM_GRAB_MODE] = mode
+        return self._download(URL_GRAB, params or None, sink, chunk_size)
+
+    def download_lcd_image(self, sink, chunk_size=65536):
+        """
+        Stream the LCD4Linux image from <host>/lcd4linux/dpf.png to a file
+
+        :param sink: path of the file to write, or an object with a write method
+        :param chunk_size: bytes held in memory at a time
+        :return: number of bytes written
+        """
+        from enigma2.constants import URL_LCD_4_LINUX
+
+        return self._download(URL_LCD_4_LINUX, None, sink, chunk_size)
+
+    def _download(self, url, params, sink, chunk_size):
+        """
+        Stream a response body to sink. A path is written to a temporary
+        file first and moved into place, so readers never see half an image.
+        :return: number of bytes written
+        """
+        response = self._invoke_api(url, params, stream=True, idempotent=True)
+        try:
+            if hasattr(sink, 'write'):
+                return self._copy_chunks(response, sink, chunk_size)
+
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(sink)), suffix='.tmp')
+            try:
+                with os.fdopen(handle, 'wb') as temp_file:
+                    written = self._copy_chunks(response, temp_file, chunk_size)
+                os.replace(temp_path, sink)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            return written
+        finally:
+            response.close()
+
+    @staticmethod
+    def _copy_chunks(response, sink, chunk_size):
+        written = 0
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            sink.write(chunk)
+            written += len(chunk)
+        return written
+
     def load_services(self, bouquet_name=None):
         """
         Load a list of available services, optionally for the supplied bouquet
-        :param bouquet_name: name of the bouquet to use when locating services
-        :return: list of services discovered
+        :param bouquet_name: name of the bouquet to use when locating services.
+        If there is no such bouquet, all services are returned.
+        :return: dict of service reference to service name
         """
+        from enigma2.constants import URL_BOUQUETS
+
+        if self.disk_cache is not None:
+            return dict(self._cached('services', bouquet_name, URL_BOUQUETS,
+                                     lambda response_json: filter_services(response_json, bouquet_name)))
 
-        services = self._load_bouquets(bouquet_name)
-        return services
+        # Concurrent identical loads share one download, each caller gets its own dict
+        return dict(self._flight.do(('load_services', bouquet_name), self._load_services, bouquet_name))
+
+    def _load_services(self, bouquet_name):
+        return dict(self._iter_services(bouquet_name))
+
+    def iter_services(self, bouquet_name=None):
+        """
+        Stream the available services, optionally for the supplied bouquet.
+        The response is parsed incrementally, one bouquet at a time.
+        :param bouquet_name: name of the bouquet to use. If None, or if there
+        is no such bouquet, all services are yielded, as by load_services()
+        :return: generator of (service reference, service name), in order
+        """
+        return self._iter_services(bouquet_name)
+
+    @property
+    def cached_urls_which_exist(self):
+        """
+        Returns a list of the picon URLs currently known to exist
+        """
+        return [url for url, exists in self.picon_cache.items() if exists]
 
     def _url_exists(self, url):
         """
-        Check if a given URL responds to a HEAD request
+        Check if a given URL responds to a HEAD request. Both outcomes are
+        cached, so the request is only repeated once the entry expires.
         :param url: url to test
         :return: True or False
         """
-        request = requests.head(url)
-        if request.status_code == 200:
-            self.cached_urls_which_exist.append(url)
-            _LOGGER.debug('cached_urls_which_exist: %s',
-                          str(self.cached_urls_which_exist))
-            return True
+        exists = self.picon_cache.get(url)
+        if self.instrumentation is not None:
+            self.instrumentation.on_cache('picon', exists is not None)
+        if exists is not None:
+            _LOGGER.debug('picon url (already tested): %s', url)
+            return exists
 
-        return False
+        try:
+            response = self._send('HEAD', url)
+        except Enigma2Error as err:
+            # Don't remember transient failures
+            _LOGGER.debug('Failed to test url %s: %s', url, err.message)
+            return False
+
+        response.close()
+        exists = response.status_code == 200
+        self.picon_cache.set(url, exists, self._picon_hit_ttl if exists else self._picon_miss_ttl)
+        return exists
 
     @staticmethod
     def get_picon_name(channel_name):
@@ -345,56 +1035,199 @@ class Enigma2Connection(object):
         :param channel_name: The name of the channel
         :return: the correctly formatted name
         """
-        _LOGGER.debug("Getting Picon URL for : " + channel_name)
-
-        channel_name = unicodedata.normalize('NFKD', channel_name) \
-            .encode('ASCII', 'ignore')
-        channel_name = channel_name.decode("utf-8")
-        exclude_chars = ['/', '\\', '\'', '"', '`', '?', ' ', '(', ')', ':',
-                         '<', '>', '|', '.', '\n']
-        channel_name = re.sub('[%s]' % ''.join(exclude_chars), '',
-                              channel_name)
-        channel_name = channel_name.replace('&', 'and')
-        channel_name = channel_name.replace('+', 'plus')
-        channel_name = channel_name.replace('*', 'star')
-        channel_name = channel_name.lower()
+        _LOGGER.debug("Getting Picon URL for : %s", channel_name)
+        return get_picon_name(channel_name)
 
-        return channel_name
+    def _cached(self, kind, name, url, parse):
+        """
+        Returns a value from the disk cache, revalidating it first unless it
+        is fresh or warm_start is set, in which case it is refreshed in the
+        background. Revalidation sends If-None-Match when the box gave an
+        ETag, and otherwise skips parsing when the body hash is unchanged.
+        :param parse: builds the value from the decoded json response
+        """
+        entry = self.disk_cache.get(self._base, kind, name)
+        if entry is not None:
+            if self.instrumentation is not None:
+                self.instrumentation.on_cache('disk', True)
+            if self.disk_cache.is_fresh(entry):
+                return entry['value']
+            if self.warm_start:
+                self._refresh_in_background(kind, name, url, parse)
+                return entry['value']
+        elif self.instrumentation is not None:
+            self.instrumentation.on_cache('disk', False)
+        return self._flight.do(('disk', kind, name), self._revalidate, kind, name, url, parse)['value']
+
+    def _revalidate(self, kind, name, url, parse):
+        """
+        Fetch url and update the disk cache entry for (kind, name)
+        :return: the entry
+        """
+        entry = self.disk_cache.get(self._base, kind, name)
+        headers = {'If-None-Match': entry['etag']} if entry is not None and entry.get('etag') else None
+        response = self._invoke_api(url, idempotent=True, headers=headers)
+        if response.status_code == 304:
+            if entry is not None:
+                _LOGGER.debug('%s not modified', url)
+                return self.disk_cache.touch(entry)
+            # Nothing cached to reuse, so treat it as a miss
+            _LOGGER.debug('%s answered 304 with no cache entry, fetching again', url)
+            response = self._invoke_api(url, idempotent=True)
+            if response.status_code == 304:
+                raise Enigma2Error('%s answered 304 to an unconditional request' % url)
+
+        body = response.content
+        body_hash = content_hash(body)
+        if entry is not None and entry.get('hash') == body_hash:
+            _LOGGER.debug('%s unchanged', url)
+            return self.disk_cache.touch(entry)
+
+        value = parse(json.loads(body.decode('utf-8')))
+        return self.disk_cache.set(self._base, kind, name, value, body_hash,
+                                   response.headers.get('ETag'))
+
+    def _refresh_in_background(self, kind, name, url, parse):
+        """
+        Start revalidating a disk cache entry on a daemon thread, unless one
+        is already running for it
+        """
+        key = (kind, name)
+
+        def refresh():
+            try:
+                self._flight.do(('disk', kind, name), self._revalidate, kind, name, url, parse)
+            except Enigma2Error as err:
+                _LOGGER.debug('Background refresh of %s failed: %s', url, err.message)
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.pop(key, None)
+
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return
+            thread = threading.Thread(target=refresh, daemon=True)
+            self._refreshing[key] = thread
+        thread.start()
+
+    def _read_api(self, url, params=None):
+        """
+        Returns raw response from an API which doesn't change the box.
+        Identical concurrent reads share one request and its response.
+        :param url: URL to call
+        :return: Response object
+        """
+        key = (url, tuple(sorted(params.items())) if params else None)
+        return self._flight.do(key, self._invoke_api, url, params, idempotent=True)
 
-    def _invoke_api(self, url, params=None):
+    def _invoke_api(self, url, params=None, stream=False, idempotent=False, headers=None):
         """
         Returns raw response from API
         :param url: URL to call
+        :param stream: if True, the body is not downloaded until it is read
+        :param idempotent: if True the request may be retried
+        :param headers: extra request headers, e.g. If-None-Match
         :return: Response object
         """
 
         url = '%s%s' % (self._base, url)
         _LOGGER.debug('About to invoke: %s', url)
 
-        if self._username is not None and self._password is not None:
-            self._session.auth = (self._username, self._password)
-
-        if self._use_gzip:
-            self._session.headers.update({'Accept-Encoding': 'gzip'})
-
-        # Try to invoke the URL
-        try:
-            response = self._session.get(url, verify=self._verify_ssl, timeout=self._timeout, params=params)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as errh:
+        breaker = self.circuit_breaker
+        if breaker is not None and breaker.before_request():
+            self._probe()
+
+        retries = self.retry_policy.delays() if idempotent and self.retry_policy is not None else iter(())
+        while True:
+            try:
+                response = self._send('GET', url, params, stream, headers)
+                if response.status_code >= 500:
+                    response.close()
+                    _LOGGER.error('Enigma2 HTTP Error')
+                    raise Enigma2Error(message='Enigma2 HTTP Error %s' % response.status_code)
+                break
+            except Enigma2Error as err:
+                delay = next(retries, None)
+                if delay is None:
+                    _LOGGER.error('Failed to invoke %s: %s', url, err.message)
+                    if breaker is not None:
+                        breaker.record_failure()
+                    raise err
+                _LOGGER.debug('Retrying %s in %.2fs', url, delay)
+                self.retry_policy.sleep(delay)
+
+        if breaker is not None:
+            breaker.record_success()
+
+        if response.status_code >= 400:
+            response.close()
             if response.status_code == 401:
                 raise Enigma2Error('Authentication failure - check username and password')
             elif response.status_code == 404:
-                raise Enigma2Error(('URL not found %', url))
+                raise Enigma2Error('URL not found %s' % url)
+            _LOGGER.error('Enigma2 HTTP Error')
+            raise Enigma2Error(message='Enigma2 HTTP Error %s' % response.status_code)
+
+        self._connected = True
+        return response
+
+    def _send(self, method, url, params=None, stream=False, headers=None):
+        """
+        Send one request through the transport, reporting it to the
+        instrumentation if there is one. For streamed requests the time
+        measured is until the response headers arrive.
+        :return: Response object
+        """
+        # Only custom headers are passed on, so older Transport subclasses still work
+        extra = {'headers': headers} if headers else {}
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            if method == 'HEAD':
+                return self._transport.head(url)
+            return self._transport.get(url, params=params, stream=stream, **extra)
+
+        endpoint = route(url[len(self._base):])
+        context = instrumentation.on_request_start(method, endpoint)
+        start = time.perf_counter()
+        try:
+            if method == 'HEAD':
+                response = self._transport.head(url)
             else:
-                _LOGGER.error('Enigma2 HTTP Error')
-                raise Enigma2Error(message='Enigma2 HTTP Error', original=errh)
-        except requests.exceptions.ConnectionError as errc:
-            _LOGGER.error(('Failed to connect to server %', url), errc)
-            raise Enigma2Error(message='Failed to connect to server', original=errc)
+                response = self._transport.get(url, params=params, stream=stream, **extra)
+        except Enigma2Error as err:
+            instrumentation.on_request_end(method, endpoint, context, time.perf_counter() - start, error=err)
+            raise
 
+        if stream or method == 'HEAD':
+            num_bytes = int(response.headers.get('Content-Length') or 0)
+        else:
+            num_bytes = len(response.content)
+        instrumentation.on_request_end(method, endpoint, context, time.perf_counter() - start,
+                                       status_code=response.status_code, num_bytes=num_bytes)
         return response
 
+    def _probe(self):
+        """
+        Half open circuit: check <host>/api/statusinfo answers before
+        letting requests through again
+        """
+        from enigma2.constants import URL_STATUS_INFO
+
+        _LOGGER.debug('Probing %s for recovery', self._base)
+        recovered = False
+        try:
+            response = self._send('GET', '%s%s' % (self._base, URL_STATUS_INFO))
+            response.close()
+            if response.status_code >= 500:
+                raise Enigma2Error(message='Enigma2 HTTP Error %s' % response.status_code)
+            recovered = True
+        finally:
+            # Whatever went wrong, the circuit must leave half open
+            if recovered:
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure()
+
     def _check_response_result(self, url, params=None):
         """
         :param response:
@@ -404,44 +1237,63 @@ class Enigma2Connection(object):
         response = self._invoke_api(url, params=params)
         return response.json()['result']
 
-    def _load_bouquets(self, bouquet_name=None):
+    def _send_command(self, url, params=None):
         """
-        Load the bouquet requested or all services
-        :param bouquet_name:
-        :return:
+        Send a command which changes the state of the box
+        :return: Returns True if command success, else, False
+        """
+        try:
+            return self._check_response_result(url, params=params)
+        finally:
+            self.last_command_time = time.monotonic()
+            self.invalidate_status_info()
+
+    def iter_bouquets(self):
+        """
+        Stream the bouquets from <host>/api/getallservices, one at a time
+        :return: generator of bouquet dicts, each with its subservices
         """
         from enigma2.constants import URL_BOUQUETS
 
-        from jsonpath_rw import parse
         _LOGGER.debug("Loading all bouquets...")
-        service_names = []
-        service_refs = []
-        e2services = []
-        bouquets_response = self._invoke_api(URL_BOUQUETS)
-        bouquets_json = bouquets_response.json()
-
-        # If bouquet name supplied, only get those channels
-        if bouquet_name in [match.value
-                            for match in parse('services[*].servicename').find(bouquets_json)]:
-            e2sub_services = [match.value
-                              for match in parse('services[*]').find(bouquets_json)]
-            for e2sub_service in e2sub_services:
-                if e2sub_service['servicename'] == bouquet_name:
-                    e2services = e2sub_service['subservices']
+        response = self._invoke_api(URL_BOUQUETS, stream=True, idempotent=True)
+        try:
+            for bouquet in iter_array_items(response.iter_content(chunk_size=65536), 'services'):
+                yield bouquet
+        finally:
+            response.close()
 
-        else:
-            e2services = [match.value for match in parse('services[*].subservices[*]').find(bouquets_json)]
+    def load_catalog(self):
+        """
+        Load all services into an indexed ServiceCatalog
+        :return: ServiceCatalog
+        """
+        from enigma2.catalog import ServiceCatalog
 
-        for e2service in e2services:
-            service_ref = e2service['servicereference']
-            service_name = e2service['servicename']
+        return ServiceCatalog(self.iter_bouquets())
 
-            # only add channel if we've not see it before
-            # and it's name/ref pass some basic checks to remove rubbish channels
-            if service_ref not in service_refs \
-                    and service_ref.endswith(':') \
-                    and service_name not in ['<n/a>', '(...)']:
-                service_refs.append(service_ref)
-                service_names.append(service_name)
+    def refresh_catalog(self):
+        """
+        Load the services again and compare them with the catalog from the
+        previous refresh, which is replaced. The first refresh reports every
+        service as added.
+        :return: CatalogDiff
+        """
+        from enigma2.catalog import ServiceCatalog
+
+        with self._catalog_lock:
+            previous = self.catalog if self.catalog is not None else ServiceCatalog()
+            self.catalog = self.load_catalog()
+            diff = self.catalog.diff(previous)
 
-        return dict(zip(service_refs, service_names))
+        # Only the picons of services which went away or changed name are forgotten
+        for service in diff.removed + [old for old, _ in diff.renamed]:
+            for url in picon_url_candidates(self._base, service.ref, service.name):
+                self.picon_cache.pop(url)
+        return diff
+
+    def _iter_services(self, bouquet_name=None, matched=None):
+        """
+        Stream the services of the bouquet requested, or all services
+        """
+        return iter_bouquet_services(self.iter_bouquets(), bouquet_name, matched)
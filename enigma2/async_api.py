@@ -0,0 +1,439 @@
+"""
+enigma2.async_api
+~~~~~~~~~~~~~~~~~~~~
+
+Provides an asyncio native client for interacting with Enigma2 powered
+set-top-box running OpenWebIf. Requires aiohttp.
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import asyncio
+import logging
+import time
+
+from enigma2.api import PlaybackType, build_url_base, filter_services, parse_about
+from enigma2.cache import LRUCache
+from enigma2.error import Enigma2Error
+from enigma2.picon import get_picon_name, picon_url_candidates
+
+_LOGGER = logging.getLogger(__name__)
+
+# pylint: disable=too-many-arguments,line-too-long,too-many-instance-attributes,too-many-public-methods
+
+
+class AsyncEnigma2Connection(object):
+    """
+    Create a new asyncio Connection to an Enigma2 box.
+
+    All boxes created with the same ``session`` share its keep-alive
+    connection pool. If no session is supplied, one is created on first use
+    and closed by ``close()``.
+    """
+
+    def __init__(self, url=None, host=None, port=None,
+                 username=None, password=None, is_https=False,
+                 timeout=5, verify_ssl=True, use_gzip=True,
+                 session=None, pool_size=100,
+                 picon_cache_size=1024, picon_hit_ttl=86400, picon_miss_ttl=600):
+        import aiohttp
+
+        _LOGGER.debug("Initialising new async Enigma2 OpenWebIF client")
+
+        if host is None and url is None:
+            _LOGGER.error('Missing Enigma2 host!')
+            raise Enigma2Error('Connection to Enigma2 failed - please supply connection details')
+
+        self._auth = None
+        if username is not None and password is not None:
+            self._auth = aiohttp.BasicAuth(username, password)
+
+        self._headers = {'Accept-Encoding': 'gzip'} if use_gzip else {}
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._verify_ssl = verify_ssl
+        self._pool_size = pool_size
+        self._in_standby = True
+
+        # time.monotonic() of the last state changing command, if any
+        self.last_command_time = None
+
+        self._session = session
+        self._owns_session = session is None
+
+        # Remembers which picon URLs exist (and which don't) so repeated
+        # lookups don't need another HEAD request
+        self.picon_cache = LRUCache(picon_cache_size)
+        self._picon_hit_ttl = picon_hit_ttl
+        self._picon_miss_ttl = picon_miss_ttl
+
+        # Now build base url
+        if not url:
+            self._base = build_url_base(host, port, is_https)
+        else:
+            self._base = url
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def connect(self):
+        """
+        Probe the device to test the connection
+        :return: json containing the result of <host>/api/statusinfo
+        """
+        _LOGGER.debug("Going to probe device to test connection")
+        status_info = await self.get_status_info()
+        _LOGGER.debug("Connected OK!")
+        return status_info
+
+    async def check_health(self):
+        """
+        Probe the device without raising
+        :return: True if the box answered, else, False
+        """
+        try:
+            await self.connect()
+            return True
+        except Enigma2Error:
+            return False
+
+    async def close(self):
+        """
+        Close the underlying session, if this connection created it
+        """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def gather(self, *coroutines):
+        """
+        Await many commands at once, sharing the connection pool
+
+        :param coroutines: coroutines returned by methods of this connection
+        :return: list of results, Enigma2Error instances in place of failures
+        """
+        return await asyncio.gather(*coroutines, return_exceptions=True)
+
+    async def set_volume(self, new_volume):
+        """
+        Sets the volume to the new value
+
+        :param new_volume: int from 0-100
+        :return: True if successful, false if there was a problem
+        """
+        from enigma2.constants import (URL_VOLUME, COMMAND_VOL_SET)
+
+        if -1 > new_volume < 101:
+            raise Enigma2Error('Volume must be between 0 and 100')
+
+        cmd = '%s%s' % (COMMAND_VOL_SET, str(new_volume))
+        return await self._send_command(URL_VOLUME, {COMMAND_VOL_SET: cmd})
+
+    async def volume_up(self):
+        """
+        Returns True if command success
+        """
+        from enigma2.constants import (URL_VOLUME, COMMAND_VOL_SET, COMMAND_VOL_UP)
+
+        return await self._send_command(URL_VOLUME, {COMMAND_VOL_SET: COMMAND_VOL_UP})
+
+    async def volume_down(self):
+        """
+        Returns True if command success
+        """
+        from enigma2.constants import (URL_VOLUME, COMMAND_VOL_SET, COMMAND_VOL_DOWN)
+
+        return await self._send_command(URL_VOLUME, {COMMAND_VOL_SET: COMMAND_VOL_DOWN})
+
+    async def toggle_mute(self):
+        """
+        Send mute command
+        """
+        from enigma2.constants import (URL_VOLUME, COMMAND_VOL_SET, COMMAND_VOL_MUTE)
+
+        return await self._send_command(URL_VOLUME, {COMMAND_VOL_SET: COMMAND_VOL_MUTE})
+
+    async def toggle_standby(self):
+        """
+        Returns True if command success, else, False
+        """
+        from enigma2.constants import (URL_TOGGLE_STANDBY, PARAM_NEWSTATE)
+
+        result = await self._send_command(URL_TOGGLE_STANDBY, {PARAM_NEWSTATE: '0'})
+        # Update standby
+        await self.get_status_info()
+        return result
+
+    async def toggle_play_pause(self):
+        """
+        Send Play Pause command
+        """
+        from enigma2.constants import (URL_REMOTE_CONTROL,
+                                       PARAM_COMMAND, COMMAND_RC_PLAY_PAUSE_TOGGLE)
+
+        result = await self._send_command(URL_REMOTE_CONTROL,
+                                          {PARAM_COMMAND: COMMAND_RC_PLAY_PAUSE_TOGGLE})
+        # Update info
+        await self.get_status_info()
+        return result
+
+    async def channel_up(self):
+        """
+        Send channel up command
+        """
+        from enigma2.constants import (URL_REMOTE_CONTROL,
+                                       PARAM_COMMAND, COMMAND_RC_CHANNEL_UP)
+
+        return await self._send_command(URL_REMOTE_CONTROL,
+                                        {PARAM_COMMAND: COMMAND_RC_CHANNEL_UP})
+
+    async def channel_down(self):
+        """
+        Send channel down command
+        """
+        from enigma2.constants import (URL_REMOTE_CONTROL,
+                                       PARAM_COMMAND, COMMAND_RC_CHANNEL_DOWN)
+
+        return await self._send_command(URL_REMOTE_CONTROL,
+                                        {PARAM_COMMAND: COMMAND_RC_CHANNEL_DOWN})
+
+    def is_box_in_standby(self):
+        """
+        Returns True if box was in standby at the last status update, else, False
+        """
+        return self._in_standby
+
+    async def get_about(self):
+        """
+        Returns the main details from <host>/api/about
+        """
+        from enigma2.constants import URL_ABOUT
+
+        return parse_about(await self._invoke_api(URL_ABOUT))
+
+    async def refresh_status_info(self):
+        """
+        Returns json containing the result of <host>/api/statusinfo
+        """
+        return await self.get_status_info()
+
+    async def get_status_info(self):
+        """
+        Returns json containing the result of <host>/api/statusinfo
+        """
+        from enigma2.constants import URL_STATUS_INFO
+
+        response_json = await self._invoke_api(URL_STATUS_INFO)
+        self._in_standby = response_json['inStandby']
+        return response_json
+
+    async def search_epg(self, program_name):
+        """
+        Search the EPG for the supplied program name
+        :param program_name: name of the program to search for
+        :return: list of events found
+        """
+        from enigma2.constants import (URL_EPG_SEARCH, PARAM_SEARCH)
+
+        response_json = await self._invoke_api(URL_EPG_SEARCH, {PARAM_SEARCH: program_name})
+        if response_json['result']:
+            return response_json['events']
+
+        return []
+
+    async def get_current_playback_type(self, currservice_serviceref=None):
+        """
+        Get the currservice_serviceref playing media type.
+
+        :param currservice_serviceref: If you already know the
+        currservice_serviceref pass it here, else it will be
+        determined
+        :return: PlaybackType.live or PlaybackType.recording
+        """
+        if currservice_serviceref is None:
+            if self.is_box_in_standby():
+                return PlaybackType.none
+
+            status_info = await self.get_status_info()
+            if 'currservice_serviceref' in status_info:
+                currservice_serviceref = status_info['currservice_serviceref']
+
+        if currservice_serviceref.startswith('1:0:0'):
+            # This is a recording, not a live channel
+            return PlaybackType.recording
+
+        return PlaybackType.live
+
+    async def get_current_playing_picon_url(self, channel_name=None,
+                                            currservice_serviceref=None):
+        """
+        Return the URL to the picon image for the currently playing channel
+
+        :param channel_name: If specified, it will base url on this channel
+        name else, fetch latest from get_status_info()
+        :param currservice_serviceref: The service_ref for the current service
+        :return: The URL, or None if not available
+        """
+        from enigma2.constants import URL_LCD_4_LINUX
+
+        cached_info = None
+        if channel_name is None:
+            cached_info = await self.get_status_info()
+            if 'currservice_station' in cached_info:
+                channel_name = cached_info['currservice_station']
+            else:
+                _LOGGER.debug('No channel currently playing')
+                return None
+
+        if currservice_serviceref is None:
+            if cached_info is None:
+                cached_info = await self.get_status_info()
+            currservice_serviceref = cached_info['currservice_serviceref']
+
+        if currservice_serviceref.startswith('1:0:0'):
+            # This is a recording, fallback to the LCD4Linux image
+            url = '%s%s' % (self._base, URL_LCD_4_LINUX)
+            _LOGGER.debug('This is a recording, trying url: %s', url)
+        else:
+            picon_name = get_picon_name(channel_name)
+            url = '%s/picon/%s.png' % (self._base, picon_name)
+
+        if await self._url_exists(url):
+            _LOGGER.debug('picon url: %s', url)
+            return url
+
+        # Last ditch attempt. If channel ends in HD, lets try
+        # and get non HD picon
+        if channel_name.lower().endswith('hd'):
+            channel_name = channel_name[:-2]
+            _LOGGER.debug('Going to look for non HD picon for: %s', channel_name)
+            return await self.get_current_playing_picon_url(
+                ''.join(channel_name.split()),
+                currservice_serviceref)
+
+        _LOGGER.info('Could not find picon for: %s', channel_name)
+        return None
+
+    async def resolve_picon_urls(self, services, max_concurrency=8):
+        """
+        Resolve the picon URL for many services at once
+
+        :param services: dict of service reference to service name, as
+        returned by load_services(), or an iterable of (reference, name) pairs
+        :param max_concurrency: maximum number of HEAD requests in flight
+        :return: dict of service reference to picon URL, or None if not found
+        """
+        if isinstance(services, dict):
+            services = services.items()
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def resolve(service_ref, service_name):
+            for url in picon_url_candidates(self._base, service_ref, service_name):
+                async with semaphore:
+                    exists = await self._url_exists(url)
+                if exists:
+                    return service_ref, url
+            return service_ref, None
+
+        return dict(await asyncio.gather(*[resolve(ref, name) for ref, name in services]))
+
+    async def load_services(self, bouquet_name=None):
+        """
+        Load a list of available services, optionally for the supplied bouquet
+        :param bouquet_name: name of the bouquet to use when locating services
+        :return: dict of service reference to service name
+        """
+        from enigma2.constants import URL_BOUQUETS
+
+        _LOGGER.debug("Loading all bouquets...")
+        bouquets_json = await self._invoke_api(URL_BOUQUETS)
+        return filter_services(bouquets_json, bouquet_name)
+
+    def _get_session(self):
+        """
+        Returns the aiohttp session, creating it on first use
+        """
+        import aiohttp
+
+        if self._session is None:
+            ssl_args = {} if self._verify_ssl else {'ssl': False}
+            connector = aiohttp.TCPConnector(limit=self._pool_size, **ssl_args)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+        return self._session
+
+    async def _url_exists(self, url):
+        """
+        Check if a given URL responds to a HEAD request. Both outcomes are
+        cached, so the request is only repeated once the entry expires.
+        :param url: url to test
+        :return: True or False
+        """
+        import aiohttp
+
+        exists = self.picon_cache.get(url)
+        if exists is not None:
+            _LOGGER.debug('picon url (already tested): %s', url)
+            return exists
+
+        try:
+            async with self._get_session().head(url, auth=self._auth, timeout=self._timeout) as response:
+                exists = response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            # Don't remember transient failures
+            _LOGGER.debug('Failed to test url %s: %s', url, err)
+            return False
+
+        self.picon_cache.set(url, exists, self._picon_hit_ttl if exists else self._picon_miss_ttl)
+        return exists
+
+    async def _invoke_api(self, url, params=None):
+        """
+        Returns decoded json response from API
+        :param url: URL to call
+        :return: json
+        """
+        import aiohttp
+
+        url = '%s%s' % (self._base, url)
+        _LOGGER.debug('About to invoke: %s', url)
+
+        session = self._get_session()
+        try:
+            async with session.get(url, params=params, auth=self._auth, headers=self._headers,
+                                   timeout=self._timeout) as response:
+                if response.status == 401:
+                    raise Enigma2Error('Authentication failure - check username and password')
+                elif response.status == 404:
+                    raise Enigma2Error('URL not found %s' % url)
+                try:
+                    response.raise_for_status()
+                except aiohttp.ClientResponseError as errh:
+                    _LOGGER.error('Enigma2 HTTP Error')
+                    raise Enigma2Error(message='Enigma2 HTTP Error', original=errh)
+                return await response.json(content_type=None)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as errc:
+            _LOGGER.error('Failed to connect to server %s', url)
+            raise Enigma2Error(message='Failed to connect to server', original=errc)
+
+    async def _check_response_result(self, url, params=None):
+        """
+        :return: Returns True if command success, else, False
+        """
+        response_json = await self._invoke_api(url, params=params)
+        return response_json['result']
+
+    async def _send_command(self, url, params=None):
+        """
+        Send a command which changes the state of the box
+        :return: Returns True if command success, else, False
+        """
+        try:
+            return await self._check_response_result(url, params=params)
+        finally:
+            self.last_command_time = time.monotonic()
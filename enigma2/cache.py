@@ -0,0 +1,187 @@
+"""
+enigma2.cache
+~~~~~~~~~~~~~~~~~~~~
+
+Caching and request coalescing helpers
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class _Call(object):
+    """ An in-flight call shared by every waiter """
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Collapse concurrent calls with the same key into a single call whose
+    result (or exception) is handed to every waiter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Call func, unless a call for key is already in flight, in which case
+        wait for it and share its outcome
+        :param key: hashable key identifying identical calls
+        :param func: the function to call
+        :return: result of func
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class CachedValue(object):
+    """
+    A single value kept for ``ttl`` seconds, loaded through a SingleFlight so
+    concurrent callers share one load. A ttl of 0 only coalesces.
+    """
+
+    def __init__(self, ttl=0, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires = 0
+        self._generation = 0
+
+    def get(self, loader):
+        """
+        Return the cached value, or load it with loader if it has expired
+        :param loader: function returning a fresh value
+        :return: the value
+        """
+        with self._lock:
+            if self.ttl and self._clock() < self._expires:
+                return self._value
+            generation = self._generation
+
+        # Loads started before an invalidation are not shared with later callers
+        return self._flight.do(generation, self._load, generation, loader)
+
+    def invalidate(self):
+        """
+        Drop the cached value, including any load already in flight
+        """
+        with self._lock:
+            self._generation += 1
+            self._expires = 0
+            self._value = None
+
+    def _load(self, generation, loader):
+        value = loader()
+        with self._lock:
+            # Don't store a value which was invalidated while loading
+            if self.ttl and generation == self._generation:
+                self._value = value
+                self._expires = self._clock() + self.ttl
+        return value
+
+
+class LRUCache(object):
+    """
+    A bounded, thread safe, least recently used cache where every entry
+    carries its own time to live.
+    """
+
+    def __init__(self, maxsize=1024, clock=time.monotonic):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        """
+        Return the value for key, or default if it is absent or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and self._clock() >= expires:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Store value for key, evicting the least recently used entry if full
+        :param ttl: seconds to keep the entry for, or None to keep it until evicted
+        """
+        expires = None if ttl is None else self._clock() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """
+        Remove key, returning its value or default
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        """
+        Remove every entry
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def items(self):
+        """
+        Returns a list of the (key, value) pairs which have not expired
+        """
+        now = self._clock()
+        with self._lock:
+            return [(key, value) for key, (value, expires) in self._entries.items()
+                    if expires is None or now < expires]
@@ -0,0 +1,217 @@
+"""
+enigma2.catalog
+~~~~~~~~~~~~~~~~~~~~
+
+Indexed catalog of the services on a box
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import unicodedata
+from bisect import bisect_left
+from collections import namedtuple
+
+from enigma2.api import is_valid_service
+from enigma2.picon import get_picon_name
+
+
+def normalise_name(name):
+    """
+    Normalise a service name for lookups: accents removed, case folded and
+    whitespace collapsed
+    :param name: service name
+    :return: the normalised name
+    """
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(char for char in name if not unicodedata.combining(char))
+    return ' '.join(name.casefold().split())
+
+
+class CatalogDiff(namedtuple('CatalogDiff', ['added', 'removed', 'renamed', 'added_bouquets',
+                                             'removed_bouquets', 'changed_bouquets',
+                                             'reordered_bouquets', 'bouquets_moved'])):
+    """
+    What changed between two catalogs:
+
+    added, removed: lists of Service
+    renamed: list of (old Service, new Service) with the same reference
+    added_bouquets, removed_bouquets: lists of bouquet names
+    changed_bouquets: bouquets whose services were added or taken away
+    reordered_bouquets: bouquets with the same services in a new order
+    bouquets_moved: True if the bouquets themselves are in a new order
+    """
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return any(self)
+
+    @property
+    def changed_refs(self):
+        """
+        Returns the set of service references added, removed or renamed
+        """
+        refs = set(service.ref for service in self.added)
+        refs.update(service.ref for service in self.removed)
+        refs.update(new.ref for _, new in self.renamed)
+        return refs
+
+
+class Service(object):
+    """ A service (channel) on the box """
+
+    __slots__ = ('ref', 'name', 'normalised_name', 'picon_name', 'bouquets')
+
+    def __init__(self, ref, name):
+        self.ref = ref
+        self.name = name
+        self.normalised_name = normalise_name(name)
+        self.picon_name = get_picon_name(name)
+        self.bouquets = []
+
+    def __repr__(self):
+        return 'Service(%r, %r)' % (self.ref, self.name)
+
+
+class ServiceCatalog(object):
+    """
+    Every service from one /api/getallservices fetch, indexed by reference,
+    normalised name, bouquet and picon name.
+    """
+
+    def __init__(self, bouquets=()):
+        self._by_ref = {}
+        self._by_name = {}
+        self._by_bouquet = {}
+        self._by_picon = {}
+        self._sorted_names = []
+        self._sorted_services = []
+
+        for bouquet in bouquets:
+            self._add_bouquet(bouquet['servicename'], bouquet['subservices'])
+        self._build_name_index()
+
+    def _add_bouquet(self, bouquet_name, subservices):
+        members = self._by_bouquet.setdefault(bouquet_name, [])
+        for e2service in subservices:
+            service_ref = e2service['servicereference']
+            service_name = e2service['servicename']
+            if not is_valid_service(service_ref, service_name):
+                continue
+
+            service = self._by_ref.get(service_ref)
+            if service is None:
+                service = Service(service_ref, service_name)
+                self._by_ref[service_ref] = service
+                self._by_name.setdefault(service.normalised_name, []).append(service)
+                self._by_picon.setdefault(service.picon_name, []).append(service)
+
+            if bouquet_name not in service.bouquets:
+                service.bouquets.append(bouquet_name)
+                members.append(service)
+
+    def _build_name_index(self):
+        pairs = sorted((service.normalised_name, index)
+                       for index, service in enumerate(self._by_ref.values()))
+        services = list(self._by_ref.values())
+        self._sorted_names = [name for name, _ in pairs]
+        self._sorted_services = [services[index] for _, index in pairs]
+
+    def __len__(self):
+        return len(self._by_ref)
+
+    def __contains__(self, service_ref):
+        return service_ref in self._by_ref
+
+    def __iter__(self):
+        return iter(self._by_ref.values())
+
+    @property
+    def bouquet_names(self):
+        """
+        Returns the names of the bouquets, in the order they were loaded
+        """
+        return list(self._by_bouquet)
+
+    def get(self, service_ref):
+        """
+        Returns the Service for a service reference, or None
+        """
+        return self._by_ref.get(service_ref)
+
+    def find_by_name(self, name):
+        """
+        Returns the list of services whose name matches, ignoring case,
+        accents and spacing
+        """
+        return list(self._by_name.get(normalise_name(name), ()))
+
+    def find_by_prefix(self, prefix, limit=None):
+        """
+        Returns services whose normalised name starts with prefix, sorted by name
+        :param prefix: start of the name
+        :param limit: maximum number of services to return
+        """
+        prefix = normalise_name(prefix)
+        start = bisect_left(self._sorted_names, prefix)
+        end = start
+        count = len(self._sorted_names)
+        while end < count and self._sorted_names[end].startswith(prefix) \
+                and (limit is None or end - start < limit):
+            end += 1
+        return self._sorted_services[start:end]
+
+    def find_by_picon(self, picon_name):
+        """
+        Returns the list of services which share a picon name
+        """
+        return list(self._by_picon.get(picon_name, ()))
+
+    def in_bouquet(self, bouquet_name):
+        """
+        Returns the services of a bouquet, in bouquet order
+        """
+        return list(self._by_bouquet.get(bouquet_name, ()))
+
+    def diff(self, previous):
+        """
+        Compare with an older catalog, in time linear in the number of services
+        :param previous: the older ServiceCatalog
+        :return: CatalogDiff of the changes from previous to this catalog
+        """
+        # pylint: disable=protected-access
+        old_refs = previous._by_ref
+        added = [service for ref, service in self._by_ref.items() if ref not in old_refs]
+        removed = [service for ref, service in old_refs.items() if ref not in self._by_ref]
+        renamed = [(old, self._by_ref[ref]) for ref, old in old_refs.items()
+                   if ref in self._by_ref and self._by_ref[ref].name != old.name]
+
+        old_bouquets = previous._by_bouquet
+        changed, reordered = [], []
+        for name, members in self._by_bouquet.items():
+            old_members = old_bouquets.get(name)
+            if old_members is None:
+                continue
+            refs = [service.ref for service in members]
+            old_members = [service.ref for service in old_members]
+            if refs == old_members:
+                continue
+            # Members are distinct, so equal sizes and sets mean a new order
+            if len(refs) == len(old_members) and set(refs) == set(old_members):
+                reordered.append(name)
+            else:
+                changed.append(name)
+
+        common = [name for name in self._by_bouquet if name in old_bouquets]
+        old_common = [name for name in old_bouquets if name in self._by_bouquet]
+        return CatalogDiff(added, removed, renamed,
+                           [name for name in self._by_bouquet if name not in old_bouquets],
+                           [name for name in old_bouquets if name not in self._by_bouquet],
+                           changed, reordered, common != old_common)
+
+    def as_dict(self):
+        """
+        Returns a dict of service reference to service name, as load_services does
+        """
+        return {service.ref: service.name for service in self._by_ref.values()}
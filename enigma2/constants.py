@@ -13,6 +13,22 @@ DEFAULT_PORT = 80
 PARAM_SEARCH = "search"
 PARAM_NEWSTATE = "newstate"
 PARAM_COMMAND = "command"
+PARAM_BOUQUET_REF = "bRef"
+PARAM_SERVICE_REF = "sRef"
+PARAM_TIME = "time"
+PARAM_END_TIME = "endTime"
+PARAM_BEGIN = "begin"
+PARAM_END = "end"
+PARAM_NAME = "name"
+PARAM_DESCRIPTION = "description"
+PARAM_EIT = "eit"
+PARAM_DISABLED = "disabled"
+PARAM_JUSTPLAY = "justplay"
+PARAM_AFTER_EVENT = "afterevent"
+PARAM_DIRNAME = "dirname"
+PARAM_FORMAT = "format"
+PARAM_RESOLUTION = "r"
+PARAM_GRAB_MODE = "mode"
 
 COMMAND_RC_CHANNEL_UP = "402"
 COMMAND_RC_CHANNEL_DOWN = "403"
@@ -29,5 +45,25 @@ URL_TOGGLE_STANDBY = "/api/powerstate"
 URL_STATUS_INFO = "/api/statusinfo"
 URL_BOUQUETS = "/api/getallservices"
 URL_EPG_SEARCH = "/api/epgsearch"
+URL_EPG_MULTI = "/api/epgmulti"
+URL_EPG_SERVICE = "/api/epgservice"
 URL_REMOTE_CONTROL = "/api/remotecontrol"
 URL_LCD_4_LINUX = "/lcd4linux/dpf.png"
+URL_TIMER_LIST = "/api/timerlist"
+URL_TIMER_ADD = "/api/timeradd"
+URL_TIMER_DELETE = "/api/timerdelete"
+URL_TIMER_TOGGLE = "/api/timertogglestatus"
+URL_MOVIE_LIST = "/api/movielist"
+URL_LOCATIONS = "/api/getlocations"
+URL_GRAB = "/grab"
+
+# afterevent values for a new timer
+AFTER_EVENT_NOTHING = 0
+AFTER_EVENT_STANDBY = 1
+AFTER_EVENT_DEEPSTANDBY = 2
+AFTER_EVENT_AUTO = 3
+
+# What /grab captures
+GRAB_MODE_ALL = "all"
+GRAB_MODE_VIDEO = "video"
+GRAB_MODE_OSD = "osd"
@@ -0,0 +1,113 @@
+"""
+enigma2.diskcache
+~~~~~~~~~~~~~~~~~~~~
+
+A persistent cache for responses which rarely change, such as the service
+list and box information, so they survive a restart of the process.
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def content_hash(body):
+    """
+    Returns the hex sha256 of a response body
+    """
+    return hashlib.sha256(body).hexdigest()
+
+
+class DiskCache(object):
+    """
+    Stores one JSON file per (host, kind, name) key in a directory. Each
+    entry keeps the value with what is needed to revalidate it: the ETag, if
+    the box sent one, and a hash of the response body. The file's mtime is
+    when the entry was last stored or revalidated.
+
+    :param directory: where to keep the files, created if needed
+    :param max_age: seconds an entry is used without revalidating it, 0 to
+    revalidate every time
+    """
+
+    def __init__(self, directory, max_age=0, clock=time.time):
+        self.directory = directory
+        self.max_age = max_age
+        self._clock = clock
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, host, kind, name):
+        key = json.dumps([host, kind, name])
+        return os.path.join(self.directory, '%s.json' % content_hash(key.encode('utf-8'))[:32])
+
+    def get(self, host, kind, name=None):
+        """
+        Returns the entry stored for the key, or None
+        :return: dict with value, etag, hash and stored (a timestamp)
+        """
+        try:
+            with open(self._path(host, kind, name), 'r', encoding='utf-8') as cache_file:
+                entry = json.load(cache_file)
+                entry['stored'] = os.fstat(cache_file.fileno()).st_mtime
+        except (OSError, ValueError):
+            return None
+        if entry.get('key') != [host, kind, name]:
+            return None
+        return entry
+
+    def set(self, host, kind, name, value, body_hash=None, etag=None):
+        """
+        Store a value, replacing the file atomically
+        :return: the entry stored
+        """
+        entry = {'key': [host, kind, name], 'value': value, 'hash': body_hash,
+                 'etag': etag, 'stored': self._clock()}
+        temp_path = None
+        try:
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(handle, 'w', encoding='utf-8') as cache_file:
+                json.dump(entry, cache_file)
+            os.utime(temp_path, (entry['stored'], entry['stored']))
+            os.replace(temp_path, self._path(host, kind, name))
+        except OSError as err:
+            # The value is still returned, it just won't survive a restart
+            _LOGGER.warning('Unable to write cache file: %s', err)
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+        return entry
+
+    def touch(self, entry):
+        """
+        Mark an entry as revalidated now, by setting the file's mtime rather
+        than rewriting its value
+        :return: the entry
+        """
+        host, kind, name = entry['key']
+        entry['stored'] = self._clock()
+        try:
+            os.utime(self._path(host, kind, name), (entry['stored'], entry['stored']))
+        except OSError as err:
+            _LOGGER.warning('Unable to touch cache file: %s', err)
+        return entry
+
+    def is_fresh(self, entry):
+        """
+        Returns True if the entry may be used without revalidating it
+        """
+        return self.max_age > 0 and self._clock() - entry['stored'] < self.max_age
+
+    def clear(self):
+        """
+        Remove every entry
+        """
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith('.json'):
+                os.remove(os.path.join(self.directory, file_name))
@@ -0,0 +1,322 @@
+"""
+enigma2.epg
+~~~~~~~~~~~~~~~~~~~~
+
+Local EPG store, so the guide can be searched without asking the box
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import logging
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# One row of the store, used while (re)building the columns
+EpgRow = namedtuple('EpgRow', ['sref', 'sname', 'picon', 'id', 'begin', 'end',
+                               'title', 'shortdesc', 'longdesc'])
+
+SyncResult = namedtuple('SyncResult', ['added', 'updated', 'expired', 'requests'])
+SyncResult.__doc__ = """ Summary of an EpgStore.sync """
+
+
+def _row_from_event(event):
+    """
+    Convert an OpenWebIf event into an EpgRow
+    """
+    begin = int(event['begin_timestamp'])
+    duration = event.get('duration_sec')
+    if duration is None:
+        duration = int(event.get('duration', 0)) * 60
+    return EpgRow(event['sref'], event.get('sname', ''), event.get('picon'), int(event['id']),
+                  begin, begin + int(duration), event.get('title', ''),
+                  event.get('shortdesc', ''), event.get('longdesc', ''))
+
+
+class EpgStore(object):
+    """
+    EPG events held in columns sorted by start time, with per service and
+    per title indexes, so searches run locally.
+
+    Events are returned in the same shape as Enigma2Connection.search_epg.
+    """
+
+    def __init__(self, events=()):
+        # ('bouquet_ref' or 'service_ref', reference) load() downloaded,
+        # to the latest event start downloaded for it
+        self._high_water = {}
+        self._build(_row_from_event(event) for event in events)
+
+    def _build(self, rows):
+        """
+        (Re)build the columns and indexes from an iterable of EpgRows
+        """
+        unique = {}
+        for row in rows:
+            unique[(row.sref, row.id)] = row
+        rows = sorted(unique.values(), key=lambda row: (row.begin, row.sref))
+
+        self._services = []
+        self._service_index = {}
+        self._service = array('i')
+        self._id = array('q')
+        self._begin = array('q')
+        self._end = array('q')
+        self._title = []
+        self._shortdesc = []
+        self._longdesc = []
+        self._by_title = {}
+        self._by_service = {}
+
+        for position, row in enumerate(rows):
+            index = self._service_index.get(row.sref)
+            if index is None:
+                index = len(self._services)
+                self._service_index[row.sref] = index
+                self._services.append((row.sref, row.sname, row.picon))
+                self._by_service[index] = (array('q'), array('i'))
+
+            self._service.append(index)
+            self._id.append(row.id)
+            self._begin.append(row.begin)
+            self._end.append(row.end)
+            self._title.append(row.title)
+            self._shortdesc.append(row.shortdesc)
+            self._longdesc.append(row.longdesc)
+            folded = row.title.casefold()
+            self._by_title.setdefault(folded, []).append(position)
+
+            begins, positions = self._by_service[index]
+            begins.append(row.begin)
+            positions.append(position)
+
+        # Latest end of each power of two block of events, for at()
+        size = 1
+        while size < len(rows):
+            size *= 2
+        tree = array('q', [-2 ** 63]) * (size * 2)
+        tree[size:size + len(rows)] = self._end
+        for node in range(size - 1, 0, -1):
+            tree[node] = max(tree[node * 2], tree[node * 2 + 1])
+        self._end_tree = tree
+        self._tree_size = size
+
+    def _rows(self):
+        """
+        Yield every event as an EpgRow
+        """
+        for position, index in enumerate(self._service):
+            sref, sname, picon = self._services[index]
+            yield EpgRow(sref, sname, picon, self._id[position], self._begin[position],
+                         self._end[position], self._title[position],
+                         self._shortdesc[position], self._longdesc[position])
+
+    def __len__(self):
+        return len(self._id)
+
+    @property
+    def service_refs(self):
+        """
+        Returns the references of the services with events in the store
+        """
+        return [sref for sref, _, _ in self._services]
+
+    def load(self, connection, bouquet_name=None, start=None, end=None):
+        """
+        Replace the contents of the store with the EPG from a box. Each
+        service is downloaded once, even if it is in many bouquets: the
+        largest bouquets are fetched whole, and the services of a bouquet
+        which overlaps those already fetched are fetched one by one.
+
+        :param connection: Enigma2Connection to download from
+        :param bouquet_name: only services of this bouquet, else all bouquets
+        :param start: only events from this unix timestamp
+        :param end: only events up to this unix timestamp
+        :raises Enigma2Error: if there is no bouquet called bouquet_name
+        """
+        from enigma2.error import Enigma2Error
+
+        bouquets = [bouquet for bouquet in connection.iter_bouquets()
+                    if bouquet_name in (None, bouquet['servicename'])]
+        if bouquet_name is not None and not bouquets:
+            raise Enigma2Error('Bouquet %s not found' % bouquet_name)
+
+        targets = []
+        seen = set()
+        for bouquet in sorted(bouquets, key=lambda bouquet: -len(bouquet['subservices'])):
+            refs = [service.get('servicereference') for service in bouquet['subservices']]
+            if not refs:
+                continue
+            if seen.isdisjoint(refs):
+                targets.append(('bouquet_ref', bouquet['servicereference']))
+            else:
+                targets.extend(('service_ref', ref) for ref in refs if ref not in seen)
+            seen.update(refs)
+        _LOGGER.debug('Loading EPG in %d requests for %d bouquets', len(targets), len(bouquets))
+
+        self._high_water = dict.fromkeys(targets, start)
+        rows = []
+        for kind, ref in targets:
+            rows.extend(self._fetch(connection, start=start, end=end, **{kind: ref}))
+        self._build(rows)
+
+    def sync(self, connection, now=None, horizon=None):
+        """
+        Bring the store up to date without downloading the whole guide again.
+
+        Events which have finished are dropped. For each bouquet (or, if the
+        store wasn't filled by load(), each service) only events from the
+        latest start already held onwards are requested and merged in.
+        Changes to events before that point are not picked up.
+
+        :param connection: Enigma2Connection to download from
+        :param now: current unix timestamp, defaults to time.time()
+        :param horizon: seconds of guide wanted ahead of now. Bouquets or
+        services which already have events that far ahead are skipped.
+        :return: SyncResult
+        """
+        now = int(time.time() if now is None else now)
+        rows = {(row.sref, row.id): row for row in self._rows()}
+        expired = [key for key, row in rows.items() if row.end <= now]
+        for key in expired:
+            del rows[key]
+
+        if self._high_water:
+            targets = [({kind: ref}, start) for (kind, ref), start in self._high_water.items()]
+        else:
+            latest = {}
+            for row in rows.values():
+                latest[row.sref] = max(row.begin, latest.get(row.sref, row.begin))
+            targets = [({'service_ref': sref}, start) for sref, start in latest.items()]
+
+        added = updated = requests = 0
+        for target, start in targets:
+            if horizon is not None and start is not None and start >= now + horizon:
+                continue
+            requests += 1
+            for row in self._fetch(connection, start=start, **target):
+                if row.end <= now:
+                    continue
+                key = (row.sref, row.id)
+                previous = rows.get(key)
+                if previous is None:
+                    added += 1
+                elif previous != row:
+                    updated += 1
+                rows[key] = row
+
+        self._build(rows.values())
+        _LOGGER.debug('EPG sync: %d added, %d updated, %d expired in %d requests',
+                      added, updated, len(expired), requests)
+        return SyncResult(added, updated, len(expired), requests)
+
+    def _fetch(self, connection, bouquet_ref=None, service_ref=None, start=None, end=None):
+        """
+        Download events, moving the high water mark of a target load() chose forward
+        :return: list of EpgRows
+        """
+        rows = [_row_from_event(event) for event in
+                connection.iter_epg(bouquet_ref=bouquet_ref, service_ref=service_ref, start=start, end=end)]
+        target = ('service_ref', service_ref) if service_ref is not None else ('bouquet_ref', bouquet_ref)
+        if target in self._high_water and rows:
+            latest = max(row.begin for row in rows)
+            self._high_water[target] = max(latest, self._high_water[target] or latest)
+        return rows
+
+    def event(self, position):
+        """
+        Returns the event at a position in the store, shaped like a search_epg result
+        """
+        sref, sname, picon = self._services[self._service[position]]
+        begin = self._begin[position]
+        end = self._end[position]
+        begin_time = time.localtime(begin)
+        return {
+            'id': self._id[position],
+            'sref': sref,
+            'sname': sname,
+            'picon': picon,
+            'title': self._title[position],
+            'shortdesc': self._shortdesc[position],
+            'longdesc': self._longdesc[position],
+            'begin_timestamp': begin,
+            'begin': time.strftime('%H:%M', begin_time),
+            'end': time.strftime('%H:%M', time.localtime(end)),
+            'date': time.strftime('%a %d.%m.%Y', begin_time),
+            'duration': (end - begin) // 60,
+            'duration_sec': end - begin,
+            'now_timestamp': None
+        }
+
+    def search(self, title, exact=False):
+        """
+        Search the titles of the stored events, ignoring case
+
+        An exact search is a dictionary lookup. Otherwise every distinct
+        title is scanned once, O(number of titles), which is far fewer than
+        the events as programmes repeat.
+
+        :param title: title, or part of a title, to search for
+        :param exact: if True, only events with exactly this title
+        :return: list of events ordered by start time, like search_epg
+        """
+        folded = title.casefold()
+        if exact:
+            positions = self._by_title.get(folded, ())
+        else:
+            positions = sorted(position for candidate, matches in self._by_title.items() if folded in candidate
+                               for position in matches)
+        return [self.event(position) for position in positions]
+
+    def at(self, timestamp, service_ref=None):
+        """
+        What's on at a given time
+
+        :param timestamp: unix timestamp
+        :param service_ref: only this service, else every service
+        :return: list of events airing at timestamp
+        """
+        if service_ref is not None:
+            return self.between(service_ref, timestamp, timestamp + 1)
+
+        # Of the events started by timestamp, visit only the parts of the
+        # tree whose latest end is after it
+        last = bisect_right(self._begin, timestamp)
+        tree, size = self._end_tree, self._tree_size
+        found = []
+        stack = [(1, 0, size)]
+        while stack:
+            node, low, high = stack.pop()
+            if low >= last or tree[node] <= timestamp:
+                continue
+            if node >= size:
+                found.append(low)
+                continue
+            middle = (low + high) // 2
+            stack.append((node * 2 + 1, middle, high))
+            stack.append((node * 2, low, middle))
+        return [self.event(position) for position in found]
+
+    def between(self, service_ref, start, end):
+        """
+        Events on a service which overlap a time window
+
+        :param service_ref: reference of the service
+        :param start: start of the window, unix timestamp
+        :param end: end of the window, unix timestamp
+        :return: list of events ordered by start time
+        """
+        index = self._service_index.get(service_ref)
+        if index is None:
+            return []
+
+        begins, positions = self._by_service[index]
+        # Include the event which may already be airing at start
+        first = max(bisect_right(begins, start) - 1, 0)
+        last = bisect_left(begins, end)
+        return [self.event(positions[i]) for i in range(first, last)
+                if self._end[positions[i]] > start]
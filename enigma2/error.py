@@ -19,3 +19,23 @@ class Enigma2Error(Exception):
         Exception.__init__(self)
         self.message = message
         self.original = original
+
+
+class Enigma2CircuitOpenError(Enigma2Error):
+
+    """
+    This exception is raised instead of sending a request while the box is
+    considered unreachable by its CircuitBreaker. It is a subclass of Enigma2Error.
+    """
+
+
+class Enigma2TimerConflictError(Enigma2Error):
+
+    """
+    This exception is raised when a timer would need more tuners than the box
+    has. conflicts holds the Timers it clashes with. It is a subclass of Enigma2Error.
+    """
+
+    def __init__(self, message='', original=None, conflicts=None):
+        Enigma2Error.__init__(self, message, original)
+        self.conflicts = conflicts or []
@@ -0,0 +1,166 @@
+"""
+enigma2.fleet
+~~~~~~~~~~~~~~~~~~~~
+
+Drive many Enigma2 boxes at once over a bounded thread pool
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from enigma2.api import Enigma2Connection
+
+_LOGGER = logging.getLogger(__name__)
+
+FleetResult = namedtuple('FleetResult', ['name', 'result', 'error'])
+FleetResult.__doc__ = """ Outcome of a call on one box: either result or error is set """
+
+
+class Enigma2Fleet(object):
+    """
+    Holds many named Enigma2Connections and fans calls out to them.
+
+    Every box runs on its own worker, so a dead box only costs its own
+    timeout and results are handed back as each box completes.
+    """
+
+    def __init__(self, max_workers=16):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.connections = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.connections)
+
+    def close(self):
+        """
+        Shut down the worker pool
+        """
+        self._executor.shutdown(wait=True)
+
+    def add(self, name, connection):
+        """
+        Add an existing connection to the fleet
+        :param name: unique name of the box
+        :param connection: Enigma2Connection (or anything with the same methods)
+        """
+        self.connections[name] = connection
+
+    def remove(self, name):
+        """
+        Remove a box from the fleet
+        :param name: name of the box
+        """
+        self.connections.pop(name, None)
+
+    def connect(self, boxes, connection_class=Enigma2Connection):
+        """
+        Create connections to many boxes concurrently
+
+        :param boxes: dict of box name to connection keyword arguments
+        :param connection_class: class used to build each connection
+        :return: generator of FleetResult as each box connects or fails.
+        Boxes which connect are added to the fleet.
+        """
+        futures = {self._executor.submit(connection_class, **kwargs): name
+                   for name, kwargs in boxes.items()}
+        for result in self._as_completed(futures):
+            if result.error is None:
+                self.add(result.name, result.result)
+            yield result
+
+    def call(self, method, *args, **kwargs):
+        """
+        Invoke the same method on every box
+
+        :param method: name of the Enigma2Connection method, e.g. 'get_status_info'
+        :return: generator of FleetResult in order of completion
+        """
+        futures = {self._executor.submit(getattr(connection, method), *args, **kwargs): name
+                   for name, connection in self.connections.items()}
+        return self._as_completed(futures)
+
+    def call_all(self, method, *args, **kwargs):
+        """
+        Invoke the same method on every box and wait for all of them
+        :return: dict of box name to FleetResult
+        """
+        return {result.name: result for result in self.call(method, *args, **kwargs)}
+
+    def get_status_info(self):
+        """
+        Fetch the status of every box
+        :return: generator of FleetResult in order of completion
+        """
+        return self.call('get_status_info')
+
+    def search_epg(self, program_name):
+        """
+        Search the EPG of every box for the supplied program name
+        :return: generator of FleetResult in order of completion
+        """
+        return self.call('search_epg', program_name)
+
+    def toggle_standby(self):
+        """
+        Toggle standby on every box
+        :return: generator of FleetResult in order of completion
+        """
+        return self.call('toggle_standby')
+
+    def capture(self, directory, lcd=False, max_concurrent=4, **kwargs):
+        """
+        Save a screen grab (or the LCD4Linux image) of every box to
+        <directory>/<box name>.<format>. Images are streamed to disk, and at
+        most max_concurrent downloads run at once however big the fleet is,
+        which bounds memory and bandwidth. Each file is replaced whole, so
+        calling this periodically keeps a current image of every box.
+
+        :param directory: where the images are written
+        :param lcd: if True save the LCD4Linux image instead of a screen grab
+        :param max_concurrent: maximum number of images downloading at once
+        :param kwargs: passed to download_screenshot, e.g. image_format or resolution
+        :return: generator of FleetResult in order of completion, with the
+        path of the image as the result
+        """
+        slots = threading.BoundedSemaphore(max_concurrent)
+        extension = 'png' if lcd else kwargs.get('image_format') or 'jpg'
+
+        def capture_one(name, connection):
+            path = os.path.join(directory, '%s.%s' % (name, extension))
+            with slots:
+                if lcd:
+                    connection.download_lcd_image(path)
+                else:
+                    connection.download_screenshot(path, **kwargs)
+            return path
+
+        futures = {self._executor.submit(capture_one, name, connection): name
+                   for name, connection in self.connections.items()}
+        return self._as_completed(futures)
+
+    @staticmethod
+    def _as_completed(futures):
+        """
+        Turn a dict of future to box name into FleetResults as they complete.
+        Whatever one box raises, including OSError writing its files, is
+        that box's error and never stops the results of the others.
+        """
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                yield FleetResult(name, future.result(), None)
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.debug('Call on %s failed: %s', name, err)
+                yield FleetResult(name, None, err)
@@ -0,0 +1,144 @@
+"""
+enigma2.instrumentation
+~~~~~~~~~~~~~~~~~~~~
+
+Hooks for measuring requests and caches. Nothing is measured unless an
+Instrumentation is given to the connection.
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import threading
+from bisect import bisect_left
+
+# pylint: disable=too-many-arguments,unused-argument
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Paths ending in a per channel file name, reported as one route each
+VARIABLE_ROUTES = ('/picon/',)
+
+
+def route(path):
+    """
+    Returns the route for a request path, with the query and any per
+    channel file name left out, e.g. /picon/itv2.png becomes /picon/*
+    """
+    path = path.split('?', 1)[0]
+    for prefix in VARIABLE_ROUTES:
+        if path.startswith(prefix):
+            return prefix + '*'
+    return path
+
+
+class Instrumentation(object):
+    """
+    Base class for instrumentation hooks, every hook does nothing. Subclass
+    it to feed a tracing or metrics backend.
+    """
+
+    def on_request_start(self, method, endpoint):
+        """
+        Called before a request is sent
+        :param method: 'GET' or 'HEAD'
+        :param endpoint: the route requested, e.g. /api/statusinfo or /picon/*
+        :return: a context object handed back to on_request_end
+        """
+        return None
+
+    def on_request_end(self, method, endpoint, context, elapsed, status_code=None,
+                       num_bytes=0, error=None):
+        """
+        Called after a request has finished or failed
+        :param context: what on_request_start returned
+        :param elapsed: seconds taken
+        :param status_code: HTTP status, None if the box couldn't be reached
+        :param num_bytes: size of the body, if known
+        :param error: the Enigma2Error raised, if any
+        """
+
+    def on_cache(self, cache, hit):
+        """
+        Called on each cache lookup
+        :param cache: name of the cache, 'status', 'picon', 'picon_image' or 'disk'
+        :param hit: True if the value came from the cache
+        """
+
+
+class EndpointStats(object):
+    """ Counters and a latency histogram for one endpoint """
+
+    __slots__ = ('requests', 'errors', 'bytes', 'total_time', 'buckets')
+
+    def __init__(self, num_buckets):
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total_time = 0.0
+        self.buckets = [0] * (num_buckets + 1)
+
+    def as_dict(self, bounds):
+        """
+        Returns the stats as plain data, histogram keyed by bucket upper bound
+        """
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'total_time': self.total_time,
+            'mean_time': self.total_time / self.requests if self.requests else 0.0,
+            'histogram': dict(zip(list(bounds) + ['+Inf'], self.buckets))
+        }
+
+
+class MetricsRecorder(Instrumentation):
+    """
+    Keeps per endpoint latency histograms, byte and error counts, and cache
+    hit/miss counts in memory
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._cache = {}
+
+    def on_request_end(self, method, endpoint, context, elapsed, status_code=None,
+                       num_bytes=0, error=None):
+        key = '%s %s' % (method, endpoint)
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = EndpointStats(len(self.bounds))
+            stats.requests += 1
+            stats.bytes += num_bytes
+            stats.total_time += elapsed
+            stats.buckets[bisect_left(self.bounds, elapsed)] += 1
+            if error is not None or (status_code is not None and status_code >= 400):
+                stats.errors += 1
+
+    def on_cache(self, cache, hit):
+        with self._lock:
+            counts = self._cache.setdefault(cache, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        """
+        Returns a copy of everything recorded so far:
+        {'endpoints': {'GET /api/statusinfo': {...}}, 'caches': {'status': {'hits': 1, 'misses': 2}}}
+        """
+        with self._lock:
+            return {
+                'endpoints': {key: stats.as_dict(self.bounds) for key, stats in self._endpoints.items()},
+                'caches': {name: dict(counts) for name, counts in self._cache.items()}
+            }
+
+    def reset(self):
+        """
+        Forget everything recorded so far
+        """
+        with self._lock:
+            self._endpoints.clear()
+            self._cache.clear()
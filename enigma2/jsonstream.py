@@ -0,0 +1,151 @@
+"""
+enigma2.jsonstream
+~~~~~~~~~~~~~~~~~~~~
+
+Incremental JSON reading, so large OpenWebIf responses can be processed
+one element at a time instead of decoding the whole body at once.
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import codecs
+import json
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER_CHARS = '0123456789.eE+-'
+
+
+def _partial_number(value, buf, end):
+    """
+    Returns True if value was decoded from a number which may continue
+    past the end of buf, or stopped at a character that could extend it
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    return end >= len(buf) or buf[end] in _NUMBER_CHARS
+
+
+class JsonStream(object):
+    """
+    Reads JSON values from an iterable of bytes or str chunks, keeping only
+    the value currently being decoded in memory.
+    """
+
+    def __init__(self, chunks, encoding='utf-8'):
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder(encoding)()
+        self._buf = ''
+        self._pos = 0
+        self._exhausted = False
+
+    def _fill(self, minimum=1):
+        """
+        Read at least minimum more characters into the buffer
+        :return: False if the stream has ended
+        """
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+
+        target = len(self._buf) + minimum
+        while not self._exhausted and len(self._buf) < target:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._exhausted = True
+                self._buf += self._text_decoder.decode(b'', final=True)
+            elif isinstance(chunk, bytes):
+                self._buf += self._text_decoder.decode(chunk)
+            else:
+                self._buf += chunk
+
+        return len(self._buf) >= target
+
+    def peek(self):
+        """
+        Returns the next non whitespace character without consuming it
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON stream')
+
+    def expect(self, char):
+        """
+        Consume the next non whitespace character, which must be char
+        """
+        found = self.peek()
+        if found != char:
+            raise ValueError('Expected %r in JSON stream, found %r' % (char, found))
+        self._pos += 1
+
+    def value(self):
+        """
+        Decode and return the next complete JSON value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number cut off by a chunk boundary, e.g. '12.' or '3e', decodes
+                # as its integer prefix, so read on until the number is complete
+                if self._exhausted or not _partial_number(value, self._buf, end):
+                    self._pos = end
+                    return value
+            except ValueError:
+                if self._exhausted:
+                    raise
+            # Grow geometrically so large values are re-scanned a bounded number of times
+            self._fill(max(len(self._buf) - self._pos, 4096))
+
+    def iter_array(self):
+        """
+        Yield each element of the array at the current position
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ']':
+                self._pos += 1
+                return
+            self.expect(',')
+
+    def iter_object(self):
+        """
+        Yield the keys of the object at the current position. After each key
+        the caller must consume its value, e.g. with value() or iter_array().
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.peek() == '}':
+                self._pos += 1
+                return
+            self.expect(',')
+
+
+def iter_array_items(chunks, key):
+    """
+    Yield each element of the array stored under key in a top level JSON object
+    :param chunks: iterable of bytes or str chunks
+    :param key: name of the array
+    """
+    stream = JsonStream(chunks)
+    for name in stream.iter_object():
+        if name == key:
+            for item in stream.iter_array():
+                yield item
+        else:
+            stream.value()
@@ -0,0 +1,64 @@
+"""
+enigma2.picon
+~~~~~~~~~~~~~~~~~~~~
+
+Picon name normalisation, as outlined here
+https://github.com/OpenViX/enigma2/blob/cc963cd25d7e1c58701f55aa4b382e525031966e/lib/python/Components/Renderer/Picon.py
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import unicodedata
+from functools import lru_cache
+
+# Characters dropped from the name. A backslash is deliberately kept, as it
+# always has been.
+_EXCLUDE_CHARS = '/\'"`? ():<>|.\n'
+
+_PICON_TABLE = str.maketrans({'&': 'and', '+': 'plus', '*': 'star'})
+_PICON_TABLE.update(dict.fromkeys(map(ord, _EXCLUDE_CHARS)))
+
+
+@lru_cache(maxsize=4096)
+def get_picon_name(channel_name):
+    """
+    Get the picon name for a channel
+
+    :param channel_name: The name of the channel
+    :return: the correctly formatted name
+    """
+    if not channel_name.isascii():
+        channel_name = unicodedata.normalize('NFKD', channel_name) \
+            .encode('ASCII', 'ignore').decode('ASCII')
+
+    return channel_name.translate(_PICON_TABLE).lower()
+
+
+def get_picon_names(channel_names):
+    """
+    Get the picon names for many channels in one call
+
+    :param channel_names: iterable of channel names
+    :return: list of the formatted names, in the same order
+    """
+    return list(map(get_picon_name, channel_names))
+
+
+def picon_url_candidates(base, service_ref, channel_name):
+    """
+    List the URLs a service's picon may be found at, in order of preference:
+    the channel name, the channel name without a trailing HD and the
+    service reference style name (e.g. 1_0_1_2756_7FC_2_11A0000_0_0_0.png)
+
+    :param base: base url of the box
+    :param service_ref: the service reference
+    :param channel_name: the name of the channel
+    :return: list of urls
+    """
+    names = [get_picon_name(channel_name)]
+    if channel_name.lower().endswith('hd'):
+        names.append(get_picon_name(''.join(channel_name[:-2].split())))
+    names.append(service_ref.rstrip(':').replace(':', '_'))
+
+    return ['%s/picon/%s.png' % (base, name) for name in names]
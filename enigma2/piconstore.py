@@ -0,0 +1,282 @@
+"""
+enigma2.piconstore
+~~~~~~~~~~~~~~~~~~~~
+
+Content addressed on-disk store of picon images, so they can be served to
+many clients without asking the box again
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_LOGGER = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.json'
+
+
+class PiconStore(object):
+    """
+    Picon images kept in a directory, one file per distinct image named by
+    the sha256 of its bytes. Many keys (picon URLs) may share one file, so a
+    picon used by SD and HD variants of a channel is only stored once.
+
+    Once the files add up to more than max_bytes the least recently used
+    are removed. Images are read through open(), mmap() or path(), for
+    os.sendfile() and similar, rather than copied into memory.
+
+    The key index is written after each change, or once at the end of a
+    batch() of changes.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, clock=time.time):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        # key to digest, digest to the keys using it, and digest to
+        # [size, last used] in least recently used first order
+        self._keys = {}
+        self._refs = {}
+        self._objects = OrderedDict()
+        self._total = 0
+        self._dirty = False
+        self._batches = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), 'r', encoding='utf-8') as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return
+        objects = sorted(index.get('objects', {}).items(), key=lambda item: item[1][1])
+        for digest, entry in objects:
+            if os.path.exists(self._object_path(digest)):
+                self._objects[digest] = entry
+                self._refs[digest] = set()
+                self._total += entry[0]
+        for key, digest in index.get('keys', {}).items():
+            if digest in self._objects:
+                self._keys[key] = digest
+                self._refs[digest].add(key)
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager which writes the key index once, when the outermost
+        batch ends, rather than after every put or remove
+        """
+        with self._lock:
+            self._batches += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batches -= 1
+                done = not self._batches
+            if done:
+                self.flush()
+
+    def _changed(self):
+        with self._lock:
+            self._dirty = True
+            if self._batches:
+                return
+        self.flush()
+
+    def flush(self):
+        """
+        Write the key index, if it changed since it was last written
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                index = {'keys': dict(self._keys), 'objects': dict(self._objects)}
+                self._dirty = False
+            temp_path = None
+            try:
+                handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                with os.fdopen(handle, 'w', encoding='utf-8') as index_file:
+                    json.dump(index, index_file)
+                os.replace(temp_path, os.path.join(self.directory, INDEX_FILE))
+            except OSError as err:
+                _LOGGER.warning('Unable to write picon index: %s', err)
+                if temp_path is not None and os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, digest[:2], '%s.png' % digest)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._objects)
+
+    @property
+    def total_bytes(self):
+        """
+        Returns the size of every stored image
+        """
+        return self._total
+
+    def digest(self, key):
+        """
+        Returns the sha256 of the image stored for key, or None
+        """
+        return self._keys.get(key)
+
+    def put_stream(self, key, chunks):
+        """
+        Store an image from an iterable of byte chunks, without holding the
+        whole image in memory
+        :return: the sha256 of the image, or None if it was empty
+        """
+        sha = hashlib.sha256()
+        size = 0
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                for chunk in chunks:
+                    sha.update(chunk)
+                    size += len(chunk)
+                    temp_file.write(chunk)
+            if not size:
+                return None
+
+            digest = sha.hexdigest()
+            with self._lock:
+                if digest in self._objects:
+                    _LOGGER.debug('Picon %s is a duplicate of %s', key, digest)
+                else:
+                    os.makedirs(os.path.dirname(self._object_path(digest)), exist_ok=True)
+                    os.replace(temp_path, self._object_path(digest))
+                    self._objects[digest] = [size, 0]
+                    self._refs[digest] = set()
+                    self._total += size
+                self._use(digest)
+                if self._keys.get(key) != digest:
+                    self._unlink_key(key)
+                self._keys[key] = digest
+                self._refs[digest].add(key)
+                self._evict(keep=digest)
+            self._changed()
+            return digest
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def put(self, key, data):
+        """
+        Store an image from bytes
+        :return: the sha256 of the image, or None if it was empty
+        """
+        return self.put_stream(key, [data])
+
+    def _use(self, digest):
+        self._objects[digest][1] = self._clock()
+        self._objects.move_to_end(digest)
+
+    def _unlink_key(self, key):
+        """
+        Forget key, removing its image if no other key uses it
+        """
+        digest = self._keys.pop(key, None)
+        if digest is None:
+            return
+        refs = self._refs[digest]
+        refs.discard(key)
+        if not refs:
+            self._remove_object(digest)
+
+    def _remove_object(self, digest):
+        size, _ = self._objects.pop(digest)
+        self._total -= size
+        for key in self._refs.pop(digest):
+            del self._keys[key]
+        try:
+            os.remove(self._object_path(digest))
+        except OSError:
+            pass
+
+    def _evict(self, keep=None):
+        # Least recently used first, stopping at the image just stored
+        while self._total > self.max_bytes:
+            digest = next(iter(self._objects))
+            if digest == keep:
+                break
+            self._remove_object(digest)
+
+    def _touch(self, key):
+        """
+        Returns the file path for key, marking it as used, or None
+        """
+        with self._lock:
+            digest = self._keys.get(key)
+            if digest is None:
+                return None
+            self._use(digest)
+            return self._object_path(digest)
+
+    def path(self, key):
+        """
+        Returns the path of the image file for key, or None if not stored.
+        The file is replaced, never changed, so it is safe to serve directly.
+        """
+        return self._touch(key)
+
+    def open(self, key):
+        """
+        Returns the image for key as a binary file object, or None
+        """
+        path = self._touch(key)
+        if path is None:
+            return None
+        try:
+            return open(path, 'rb')
+        except OSError:
+            return None
+
+    def mmap(self, key):
+        """
+        Returns the image for key as a read only mmap, or None. Close it once done.
+        """
+        image_file = self.open(key)
+        if image_file is None:
+            return None
+        with image_file:
+            return mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def remove(self, key):
+        """
+        Forget key. The image is removed once no other key uses it.
+        """
+        with self._lock:
+            if key not in self._keys:
+                return
+            self._unlink_key(key)
+        self._changed()
+
+    def clear(self):
+        """
+        Remove every image
+        """
+        with self.batch():
+            with self._lock:
+                for digest in list(self._objects):
+                    self._remove_object(digest)
+            self._changed()
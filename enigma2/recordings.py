@@ -0,0 +1,226 @@
+"""
+enigma2.recordings
+~~~~~~~~~~~~~~~~~~~~
+
+Local index of the recordings on a box, so they can be browsed and
+searched without downloading the movie list again
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import logging
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+_LOGGER = logging.getLogger(__name__)
+
+Recording = namedtuple('Recording', ['filename', 'service_ref', 'title', 'description', 'channel',
+                                     'begin', 'length', 'size', 'location', 'tags'])
+Recording.__doc__ = """ One recording from <host>/api/movielist """
+
+ScanResult = namedtuple('ScanResult', ['added', 'updated', 'removed', 'requests', 'unchanged'])
+ScanResult.__doc__ = """ Summary of a RecordingIndex.scan, unchanged counts locations """
+
+ORDERS = ('date', 'title', 'channel', 'size')
+
+
+def recording_from_json(movie_json, location):
+    """
+    Convert one entry of a <host>/api/movielist response into a Recording
+    """
+    return Recording(movie_json['filename'], movie_json.get('serviceref', ''),
+                     movie_json.get('eventname', ''), movie_json.get('description', ''),
+                     movie_json.get('servicename', ''), int(movie_json.get('recordingtime') or 0),
+                     movie_json.get('length', ''), int(movie_json.get('filesize') or 0),
+                     location, movie_json.get('tags', ''))
+
+
+class RecordingIndex(object):
+    """
+    The recordings of a box, indexed by title, channel, date and size.
+
+    scan() downloads the movie list of each location as a stream. A location
+    whose list is unchanged (same ETag, or same body) leaves the index
+    alone; otherwise only the recordings added, changed or removed there are
+    touched. The sorted indexes are rebuilt lazily on the next query.
+    """
+
+    def __init__(self, recordings=()):
+        self._by_filename = {}
+        self._by_location = {}
+        # Location to (etag, body hash) of the last scan
+        self._validators = {}
+        self._dirty = True
+        self._by_title = {}
+        self._by_channel = {}
+        self._orders = {}
+        for recording in recordings:
+            self._add(recording)
+
+    def __len__(self):
+        return len(self._by_filename)
+
+    def __contains__(self, filename):
+        return filename in self._by_filename
+
+    def __iter__(self):
+        return iter(self.page(0, None))
+
+    @property
+    def locations(self):
+        """
+        Returns the locations with recordings in the index
+        """
+        return [location for location, filenames in self._by_location.items() if filenames]
+
+    def get(self, filename):
+        """
+        Returns the Recording for a file name, or None
+        """
+        return self._by_filename.get(filename)
+
+    def _add(self, recording):
+        self._by_filename[recording.filename] = recording
+        self._by_location.setdefault(recording.location, set()).add(recording.filename)
+        self._dirty = True
+
+    def _remove(self, filename):
+        recording = self._by_filename.pop(filename)
+        self._by_location[recording.location].discard(filename)
+        self._dirty = True
+
+    def scan(self, connection, locations=None):
+        """
+        Bring the index up to date with the box
+
+        :param connection: Enigma2Connection to download from
+        :param locations: directories to scan, by default every recording
+        location of the box. Recordings in other locations are kept.
+        :return: ScanResult
+        """
+        if locations is None:
+            locations = connection.get_recording_locations()
+
+        added = updated = removed = unchanged = 0
+        for location in locations:
+            etag, body_hash = self._validators.get(location, (None, None))
+            validators = {}
+            recordings = [recording_from_json(movie_json, location) for movie_json in
+                          connection.iter_movie_list(location, etag=etag, validators=validators)]
+            if validators.get('not_modified'):
+                unchanged += 1
+                continue
+            self._validators[location] = (validators.get('etag'), validators.get('hash'))
+            if body_hash is not None and validators.get('hash') == body_hash:
+                unchanged += 1
+                continue
+
+            current = set()
+            for recording in recordings:
+                current.add(recording.filename)
+                previous = self._by_filename.get(recording.filename)
+                if previous == recording:
+                    continue
+                if previous is None:
+                    added += 1
+                else:
+                    self._remove(previous.filename)
+                    updated += 1
+                self._add(recording)
+            for filename in list(self._by_location.get(location, ())):
+                if filename not in current:
+                    self._remove(filename)
+                    removed += 1
+
+        _LOGGER.debug('Recordings scan: %d added, %d updated, %d removed, %d locations unchanged',
+                      added, updated, removed, unchanged)
+        return ScanResult(added, updated, removed, len(locations), unchanged)
+
+    def _rebuild(self):
+        if not self._dirty:
+            return
+        recordings = list(self._by_filename.values())
+        self._by_title = {}
+        self._by_channel = {}
+        for recording in recordings:
+            self._by_title.setdefault(recording.title.casefold(), []).append(recording)
+            self._by_channel.setdefault(recording.channel.casefold(), []).append(recording)
+
+        by_date = sorted(recordings, key=lambda recording: (recording.begin, recording.filename))
+        by_size = sorted(recordings, key=lambda recording: (recording.size, recording.filename))
+        self._orders = {
+            'date': (by_date, [recording.begin for recording in by_date]),
+            'title': (sorted(recordings, key=lambda recording: (recording.title.casefold(),
+                                                                recording.begin)), None),
+            'channel': (sorted(recordings, key=lambda recording: (recording.channel.casefold(),
+                                                                  recording.begin)), None),
+            'size': (by_size, [recording.size for recording in by_size])
+        }
+        self._dirty = False
+
+    def page(self, offset=0, limit=50, order='date', reverse=False):
+        """
+        Browse the recordings a page at a time
+
+        :param offset: number of recordings to skip
+        :param limit: page size, None for everything after offset
+        :param order: one of 'date', 'title', 'channel' or 'size'
+        :param reverse: if True, newest, largest or Z first
+        :return: list of Recording
+        """
+        if order not in ORDERS:
+            raise ValueError('order must be one of %s' % ', '.join(ORDERS))
+        self._rebuild()
+        ordered = self._orders[order][0]
+        if reverse:
+            end = len(ordered) - offset
+            start = 0 if limit is None else max(end - limit, 0)
+            return ordered[start:max(end, 0)][::-1]
+        return ordered[offset:None if limit is None else offset + limit]
+
+    def find_by_title(self, title, exact=False):
+        """
+        Search the titles, ignoring case
+        :param exact: if True, only recordings with exactly this title
+        :return: list of Recording, oldest first
+        """
+        self._rebuild()
+        folded = title.casefold()
+        if exact:
+            matches = list(self._by_title.get(folded, ()))
+        else:
+            matches = [recording for name, recordings in self._by_title.items() if folded in name
+                       for recording in recordings]
+        return sorted(matches, key=lambda recording: recording.begin)
+
+    def find_by_channel(self, channel):
+        """
+        Returns the recordings of a channel, ignoring case, oldest first
+        """
+        self._rebuild()
+        return sorted(self._by_channel.get(channel.casefold(), ()), key=lambda recording: recording.begin)
+
+    def between(self, start, end):
+        """
+        Returns the recordings made from start up to end (unix timestamps), oldest first
+        """
+        self._rebuild()
+        ordered, begins = self._orders['date']
+        return ordered[bisect_left(begins, start):bisect_left(begins, end)]
+
+    def by_size(self, minimum=0, maximum=None):
+        """
+        Returns the recordings whose size in bytes is between minimum and maximum, smallest first
+        """
+        self._rebuild()
+        ordered, sizes = self._orders['size']
+        last = len(sizes) if maximum is None else bisect_right(sizes, maximum)
+        return ordered[bisect_left(sizes, minimum):last]
+
+    @property
+    def total_size(self):
+        """
+        Returns the size in bytes of every recording
+        """
+        return sum(recording.size for recording in self._by_filename.values())
@@ -0,0 +1,165 @@
+"""
+enigma2.resilience
+~~~~~~~~~~~~~~~~~~~~
+
+Retries and circuit breaking for boxes which are rebooting, in deep standby
+or otherwise not answering, and rate limiting for boxes which are easily
+overwhelmed
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import logging
+import random
+import threading
+import time
+
+from enigma2.error import Enigma2CircuitOpenError
+
+_LOGGER = logging.getLogger(__name__)
+
+# pylint: disable=too-many-arguments
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class RetryPolicy(object):
+    """
+    Bounded retries with jittered exponential backoff. Only requests which
+    don't change the box (reads) are retried.
+    """
+
+    def __init__(self, retries=2, backoff=0.2, max_backoff=2, jitter=0.5,
+                 sleep=time.sleep, rand=random.random):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.sleep = sleep
+        self._rand = rand
+
+    def delays(self):
+        """
+        Yield the wait before each retry
+        """
+        for attempt in range(self.retries):
+            delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+            # Spread retries from many threads/boxes so they don't line up
+            yield delay * (1 - self.jitter + self.jitter * self._rand())
+
+
+class CircuitBreaker(object):
+    """
+    Stops requests to a box after failure_threshold consecutive failures.
+    Once recovery_timeout seconds have passed a single caller is allowed to
+    probe the box; success closes the circuit again, failure re-opens it.
+
+    The current state is available as ``state`` and changes are reported to
+    the optional on_state_change(old, new) callback.
+    """
+
+    def __init__(self, failure_threshold=3, recovery_timeout=30,
+                 clock=time.monotonic, on_state_change=None):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.on_state_change = on_state_change
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def state(self):
+        """
+        Returns 'closed', 'open' or 'half_open'. An open circuit reads as
+        'half_open' once recovery_timeout has passed, as the next request
+        will probe the box.
+        """
+        with self._lock:
+            if self._recovery_due():
+                return STATE_HALF_OPEN
+            return self._state
+
+    @property
+    def is_open(self):
+        """
+        Returns True while requests are being refused
+        """
+        with self._lock:
+            return self._state != STATE_CLOSED and not self._recovery_due()
+
+    def _recovery_due(self):
+        return self._state == STATE_OPEN and self._clock() - self._opened_at >= self.recovery_timeout
+
+    def _set_state(self, state):
+        old, self._state = self._state, state
+        if old != state:
+            _LOGGER.debug('Circuit %s -> %s', old, state)
+            if self.on_state_change is not None:
+                self.on_state_change(old, state)
+
+    def before_request(self):
+        """
+        Call before sending a request
+        :return: True if the caller must probe the box first
+        :raises Enigma2CircuitOpenError: while the circuit is open
+        """
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return False
+            if self._recovery_due():
+                self._set_state(STATE_HALF_OPEN)
+                return True
+        raise Enigma2CircuitOpenError('Box is not responding, not sending request')
+
+    def record_success(self):
+        """
+        Call after the box answered
+        """
+        with self._lock:
+            self._failures = 0
+            self._set_state(STATE_CLOSED)
+
+    def record_failure(self):
+        """
+        Call after the box failed to answer
+        """
+        with self._lock:
+            self._failures += 1
+            if self._state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                self._set_state(STATE_OPEN)
+
+
+class RateLimiter(object):
+    """
+    Spaces requests so no more than rate are started per second, after an
+    initial burst. Safe to share between threads.
+    """
+
+    def __init__(self, rate=5, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def acquire(self):
+        """
+        Wait until another request may start
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve a token now, waiting outside the lock for it to accrue
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            self._sleep(wait)
@@ -0,0 +1,662 @@
+"""
+enigma2.simulator
+~~~~~~~~~~~~~~~~~~~~
+
+Local OpenWebIf simulators for benchmarks and tests, with configurable
+latency, payload sizes and injectable faults. Each box keeps its own
+standby, volume, current service and recording state, which the command
+endpoints change.
+
+    with OpenWebIfSimulator(num_services=10000, latency=0.01) as box:
+        device = Enigma2Connection(url=box.url)
+
+    with SimulatorFleet(200) as boxes:
+        fleet.connect(boxes.connection_kwargs(lazy=True))
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+_LOGGER = logging.getLogger(__name__)
+
+# pylint: disable=too-many-arguments,too-many-instance-attributes,invalid-name
+
+# 1x1 transparent PNG served for every picon
+PICON_PNG = (b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00'
+             b'\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\rIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05'
+             b'\x18\xd8N\x00\x00\x00\x00IEND\xaeB`\x82')
+
+
+FAULT_SLOW = 'slow'
+FAULT_UNAUTHORIZED = 'unauthorized'
+FAULT_DROP = 'drop'
+FAULT_ERROR = 'error'
+
+VOLUME_STEP = 5
+
+MOVIE_LOCATION = '/media/hdd/movie/'
+
+
+class _Server(ThreadingHTTPServer):
+    """ Threaded server which doesn't print clients hanging up """
+
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        ThreadingHTTPServer.__init__(self, *args, **kwargs)
+        self._open = set()
+        self._open_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._open_lock:
+            self._open.add(request)
+        ThreadingHTTPServer.process_request(self, request, client_address)
+
+    def shutdown_request(self, request):
+        with self._open_lock:
+            self._open.discard(request)
+        ThreadingHTTPServer.shutdown_request(self, request)
+
+    def close_connections(self):
+        """ Hang up on every keep-alive connection still open """
+        with self._open_lock:
+            requests = list(self._open)
+        for request in requests:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            # Clients time out on slow responses, that's expected
+            _LOGGER.debug('Client %s hung up', client_address)
+            return
+        ThreadingHTTPServer.handle_error(self, request, client_address)
+
+
+def _service_ref(number):
+    return '1:0:1:%X:%X:2:11A0000:0:0:0:' % (number + 1, 0x800 + number // 1000)
+
+
+class OpenWebIfSimulator(object):
+    """
+    One simulated box, served by a thread in this process
+
+    :param num_services: number of services, spread over bouquets of bouquet_size
+    :param num_events: number of EPG events, spread evenly over the services
+    :param latency: seconds added to every response
+    :param error_rate: fraction of requests answered with a 500
+    :param picon_ratio: fraction of services which have a picon
+    :param username: if set with password, requests without these credentials get a 401
+    :param send_etags: if True the service list, about and movie list
+    responses carry an ETag and If-None-Match is answered with 304
+    :param num_movies: number of recordings generated in MOVIE_LOCATION
+    :param tuners: number of tuners, timers which would need more are refused
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, num_services=100, bouquet_size=500,
+                 num_events=1000, latency=0.0, error_rate=0.0, picon_ratio=0.5, seed=0,
+                 username=None, password=None, send_etags=False, tuners=2, num_movies=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.send_etags = send_etags
+        self.tuners = tuners
+        # Requests served, and how many of them were failed by an injected fault
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._faults = []
+        self._authorization = None
+        if username is not None and password is not None:
+            credentials = ('%s:%s' % (username, password)).encode('utf-8')
+            self._authorization = 'Basic %s' % base64.b64encode(credentials).decode('ascii')
+
+        # Box state, changed by the command endpoints
+        self.in_standby = False
+        self.volume = 50
+        self.muted = False
+        self.current = 0
+        self.paused = False
+        self.recordings = []
+        self.timers = []
+        self.movies = {MOVIE_LOCATION: []}
+
+        self.services = [(_service_ref(number), 'Channel %d' % number) for number in range(num_services)]
+        self.picons = set('channel%d.png' % number for number in range(num_services)
+                          if self._random.random() < picon_ratio)
+        self.bouquets = []
+        for start in range(0, num_services, bouquet_size):
+            number = len(self.bouquets)
+            self.bouquets.append({
+                'servicename': 'Bouquet %d' % number,
+                'servicereference': '1:7:1:0:0:0:0:0:0:0:FROM BOUQUET "userbouquet.sim%d.tv" ORDER BY bouquet'
+                                    % number,
+                'subservices': [{'servicereference': ref, 'servicename': name, 'program': 0, 'pos': pos}
+                                for pos, (ref, name) in enumerate(self.services[start:start + bouquet_size])]
+            })
+
+        self.events = self._build_events(num_events)
+        for number in range(num_movies):
+            self.add_movie('Programme %d' % (number % 97), service=number % max(num_services, 1),
+                           begin=1500000000 + number * 3600)
+        self._all_services = None
+        self.etags = {}
+        self.bouquets_changed()
+
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    def _build_events(self, num_events):
+        events = []
+        if not self.services:
+            return events
+        start = int(time.time()) // 3600 * 3600
+        per_service = max(num_events // len(self.services), 1)
+        for number in range(num_events):
+            sref, sname = self.services[number % len(self.services)]
+            slot = number // len(self.services)
+            begin = start + slot * 1800
+            events.append({
+                'id': number, 'sref': sref, 'sname': sname,
+                'title': 'Programme %d' % (number % (per_service * 7 + 1)),
+                'shortdesc': 'Episode %d' % slot, 'longdesc': '',
+                'begin_timestamp': begin, 'duration_sec': 1800, 'duration': 30,
+                'begin': time.strftime('%H:%M', time.localtime(begin)),
+                'end': time.strftime('%H:%M', time.localtime(begin + 1800)),
+                'date': time.strftime('%a %d.%m.%Y', time.localtime(begin)),
+                'picon': '/images/default_picon.png', 'now_timestamp': None
+            })
+        return events
+
+    @property
+    def port(self):
+        """
+        Returns the port the box listens on
+        """
+        return self._server.server_address[1]
+
+    @property
+    def url(self):
+        """
+        Returns the base url of the box
+        """
+        return 'http://%s:%d' % (self._server.server_address[0], self.port)
+
+    def start(self):
+        """
+        Start serving in a background thread
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving, hanging up on any open connections
+        """
+        if self._thread is None:
+            return
+        self._thread = None
+        self._server.shutdown()
+        self._server.server_close()
+        self._server.close_connections()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+
+    def bouquets_changed(self):
+        """
+        Call after changing self.bouquets so the service list is served anew
+        """
+        self._all_services = json.dumps({'services': self.bouquets, 'result': True}).encode('utf-8')
+        self.etags['/api/getallservices'] = '"%s"' % hashlib.sha1(self._all_services).hexdigest()
+        self.etags['/api/about'] = '"%s"' % hashlib.sha1(json.dumps(self.about()).encode('utf-8')).hexdigest()
+
+    def add_movie(self, title, service=0, begin=None, size=None, location=MOVIE_LOCATION):
+        """
+        Add a recording, shaped like an entry of /api/movielist
+        :param service: index of the service it was recorded from
+        :return: the movie dict
+        """
+        _, service_name = self.services[service] if self.services else ('', '')
+        begin = int(time.time()) if begin is None else begin
+        file_name = '%s%s - %s - %s.ts' % (location, time.strftime('%Y%m%d %H%M', time.gmtime(begin)),
+                                           service_name, title)
+        movie = {
+            'fullname': '1:0:0:0:0:0:0:0:0:0:%s' % file_name, 'serviceref': '1:0:0:0:0:0:0:0:0:0:%s' % file_name,
+            'filename': file_name, 'filename_stripped': file_name[len(location):],
+            'eventname': title, 'description': '', 'descriptionExtended': '', 'servicename': service_name,
+            'recordingtime': begin, 'begintime': time.strftime('%a %b %d %H:%M:%S %Y', time.gmtime(begin)),
+            'length': '30:00', 'tags': '', 'lastseen': 0,
+            'filesize': self._random.randrange(500, 5000) * 1000000 if size is None else size
+        }
+        with self._lock:
+            self.movies.setdefault(location, []).append(movie)
+        return movie
+
+    def remove_movie(self, file_name):
+        """
+        Delete a recording
+        """
+        with self._lock:
+            for movies in self.movies.values():
+                movies[:] = [movie for movie in movies if movie['filename'] != file_name]
+
+    def etag(self, path, query):
+        """
+        Returns the ETag of a response, or None if it has none
+        """
+        if path == '/api/movielist':
+            body = json.dumps(self._movie_list(query.get('dirname', [MOVIE_LOCATION])[0]))
+            return '"%s"' % hashlib.sha1(body.encode('utf-8')).hexdigest()
+        return self.etags.get(path)
+
+    def _movie_list(self, location):
+        with self._lock:
+            return {'result': True, 'directory': location, 'bookmarks': [],
+                    'movies': [dict(movie) for movie in self.movies.get(location, ())]}
+
+    def rename_service(self, service_ref, name):
+        """
+        Rename a service in every bouquet holding it
+        """
+        for bouquet in self.bouquets:
+            for service in bouquet['subservices']:
+                if service['servicereference'] == service_ref:
+                    service['servicename'] = name
+        self.bouquets_changed()
+
+    def status_info(self):
+        """
+        Returns the /api/statusinfo response for the current state
+        """
+        with self._lock:
+            status = {
+                'muted': self.muted, 'volume': self.volume, 'transcoding': False,
+                'isRecording': 'true' if self.recordings else 'false', 'currservice_filename': ''
+            }
+            if self.in_standby or not self.services:
+                # OpenWebIf reports standby as a string and drops the station
+                status.update({'inStandby': 'true', 'currservice_begin': '', 'currservice_end': '',
+                               'currservice_name': 'N/A', 'currservice_fulldescription': 'N/A',
+                               'currservice_description': ''})
+                return status
+            sref, sname = self.services[self.current]
+            status.update({'inStandby': False, 'currservice_station': sname, 'currservice_serviceref': sref,
+                           'currservice_name': 'Programme %d' % self.current,
+                           'currservice_begin': '21:00', 'currservice_end': '21:30',
+                           'currservice_description': '', 'currservice_fulldescription': ''})
+            return status
+
+    def record(self, service_ref=None):
+        """
+        Start recording a service, the current one by default
+        """
+        with self._lock:
+            if service_ref is None and self.services:
+                service_ref = self.services[self.current][0]
+            self.recordings.append(service_ref)
+
+    def stop_recording(self, service_ref=None):
+        """
+        Stop recording a service, or every recording by default
+        """
+        with self._lock:
+            if service_ref is None:
+                del self.recordings[:]
+            elif service_ref in self.recordings:
+                self.recordings.remove(service_ref)
+
+    def inject_fault(self, kind, rate=1.0, path=None, delay=1.0):
+        """
+        Make some requests misbehave, until clear_faults() is called
+
+        :param kind: FAULT_SLOW to wait delay seconds first, FAULT_UNAUTHORIZED
+        to answer 401, FAULT_DROP to close the connection without answering
+        or FAULT_ERROR to answer 500
+        :param rate: fraction of requests affected
+        :param path: only affect requests whose path starts with this
+        :param delay: seconds a FAULT_SLOW request waits
+        """
+        if kind not in (FAULT_SLOW, FAULT_UNAUTHORIZED, FAULT_DROP, FAULT_ERROR):
+            raise ValueError('Unknown fault %s' % kind)
+        with self._lock:
+            self._faults.append((kind, rate, path, delay))
+
+    def clear_faults(self):
+        """
+        Remove every injected fault
+        """
+        with self._lock:
+            del self._faults[:]
+
+    def about(self):
+        """
+        Returns the /api/about response
+        """
+        return {'info': {'webifver': 'OWIF 1.2.7', 'imagedistro': 'simulator', 'brand': 'Simulator',
+                         'boxtype': 'sim1', 'uptime': '1d 00:00',
+                         'tuners': [{'name': 'Tuner %s' % chr(65 + number), 'type': 'Simulated (DVB-S2)',
+                                     'rec': '', 'live': ''} for number in range(self.tuners)]},
+                'service': {}}
+
+    def handle(self, method, path, query):
+        """
+        Work out the response for a request
+        :return: (status code, body bytes, content type)
+        """
+        # pylint: disable=too-many-return-statements
+        if path == '/lcd4linux/dpf.png':
+            return 200, PICON_PNG, 'image/png'
+        if method == 'HEAD' or path.startswith('/picon/'):
+            if path.startswith('/picon/') and path[len('/picon/'):] in self.picons:
+                return 200, PICON_PNG, 'image/png'
+            return 404, b'', 'text/plain'
+        if path == '/grab':
+            return self._screenshot(query.get('format', ['jpg'])[0], query.get('r', [None])[0])
+
+        if path == '/api/statusinfo':
+            return self._json(self.status_info())
+        if path == '/api/about':
+            return self._json(self.about())
+        if path == '/api/getallservices':
+            return 200, self._all_services, 'application/json'
+        if path == '/api/epgsearch':
+            search = query.get('search', [''])[0].lower()
+            return self._json({'events': [e for e in self.events if search in e['title'].lower()],
+                               'result': True})
+        if path in ('/api/epgmulti', '/api/epgservice'):
+            return self._json({'events': self._epg(query), 'result': True})
+        if path == '/api/vol':
+            return self._json(self._volume(query.get('set', [''])[0]))
+        if path == '/api/powerstate':
+            return self._json(self._power(query.get('newstate', [''])[0]))
+        if path == '/api/remotecontrol':
+            return self._json(self._remote_control(query.get('command', [''])[0]))
+        if path == '/api/getlocations':
+            return self._json({'result': True, 'default': MOVIE_LOCATION, 'locations': sorted(self.movies)})
+        if path == '/api/movielist':
+            return self._json(self._movie_list(query.get('dirname', [MOVIE_LOCATION])[0]))
+        if path == '/api/timerlist':
+            with self._lock:
+                return self._json({'result': True, 'timers': [dict(timer) for timer in self.timers],
+                                   'locations': ['/media/hdd/movie/']})
+        if path in ('/api/timeradd', '/api/timerdelete', '/api/timertogglestatus'):
+            args = dict((key, values[0]) for key, values in query.items())
+            return self._json(self._timer(path, args))
+        return 404, b'', 'text/plain'
+
+    @staticmethod
+    def _screenshot(image_format, resolution):
+        """
+        A stand in for a screen grab, about one byte per eight pixels of a 16:9 frame
+        """
+        width = int(resolution) if resolution else 1920
+        size = width * (width * 9 // 16) // 8
+        if image_format == 'png':
+            return 200, PICON_PNG[:8] + b'\x00' * size, 'image/png'
+        return 200, b'\xff\xd8' + b'\x00' * size + b'\xff\xd9', 'image/jpeg'
+
+    def _timer(self, path, args):
+        # pylint: disable=too-many-return-statements
+        try:
+            key = (args['sRef'], int(args['begin']), int(args['end']))
+        except (KeyError, ValueError):
+            return {'result': False, 'message': 'Missing or invalid sRef, begin or end'}
+
+        with self._lock:
+            found = [timer for timer in self.timers
+                     if (timer['serviceref'], timer['begin'], timer['end']) == key]
+            if path == '/api/timerdelete':
+                if not found:
+                    return {'result': False, 'message': 'No matching Timer found'}
+                self.timers.remove(found[0])
+                return {'result': True, 'message': "The timer '%s' has been deleted successfully"
+                                                   % found[0]['name']}
+            if path == '/api/timertogglestatus':
+                if not found:
+                    return {'result': False, 'message': 'No matching Timer found'}
+                found[0]['disabled'] = 0 if found[0]['disabled'] else 1
+                return {'result': True, 'disabled': bool(found[0]['disabled']),
+                        'message': "Timer '%s' %s" % (found[0]['name'],
+                                                      'disabled' if found[0]['disabled'] else 'enabled')}
+
+            timer = {'serviceref': key[0], 'begin': key[1], 'end': key[2],
+                     'servicename': dict(self.services).get(key[0], ''),
+                     'name': args.get('name', ''), 'description': args.get('description', ''),
+                     'eit': int(args.get('eit') or 0), 'disabled': int(args.get('disabled') or 0),
+                     'justplay': int(args.get('justplay') or 0),
+                     'afterevent': int(args.get('afterevent') or 3), 'state': 0,
+                     'duration': key[2] - key[1]}
+            if found:
+                return {'result': False, 'message': 'Timer already exists'}
+            if not timer['disabled'] and not timer['justplay'] and \
+                    self._running_at_most(key[1], key[2]) >= self.tuners:
+                return {'result': False, 'message': 'Conflicting Timer(s) detected! %s' % timer['name']}
+            self.timers.append(timer)
+            return {'result': True, 'message': "Timer '%s' added" % timer['name']}
+
+    def _running_at_most(self, begin, end):
+        """ The most recording timers running at once during [begin, end) """
+        recording = [timer for timer in self.timers if not (timer['disabled'] or timer['justplay'])]
+        recording = [timer for timer in recording if timer['begin'] < end and timer['end'] > begin]
+        points = [begin] + [timer['begin'] for timer in recording if timer['begin'] > begin]
+        return max([0] + [sum(1 for timer in recording if timer['begin'] <= point < timer['end'])
+                          for point in points])
+
+    def _volume(self, command):
+        with self._lock:
+            if command == 'up':
+                self.volume = min(self.volume + VOLUME_STEP, 100)
+                message = 'Volume changed'
+            elif command == 'down':
+                self.volume = max(self.volume - VOLUME_STEP, 0)
+                message = 'Volume changed'
+            elif command == 'mute':
+                self.muted = not self.muted
+                message = 'Mute toggled'
+            elif command.startswith('set') and command[3:].isdigit():
+                self.volume = min(int(command[3:]), 100)
+                message = 'Volume set to %d' % self.volume
+            elif command == 'state':
+                message = 'State'
+            else:
+                return {'result': False, 'message': 'Unknown Volume command %s' % command}
+            return {'result': True, 'message': message, 'current': self.volume, 'ismute': self.muted}
+
+    def _power(self, new_state):
+        with self._lock:
+            # 0 toggles standby, 4 wakes up and 5 goes to standby
+            if new_state == '0':
+                self.in_standby = not self.in_standby
+            elif new_state == '4':
+                self.in_standby = False
+            elif new_state == '5':
+                self.in_standby = True
+            return {'result': True, 'instandby': self.in_standby}
+
+    def _remote_control(self, command):
+        with self._lock:
+            if command == '402' and self.services:
+                self.current = (self.current + 1) % len(self.services)
+            elif command == '403' and self.services:
+                self.current = (self.current - 1) % len(self.services)
+            elif command == '207':
+                self.paused = not self.paused
+            elif not command.isdigit():
+                return {'result': False, 'message': 'The command is not a valid integer'}
+            return {'result': True, 'message': "RC command '%s' has been issued" % command}
+
+    def _epg(self, query):
+        start = int(query.get('time', ['0'])[0])
+        if 'sRef' in query:
+            refs = set(query['sRef'])
+        else:
+            bouquet = [b for b in self.bouquets if b['servicereference'] == query.get('bRef', [''])[0]]
+            refs = set(s['servicereference'] for b in bouquet for s in b['subservices'])
+        return [e for e in self.events
+                if e['sref'] in refs and e['begin_timestamp'] + e['duration_sec'] > start]
+
+    @staticmethod
+    def _json(body):
+        return 200, json.dumps(body).encode('utf-8'), 'application/json'
+
+    def _fault(self, path, authorization):
+        """
+        Pick the faults for a request
+        :return: (seconds to delay, fault or None)
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency
+            fault = None
+            for kind, rate, prefix, fault_delay in self._faults:
+                if prefix is not None and not path.startswith(prefix):
+                    continue
+                if rate < 1 and self._random.random() >= rate:
+                    continue
+                if kind == FAULT_SLOW:
+                    delay += fault_delay
+                elif fault is None:
+                    fault = kind
+            if fault is None and self.error_rate and self._random.random() < self.error_rate:
+                fault = FAULT_ERROR
+            if fault is not None:
+                self.errors += 1
+        if fault is None and self._authorization is not None and authorization != self._authorization:
+            fault = FAULT_UNAUTHORIZED
+        return delay, fault
+
+    def _handler_class(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """ Routes requests to the simulator """
+
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, don't let Nagle delay the body
+            disable_nagle_algorithm = True
+
+            def _respond(self):
+                parts = urlsplit(self.path)
+                delay, fault = simulator._fault(  # pylint: disable=protected-access
+                    parts.path, self.headers.get('Authorization'))
+                if delay:
+                    time.sleep(delay)
+                if fault == FAULT_DROP:
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                query = parse_qs(parts.query)
+                etag = simulator.etag(parts.path, query) if simulator.send_etags else None
+                if fault == FAULT_UNAUTHORIZED:
+                    status, body, content_type = 401, b'', 'text/plain'
+                elif fault == FAULT_ERROR:
+                    status, body, content_type = 500, b'', 'text/plain'
+                elif etag is not None and self.headers.get('If-None-Match') == etag:
+                    status, body, content_type = 304, b'', 'text/plain'
+                else:
+                    status, body, content_type = simulator.handle(self.command, parts.path,
+                                                                  query)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                if etag is not None and status in (200, 304):
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            do_GET = _respond
+            do_HEAD = _respond
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        return Handler
+
+
+class SimulatorFleet(object):
+    """
+    Many simulated boxes in one process, each on its own port with its own
+    state. Keyword arguments are passed to every OpenWebIfSimulator, each
+    box gets a different seed.
+    """
+
+    def __init__(self, count, num_services=20, num_events=0, **kwargs):
+        self.boxes = {}
+        for number in range(count):
+            box = OpenWebIfSimulator(num_services=num_services, num_events=num_events,
+                                     seed=number, **kwargs)
+            self.boxes['box%d' % number] = box
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __getitem__(self, name):
+        return self.boxes[name]
+
+    def start(self):
+        """
+        Start serving every box
+        """
+        for box in self.boxes.values():
+            box.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving every box
+        """
+        for box in self.boxes.values():
+            box.stop()
+
+    def connection_kwargs(self, **kwargs):
+        """
+        Returns a dict of box name to connection keyword arguments, for
+        Enigma2Fleet.connect(). Keyword arguments are added to each.
+        """
+        boxes = {}
+        for name, box in self.boxes.items():
+            boxes[name] = dict(kwargs, url=box.url)
+        return boxes
+
+    def inject_fault(self, kind, fraction=1.0, **kwargs):
+        """
+        Inject a fault into a fraction of the boxes, see OpenWebIfSimulator.inject_fault
+        :return: list of names of the affected boxes
+        """
+        names = sorted(self.boxes)[:int(round(len(self.boxes) * fraction))]
+        for name in names:
+            self.boxes[name].inject_fault(kind, **kwargs)
+        return names
+
+    def clear_faults(self):
+        """
+        Remove every injected fault from every box
+        """
+        for box in self.boxes.values():
+            box.clear_faults()
@@ -0,0 +1,327 @@
+"""
+enigma2.timers
+~~~~~~~~~~~~~~~~~~~~
+
+Recording timers and a local index of them, so overlaps and tuner
+conflicts for a proposed recording can be found without asking the box.
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import random
+import threading
+from collections import namedtuple
+
+
+class Timer(namedtuple('Timer', ['service_ref', 'service_name', 'name', 'description',
+                                 'begin', 'end', 'eit', 'disabled', 'justplay'])):
+    """ A timer on the box. OpenWebIf identifies timers by service, begin and end. """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_json(cls, timer_json):
+        """
+        Build a Timer from one entry of a <host>/api/timerlist response
+        """
+        return cls(timer_json['serviceref'], timer_json.get('servicename', ''),
+                   timer_json.get('name', ''), timer_json.get('description', ''),
+                   int(timer_json['begin']), int(timer_json['end']), int(timer_json.get('eit') or 0),
+                   bool(int(timer_json.get('disabled', 0))), bool(int(timer_json.get('justplay', 0))))
+
+    @property
+    def key(self):
+        """
+        Returns (service reference, begin, end), which identifies the timer
+        """
+        return self.service_ref, self.begin, self.end
+
+    @property
+    def uses_tuner(self):
+        """
+        Returns True if the timer records, so holds a tuner from begin to end
+        """
+        return not self.disabled and not self.justplay
+
+
+OUTCOME_ADDED = 'added'
+OUTCOME_DUPLICATE = 'duplicate'
+OUTCOME_CONFLICT = 'conflict'
+OUTCOME_FAILED = 'failed'
+
+TimerOutcome = namedtuple('TimerOutcome', ['event', 'timer', 'status', 'message'])
+TimerOutcome.__doc__ = """ What happened to one EPG event in a bulk timer add """
+
+
+def timer_for_event(event, margin_before=0, margin_after=0):
+    """
+    Build the Timer which records an EPG event
+    :param event: event dict as returned by search_epg()
+    :param margin_before: seconds to start recording early
+    :param margin_after: seconds to keep recording late
+    """
+    begin = int(event['begin_timestamp'])
+    return Timer(event['sref'], event.get('sname', ''), event.get('title', ''),
+                 event.get('shortdesc') or '', begin - margin_before,
+                 begin + int(event['duration_sec']) + margin_after, int(event.get('id') or 0),
+                 False, False)
+
+
+class _Node(object):
+    """ Treap node. best and total are kept up to date for the whole subtree. """
+
+    __slots__ = ('key', 'value', 'priority', 'left', 'right', 'best', 'total')
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.best = None
+        self.total = 0
+
+
+class _Treap(object):
+    """
+    Balanced search tree with expected O(log n) insert, delete and range
+    split. Subclasses keep a summary of each subtree in best and total.
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def _update(self, node):
+        raise NotImplementedError()
+
+    def _split(self, node, key, inclusive=False):
+        """
+        Returns (nodes with keys below key, the rest). If inclusive, key
+        itself goes to the left.
+        """
+        if node is None:
+            return None, None
+        if node.key < key or (inclusive and node.key == key):
+            node.right, right = self._split(node.right, key, inclusive)
+            self._update(node)
+            return node, right
+        left, node.left = self._split(node.left, key, inclusive)
+        self._update(node)
+        return left, node
+
+    def _merge(self, left, right):
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left.priority > right.priority:
+            left.right = self._merge(left.right, right)
+            self._update(left)
+            return left
+        right.left = self._merge(left, right.left)
+        self._update(right)
+        return right
+
+    def _take(self, key):
+        """
+        Remove the node for key from the tree
+        :return: (node or None, tree below key, tree above key), to be merged back
+        """
+        left, rest = self._split(self.root, key)
+        middle, right = self._split(rest, key, inclusive=True)
+        return middle, left, right
+
+    def __iter__(self):
+        stack = []
+        node = self.root
+        while stack or node is not None:
+            if node is not None:
+                stack.append(node)
+                node = node.left
+            else:
+                node = stack.pop()
+                yield node.value
+                node = node.right
+
+
+class _IntervalTreap(_Treap):
+    """ Timers by (begin, end, service reference), with the latest end in each subtree """
+
+    def _update(self, node):
+        node.best = max(node.value.end, node.left.best if node.left else node.value.end,
+                        node.right.best if node.right else node.value.end)
+
+    def insert(self, timer):
+        node = _Node((timer.begin, timer.end, timer.service_ref), timer)
+        self._update(node)
+        _, left, right = self._take(node.key)
+        self.root = self._merge(self._merge(left, node), right)
+
+    def delete(self, timer):
+        _, left, right = self._take((timer.begin, timer.end, timer.service_ref))
+        self.root = self._merge(left, right)
+
+    def overlapping(self, begin, end):
+        """
+        Returns the timers overlapping [begin, end) in key order. Subtrees
+        which all end by begin are skipped, so the cost is O(log n) per result.
+        """
+        found = []
+
+        def visit(node):
+            if node is None or node.best <= begin:
+                return
+            visit(node.left)
+            if node.key[0] >= end:
+                return
+            if node.value.end > begin:
+                found.append(node.value)
+            visit(node.right)
+
+        visit(self.root)
+        return found
+
+
+class _DeltaTreap(_Treap):
+    """
+    Change in the number of running recordings at each time. total is the
+    sum of a subtree's changes, best the highest running sum within it.
+    """
+
+    def _update(self, node):
+        left_total = node.left.total if node.left else 0
+        node.total = left_total + node.value + (node.right.total if node.right else 0)
+        node.best = left_total + node.value
+        if node.left is not None:
+            node.best = max(node.best, node.left.best)
+        if node.right is not None:
+            node.best = max(node.best, left_total + node.value + node.right.best)
+
+    def add(self, time, change):
+        node, left, right = self._take(time)
+        if node is None:
+            node = _Node(time, 0)
+        node.value += change
+        if node.value:
+            self._update(node)
+            left = self._merge(left, node)
+        self.root = self._merge(left, right)
+
+    def max_running(self, begin, end):
+        """
+        Returns the most recordings running at once during [begin, end)
+        """
+        before, rest = self._split(self.root, begin, inclusive=True)
+        during, after = self._split(rest, end)
+        running = before.total if before is not None else 0
+        best = running if during is None else max(running, running + during.best)
+        self.root = self._merge(self._merge(before, during), after)
+        return best
+
+
+class TimerIndex(object):
+    """
+    The timers of one box, indexed by time in two balanced trees which are
+    updated in place, so adding or removing a timer costs O(log n), each
+    overlap query O(log n) per timer found and each tuner conflict check
+    O(log n), however many timers are added in between.
+
+    :param timers: iterable of Timer
+    :param tuners: number of tuners the box has
+    """
+
+    def __init__(self, timers=(), tuners=1):
+        self.tuners = tuners
+        self._lock = threading.RLock()
+        self._timers = {}
+        self._intervals = _IntervalTreap()
+        self._changes = _DeltaTreap()
+        for timer in timers:
+            self.add(timer)
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._intervals))
+
+    def __contains__(self, key):
+        return key in self._timers
+
+    def get(self, service_ref, begin, end):
+        """
+        Returns the timer for a service with exactly this begin and end, or None
+        """
+        return self._timers.get((service_ref, begin, end))
+
+    def add(self, timer):
+        """
+        Add a timer, replacing any with the same key
+        """
+        with self._lock:
+            self.remove(*timer.key)
+            self._timers[timer.key] = timer
+            self._intervals.insert(timer)
+            if timer.uses_tuner and timer.end > timer.begin:
+                self._changes.add(timer.begin, 1)
+                self._changes.add(timer.end, -1)
+
+    def remove(self, service_ref, begin, end):
+        """
+        Remove a timer
+        :return: the timer removed, or None
+        """
+        with self._lock:
+            timer = self._timers.pop((service_ref, begin, end), None)
+            if timer is not None:
+                self._intervals.delete(timer)
+                if timer.uses_tuner and timer.end > timer.begin:
+                    self._changes.add(timer.begin, -1)
+                    self._changes.add(timer.end, 1)
+            return timer
+
+    def overlapping(self, begin, end, service_ref=None):
+        """
+        Returns the timers which overlap [begin, end), in order of begin
+        :param service_ref: only timers for this service
+        """
+        with self._lock:
+            return [timer for timer in self._intervals.overlapping(begin, end)
+                    if service_ref is None or timer.service_ref == service_ref]
+
+    def max_concurrent(self, begin, end):
+        """
+        Returns the most recording timers running at once during [begin, end)
+        """
+        with self._lock:
+            return self._changes.max_running(begin, end)
+
+    def find_duplicate(self, timer):
+        """
+        Returns an existing timer which already records what timer would:
+        one for the same EPG event, or one on the same service covering the
+        whole of timer. None if there isn't one.
+        """
+        for existing in self.overlapping(timer.begin, timer.end, timer.service_ref):
+            if timer.eit and existing.eit == timer.eit:
+                return existing
+            if existing.begin <= timer.begin and existing.end >= timer.end:
+                return existing
+        return None
+
+    def has_conflict(self, begin, end):
+        """
+        Returns True if recording [begin, end) would need more tuners than the box has
+        """
+        return self.max_concurrent(begin, end) >= self.tuners
+
+    def conflicts(self, begin, end):
+        """
+        Returns the recording timers a new recording of [begin, end) would
+        conflict with, or an empty list if a tuner is free throughout
+        """
+        if not self.has_conflict(begin, end):
+            return []
+        return [timer for timer in self.overlapping(begin, end) if timer.uses_tuner]
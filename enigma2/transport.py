@@ -0,0 +1,283 @@
+"""
+enigma2.transport
+~~~~~~~~~~~~~~~~~~~~
+
+HTTP transports used by Enigma2Connection. Transports for the same host
+share one keep-alive connection pool, whichever connection created them.
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import json
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from enigma2.error import Enigma2Error
+
+_LOGGER = logging.getLogger(__name__)
+
+# pylint: disable=too-many-arguments
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _shared_pool(key, factory):
+    """
+    Returns the pool registered for key, creating it with factory if needed
+    """
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = factory()
+            _POOLS[key] = pool
+        return pool
+
+
+def _pool_key(backend, base_url, verify_ssl, pool_size):
+    """
+    Transports only share a pool when it was built with the same settings,
+    so a verifying client never reuses a pool that skips certificate checks
+    """
+    parts = urlsplit(base_url)
+    return backend, parts.scheme, parts.netloc, bool(verify_ssl), pool_size
+
+
+class Transport(object):
+    """
+    Base class for transports. Authentication and headers are computed once,
+    when the transport is created, rather than for every request.
+
+    get() and head() return a response with status_code, headers, content,
+    json(), iter_content() and close(), and raise Enigma2Error when the
+    server can't be reached.
+    """
+
+    def __init__(self, base_url, username=None, password=None, timeout=5,
+                 verify_ssl=True, use_gzip=True, keepalive=True, pool_size=10):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.verify_ssl = verify_ssl
+        self.pool_size = pool_size
+        self.auth = None
+        if username is not None and password is not None:
+            self.auth = (username, password)
+
+        self.headers = {}
+        if use_gzip:
+            self.headers['Accept-Encoding'] = 'gzip'
+        if not keepalive:
+            self.headers['Connection'] = 'close'
+
+    def get(self, url, params=None, stream=False, headers=None):
+        """
+        Send a GET request
+        :param url: full url
+        :param params: dict of query parameters
+        :param stream: if True, the body is not downloaded until it is read
+        :param headers: dict of extra headers for this request
+        """
+        raise NotImplementedError()
+
+    def _headers(self, headers):
+        if not headers:
+            return self.headers
+        return dict(self.headers, **headers)
+
+    def head(self, url):
+        """
+        Send a HEAD request
+        :param url: full url
+        """
+        raise NotImplementedError()
+
+
+class RequestsTransport(Transport):
+    """
+    Transport using a requests.Session shared by every transport for the host
+    """
+
+    def __init__(self, base_url, **kwargs):
+        Transport.__init__(self, base_url, **kwargs)
+        self.session = _shared_pool(_pool_key('requests', base_url, self.verify_ssl, self.pool_size),
+                                    self._new_session)
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, url, params=None, stream=False, headers=None):
+        return self._request('GET', url, params=params, stream=stream, headers=headers)
+
+    def head(self, url):
+        return self._request('HEAD', url)
+
+    def _request(self, method, url, params=None, stream=False, headers=None):
+        try:
+            response = self.session.request(method, url, params=params, stream=stream, auth=self.auth,
+                                            headers=self._headers(headers), verify=self.verify_ssl,
+                                            timeout=self.timeout)
+        except requests.exceptions.RequestException as err:
+            raise Enigma2Error(message='Failed to connect to server', original=err)
+        return _RequestsResponse(response) if stream else response
+
+
+class _RequestsResponse(object):
+    """
+    Wraps a streamed requests.Response, so a timeout or dropped connection
+    while the body is read raises Enigma2Error like any other failure
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    @property
+    def content(self):
+        """
+        Returns the whole body
+        """
+        try:
+            return self._response.content
+        except requests.exceptions.RequestException as err:
+            raise Enigma2Error(message='Failed to read response', original=err)
+
+    def json(self):
+        """
+        Returns the decoded json body
+        """
+        return json.loads(self.content.decode('utf-8'))
+
+    def iter_content(self, chunk_size=65536):
+        """
+        Yield the body in chunks
+        """
+        try:
+            for chunk in self._response.iter_content(chunk_size=chunk_size):
+                yield chunk
+        except requests.exceptions.RequestException as err:
+            raise Enigma2Error(message='Failed to read response', original=err)
+
+    def close(self):
+        """
+        Return the connection to the pool
+        """
+        self._response.close()
+
+
+class _Urllib3Response(object):
+    """
+    Wraps a urllib3 response with the parts of the requests.Response API we use
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self._content = None
+        self.status_code = response.status
+        self.headers = response.headers
+
+    @property
+    def content(self):
+        """
+        Returns the whole body
+        """
+        import urllib3
+
+        if self._content is None:
+            try:
+                self._content = self._response.read(decode_content=True)
+            except urllib3.exceptions.HTTPError as err:
+                raise Enigma2Error(message='Failed to read response', original=err)
+            self._response.release_conn()
+        return self._content
+
+    def json(self):
+        """
+        Returns the decoded json body
+        """
+        return json.loads(self.content.decode('utf-8'))
+
+    def iter_content(self, chunk_size=65536):
+        """
+        Yield the body in chunks
+        """
+        import urllib3
+
+        if self._content is not None:
+            yield self._content
+            return
+        try:
+            for chunk in self._response.stream(chunk_size, decode_content=True):
+                yield chunk
+        except urllib3.exceptions.HTTPError as err:
+            raise Enigma2Error(message='Failed to read response', original=err)
+        self._response.release_conn()
+
+    def close(self):
+        """
+        Return the connection to the pool
+        """
+        self._response.release_conn()
+
+
+class Urllib3Transport(Transport):
+    """
+    Lightweight transport using a urllib3 connection pool shared by every
+    transport for the host
+    """
+
+    def __init__(self, base_url, **kwargs):
+        import urllib3
+
+        Transport.__init__(self, base_url, **kwargs)
+        if self.auth is not None:
+            self.headers.update(urllib3.make_headers(basic_auth='%s:%s' % self.auth))
+
+        if isinstance(self.timeout, tuple):
+            self._timeout = urllib3.Timeout(connect=self.timeout[0], read=self.timeout[1])
+        else:
+            self._timeout = urllib3.Timeout(total=self.timeout)
+
+        ssl_args = {} if self.verify_ssl or not base_url.startswith('https') else {'cert_reqs': 'CERT_NONE'}
+        self.pool = _shared_pool(_pool_key('urllib3', base_url, self.verify_ssl, self.pool_size),
+                                 lambda: urllib3.connection_from_url(base_url, maxsize=self.pool_size, **ssl_args))
+
+    def get(self, url, params=None, stream=False, headers=None):
+        return self._request('GET', url, params=params, stream=stream, headers=headers)
+
+    def head(self, url):
+        return self._request('HEAD', url)
+
+    def _request(self, method, url, params=None, stream=False, headers=None):
+        import urllib3
+
+        # The pool is bound to the host, so only send the path
+        parts = urlsplit(url)
+        path = '%s?%s' % (parts.path, parts.query) if parts.query else parts.path
+        try:
+            response = self.pool.request(method, path, fields=params, headers=self._headers(headers),
+                                         timeout=self._timeout, preload_content=False,
+                                         redirect=False, retries=False)
+        except urllib3.exceptions.HTTPError as err:
+            raise Enigma2Error(message='Failed to connect to server', original=err)
+
+        wrapped = _Urllib3Response(response)
+        if not stream:
+            wrapped.content  # pylint: disable=pointless-statement
+        return wrapped
+
+
+TRANSPORTS = {
+    'requests': RequestsTransport,
+    'urllib3': Urllib3Transport
+}
@@ -0,0 +1,171 @@
+"""
+enigma2.watcher
+~~~~~~~~~~~~~~~~~~~~
+
+Watch a box for status changes, polling quickly while it is in use and
+backing off while it is in standby
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+
+import asyncio
+import logging
+import time
+from collections import namedtuple
+
+from enigma2.error import Enigma2Error
+
+_LOGGER = logging.getLogger(__name__)
+
+WATCHED_FIELDS = ('currservice_serviceref', 'inStandby', 'volume', 'muted', 'isRecording')
+
+StatusChange = namedtuple('StatusChange', ['field', 'old', 'new', 'status'])
+StatusChange.__doc__ = """ A change of one status info field, with the full new status """
+
+
+def _in_standby(status):
+    """
+    OpenWebIf reports inStandby as either a bool or a 'true'/'false' string
+    """
+    return status.get('inStandby') in (True, 'true')
+
+
+class _BaseStatusWatcher(object):
+    """
+    Shared polling policy and diffing for the sync and async watchers
+    """
+
+    def __init__(self, connection, active_interval=2, standby_interval=30,
+                 boost_interval=0.5, boost_duration=10, fields=WATCHED_FIELDS,
+                 clock=time.monotonic):
+        self.connection = connection
+        self.active_interval = active_interval
+        self.standby_interval = standby_interval
+        self.boost_interval = boost_interval
+        self.boost_duration = boost_duration
+        self.fields = fields
+        self.status = None
+        self._clock = clock
+
+    def _diff(self, status):
+        """
+        Compare a new status with the last one seen
+        :return: list of StatusChange
+        """
+        previous = self.status
+        self.status = status
+        if previous is None:
+            return []
+        return [StatusChange(field, previous.get(field), status.get(field), status)
+                for field in self.fields if previous.get(field) != status.get(field)]
+
+    def _boosted(self):
+        last_command = getattr(self.connection, 'last_command_time', None)
+        return last_command is not None and self._clock() - last_command < self.boost_duration
+
+    def next_interval(self):
+        """
+        Returns how long to wait before the next poll
+        """
+        if self._boosted():
+            return self.boost_interval
+        if self.status is None or _in_standby(self.status):
+            return self.standby_interval
+        return self.active_interval
+
+    def _wake_early(self, started):
+        """
+        Returns True if a command was sent since started, so the wait should end
+        """
+        last_command = getattr(self.connection, 'last_command_time', None)
+        return last_command is not None and last_command > started
+
+
+class StatusWatcher(_BaseStatusWatcher):
+    """
+    Polls an Enigma2Connection and yields StatusChanges:
+
+        for change in StatusWatcher(device).watch():
+            print(change.field, change.old, change.new)
+    """
+
+    def __init__(self, connection, sleep=time.sleep, **kwargs):
+        _BaseStatusWatcher.__init__(self, connection, **kwargs)
+        self._sleep = sleep
+
+    def poll(self):
+        """
+        Fetch the status once
+        :return: list of StatusChange since the previous poll
+        """
+        return self._diff(self.connection.refresh_status_info())
+
+    def watch(self):
+        """
+        Poll forever, yielding each change as it is noticed. While the box
+        can't be reached polling continues at the standby interval.
+        """
+        while True:
+            try:
+                changes = self.poll()
+            except Enigma2Error as err:
+                _LOGGER.debug('Status poll failed: %s', err.message)
+                self._wait(self.standby_interval)
+                continue
+            for change in changes:
+                yield change
+            # Decided after yielding, in case a change prompted a command
+            self._wait(self.next_interval())
+
+    def _wait(self, interval):
+        # Sleep in short slices so a command sent meanwhile speeds up polling
+        started = self._clock()
+        deadline = started + interval
+        while True:
+            remaining = deadline - self._clock()
+            if remaining <= 0 or self._wake_early(started):
+                return
+            self._sleep(min(remaining, self.boost_interval))
+
+
+class AsyncStatusWatcher(_BaseStatusWatcher):
+    """
+    Polls an AsyncEnigma2Connection and yields StatusChanges:
+
+        async for change in AsyncStatusWatcher(device):
+            print(change.field, change.old, change.new)
+    """
+
+    async def poll(self):
+        """
+        Fetch the status once
+        :return: list of StatusChange since the previous poll
+        """
+        return self._diff(await self.connection.refresh_status_info())
+
+    def __aiter__(self):
+        return self._watch()
+
+    async def _watch(self):
+        while True:
+            try:
+                changes = await self.poll()
+            except Enigma2Error as err:
+                _LOGGER.debug('Status poll failed: %s', err.message)
+                await self._wait(self.standby_interval)
+                continue
+            for change in changes:
+                yield change
+            # Decided after yielding, in case a change prompted a command
+            await self._wait(self.next_interval())
+
+    async def _wait(self, interval):
+        # Sleep in short slices so a command sent meanwhile speeds up polling
+        started = self._clock()
+        deadline = started + interval
+        while True:
+            remaining = deadline - self._clock()
+            if remaining <= 0 or self._wake_early(started):
+                return
+            await asyncio.sleep(min(remaining, self.boost_interval))
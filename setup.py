@@ -16,10 +16,13 @@ setup(
     download_url = 'https://github.com/ronanmu/enigma2.py/tarball/0.01',
     keywords='enigma2 openwebif python cgi interface',
     packages=['enigma2'],
-    install_requires=['requests', 'jsonpath-rw'],
+    install_requires=['requests'],
+    python_requires='>=3.7',
     classifiers = [
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
         'Topic :: Internet'
         ],
     )
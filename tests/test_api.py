@@ -9,6 +9,7 @@ Licensed under the MIT license.
 """
 # pylint: disable=protected-access
 import os, sys
+import time
 import unittest
 import requests_mock
 from tests.sample_responses import (SAMPLE_ABOUT, SAMPLE_STATUS_INFO, SAMPLE_VOL13_RESPONSE, SAMPLE_POWER_RESPONSE,
@@ -40,6 +41,22 @@ class TestAPI(unittest.TestCase):
         # Random local device
         self.assertTrue(enigma2.api.Enigma2Connection(host='123.123.123.123'))
 
+    @requests_mock.mock()
+    def test_lazy_create(self, m):
+        """Test a lazy connection doesn't probe until asked"""
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123', lazy=True)
+        self.assertEqual(0, m.call_count)
+        self.assertFalse(device.is_connected)
+
+        m.register_uri('GET', '/api/statusinfo', status_code=404)
+        self.assertFalse(device.check_health())
+        self.assertFalse(device.is_connected)
+
+        self._update_test_mock(m)
+        self.assertEqual('ITV2', device.connect()['currservice_station'])
+        self.assertTrue(device.is_connected)
+        self.assertTrue(device.check_health())
+
     @requests_mock.mock()
     def test_unauthorized(self, m):
         """Test that unauth messsage is reported correctly"""
@@ -83,6 +100,7 @@ class TestAPI(unittest.TestCase):
         device = enigma2.api.Enigma2Connection(host='123.123.123.123', is_https=True)
         about = device.get_about()
         self.assertEqual('Mock', about['brand'])
+        self.assertEqual(3, about['tuners'])
 
     @requests_mock.mock()
     def test_mute(self, m):
@@ -169,6 +187,55 @@ class TestAPI(unittest.TestCase):
         self.assertFalse(status['inStandby'])
         self.assertFalse(device.is_box_in_standby())
 
+    @requests_mock.mock()
+    def test_status_cache(self, m):
+        """Test status info is cached and invalidated by commands"""
+        self._update_test_mock(m)
+        m.register_uri('GET', '/api/remotecontrol?command=402', json=SAMPLE_CHANNEL_CHANGE_RESPONSE, status_code=200)
+        m.register_uri('HEAD', '/picon/itv2.png', status_code=200)
+
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123', status_cache_ttl=60)
+        device.get_status_info()
+        device.get_current_playback_type()
+        self.assertEqual(1, m.call_count)
+        device.get_current_playing_picon_url()
+        self.assertEqual(2, m.call_count)
+
+        device.channel_up()
+        device.get_status_info()
+        self.assertEqual(4, m.call_count)
+
+        device.refresh_status_info()
+        self.assertEqual(5, m.call_count)
+
+    def test_status_coalesced(self):
+        """Test concurrent status requests share one request"""
+        import threading
+        from enigma2.cache import CachedValue
+
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def loader():
+            calls.append(1)
+            started.set()
+            release.wait(1)
+            return len(calls)
+
+        cache = CachedValue()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(loader))) for _ in range(5)]
+        threads[0].start()
+        started.wait(1)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([1] * 5, results)
+
     @requests_mock.mock()
     def test_get_picon(self, m):
         """Test locate the picon"""
@@ -181,6 +248,106 @@ class TestAPI(unittest.TestCase):
         self.assertEqual('http://123.123.123.123/picon/itv2.png', url)
 
 
+    @requests_mock.mock()
+    def test_concurrent_reads_coalesced(self, m):
+        """Test identical concurrent reads share one request but commands don't"""
+        import threading
+
+        def slow_about(_request, _context):
+            time.sleep(0.2)
+            return SAMPLE_ABOUT
+
+        self._update_test_mock(m)
+        m.register_uri('GET', '/api/about', json=slow_about, status_code=200)
+        m.register_uri('GET', '/api/vol?set=up', json=SAMPLE_VOL13_RESPONSE, status_code=200)
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123')
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(device.get_about())) for _ in range(5)]
+        threads += [threading.Thread(target=device.volume_up) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(5, len(results))
+        self.assertTrue(all(result['brand'] == 'Mock' for result in results))
+        paths = [request.path for request in m.request_history]
+        self.assertEqual(1, paths.count('/api/about'))
+        self.assertEqual(3, paths.count('/api/vol'))
+
+    @requests_mock.mock()
+    def test_picon_cache(self, m):
+        """Test picon hits and misses are both remembered"""
+        self._update_test_mock(m)
+        m.register_uri('HEAD', '/picon/bbconehd.png', status_code=404)
+        m.register_uri('HEAD', '/picon/bbcone.png', status_code=200)
+
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123', username='test', password='123')
+        for _ in range(3):
+            url = device.get_current_playing_picon_url(channel_name='BBC One HD',
+                                                       currservice_serviceref='1:0:1:')
+            self.assertEqual('http://123.123.123.123/picon/bbcone.png', url)
+        # One probe for the status, then one each for the HD and non HD picon
+        self.assertEqual(3, m.call_count)
+        self.assertEqual(['http://123.123.123.123/picon/bbcone.png'], device.cached_urls_which_exist)
+        self.assertIsNotNone(m.request_history[-1].headers.get('Authorization'))
+
+    @requests_mock.mock()
+    def test_resolve_picon_urls(self, m):
+        """Test resolving picons for a whole bouquet"""
+        self._update_test_mock(m)
+        m.register_uri('HEAD', requests_mock.ANY, status_code=404)
+        m.register_uri('HEAD', '/picon/itv2.png', status_code=200)
+        m.register_uri('HEAD', '/picon/bbcone.png', status_code=200)
+        m.register_uri('HEAD', '/picon/1_0_1_1E24_809_2_11A0000_0_0_0.png', status_code=200)
+
+        services = {'1:0:1:2756:7FC:2:11A0000:0:0:0:': 'ITV2',
+                    '1:0:1:1:1:2:11A0000:0:0:0:': 'BBC One HD',
+                    '1:0:1:1E24:809:2:11A0000:0:0:0:': '5SELECT',
+                    '1:0:1:2:2:2:11A0000:0:0:0:': 'Nothing'}
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123')
+        urls = device.resolve_picon_urls(services, max_workers=2)
+        self.assertEqual('http://123.123.123.123/picon/itv2.png', urls['1:0:1:2756:7FC:2:11A0000:0:0:0:'])
+        self.assertEqual('http://123.123.123.123/picon/bbcone.png', urls['1:0:1:1:1:2:11A0000:0:0:0:'])
+        self.assertEqual('http://123.123.123.123/picon/1_0_1_1E24_809_2_11A0000_0_0_0.png',
+                         urls['1:0:1:1E24:809:2:11A0000:0:0:0:'])
+        self.assertIsNone(urls['1:0:1:2:2:2:11A0000:0:0:0:'])
+
+        call_count = m.call_count
+        self.assertEqual(urls, device.resolve_picon_urls(services))
+        self.assertEqual(call_count, m.call_count)
+
+    def test_resolve_more_picons_than_cache(self):
+        """Test a repeat resolve is answered from memory when there are more candidates than cache entries"""
+        from enigma2.simulator import OpenWebIfSimulator
+
+        with OpenWebIfSimulator(num_services=50, num_events=0) as box:
+            device = enigma2.api.Enigma2Connection(url=box.url, lazy=True, picon_cache_size=10)
+            services = device.load_services()
+            urls = device.resolve_picon_urls(services)
+            self.assertEqual(50, len(urls))
+            self.assertEqual(100, device.picon_cache.maxsize)
+            requests = box.requests
+            self.assertEqual(urls, device.resolve_picon_urls(services))
+            self.assertEqual(requests, box.requests)
+
+    def test_lru_cache(self):
+        """Test the LRU cache evicts and expires entries"""
+        from enigma2.cache import LRUCache
+
+        now = [0]
+        cache = LRUCache(maxsize=2, clock=lambda: now[0])
+        cache.set('a', True, ttl=10)
+        cache.set('b', False, ttl=1)
+        self.assertTrue(cache.get('a'))
+        cache.set('c', True)
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+        now[0] = 20
+        self.assertNotIn('a', cache)
+        self.assertIn('c', cache)
+
     @requests_mock.mock()
     def test_load_sources(self, m):
         """Testing parsing the source services JSON"""
@@ -196,8 +363,49 @@ class TestAPI(unittest.TestCase):
         self.assertIsNotNone(services)
         self.assertEqual(10, len(services))
 
+        # An unknown bouquet falls back to every service, from one download
+        calls = m.call_count
         services = device.load_services(bouquet_name='Does not exist')
-        self.assertIsNotNone(services)
+        self.assertEqual(device.load_services(), services)
+        self.assertEqual(calls + 2, m.call_count)
+
+    @requests_mock.mock()
+    def test_iter_services(self, m):
+        """Testing streaming the source services JSON"""
+        import json
+        self._update_test_mock(m)
+        with open(self._file_path('getallservices.json')) as json_file:
+            text = json_file.read()
+        m.register_uri('GET', '/api/getallservices', text=text, status_code=200)
+
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123')
+        streamed = list(device.iter_services())
+        self.assertEqual(list(enigma2.api.filter_services(json.loads(text)).items()), streamed)
+        self.assertEqual(len(streamed), len(set(ref for ref, _ in streamed)))
+        self.assertEqual(10, len(list(device.iter_services('Children'))))
+        self.assertEqual(streamed, list(device.iter_services('Does not exist')))
+        self.assertEqual(dict(streamed), enigma2.api.filter_services(json.loads(text), 'Does not exist'))
+
+    def test_json_stream(self):
+        """Test values split across many chunks are decoded"""
+        from enigma2.jsonstream import iter_array_items
+
+        text = '{"result": true, "n": 1234, "services": [{"a": "\u00c9"}, 12345, [1, 2], "x"], "pos": -1.5e3}'
+        chunks = [char.encode('utf-8') for char in text]
+        self.assertEqual([{'a': '\u00c9'}, 12345, [1, 2], 'x'], list(iter_array_items(chunks, 'services')))
+        self.assertEqual([], list(iter_array_items(['{"services": [] }'], 'services')))
+
+    def test_json_stream_split_numbers(self):
+        """Test numbers cut off at any chunk boundary are decoded whole"""
+        import json
+        from enigma2.jsonstream import iter_array_items
+
+        text = '{"n": 12.5e-1, "events": [{"a": 1}, 12.5, 3e5, -0.25E+2, 7, 1.0e10, 42]}'
+        expected = json.loads(text)['events']
+        for split in range(len(text) + 1):
+            chunks = [text[:split].encode('utf-8'), text[split:].encode('utf-8')]
+            self.assertEqual(expected, list(iter_array_items(chunks, 'events')), split)
+        self.assertEqual([{'a': 1}, 12.5], list(iter_array_items([b'{"events": [{"a": 1}, 12.', b'5]}'], 'events')))
 
     @requests_mock.mock()
     def test_search_epg(self, m):
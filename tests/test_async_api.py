@@ -0,0 +1,129 @@
+"""
+tests.test_async_api
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the asyncio api against a local aiohttp server
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+# pylint: disable=protected-access
+import asyncio
+import os
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from tests.sample_responses import (SAMPLE_ABOUT, SAMPLE_STATUS_INFO, SAMPLE_VOL13_RESPONSE,
+                                    SAMPLE_CHANNEL_CHANGE_RESPONSE, SAMPLE_EMPTY_EPG_SEARCH)
+
+import enigma2.api
+from enigma2.async_api import AsyncEnigma2Connection
+from enigma2.error import Enigma2Error
+
+
+def _build_app():
+    """Build a minimal fake OpenWebIf app"""
+    thispath = os.path.dirname(__file__)
+    with open('{}/{}'.format(thispath, 'getallservices.json')) as json_file:
+        all_services = json_file.read()
+
+    async def statusinfo(_request):
+        return web.json_response(SAMPLE_STATUS_INFO)
+
+    async def about(_request):
+        return web.json_response(SAMPLE_ABOUT)
+
+    async def vol(_request):
+        return web.json_response(SAMPLE_VOL13_RESPONSE)
+
+    async def remotecontrol(_request):
+        return web.json_response(SAMPLE_CHANNEL_CHANGE_RESPONSE)
+
+    async def epgsearch(_request):
+        return web.json_response(SAMPLE_EMPTY_EPG_SEARCH)
+
+    async def getallservices(_request):
+        return web.Response(text=all_services, content_type='application/json')
+
+    async def picon(request):
+        if request.match_info['name'] == 'itv2.png':
+            return web.Response()
+        raise web.HTTPNotFound()
+
+    async def unauthorised(_request):
+        raise web.HTTPUnauthorized()
+
+    app = web.Application()
+    app.router.add_get('/api/statusinfo', statusinfo)
+    app.router.add_get('/api/about', about)
+    app.router.add_get('/api/vol', vol)
+    app.router.add_get('/api/remotecontrol', remotecontrol)
+    app.router.add_get('/api/epgsearch', epgsearch)
+    app.router.add_get('/api/getallservices', getallservices)
+    app.router.add_get('/picon/{name}', picon)
+    app.router.add_get('/api/timerlist', unauthorised)
+    return app
+
+
+class TestAsyncAPI(unittest.TestCase):
+    """ Tests enigma2.async_api module. """
+
+    def _run(self, test):
+        async def runner():
+            server = TestServer(_build_app())
+            await server.start_server()
+            try:
+                async with AsyncEnigma2Connection(url=str(server.make_url(''))) as device:
+                    await test(device)
+            finally:
+                await server.close()
+        asyncio.run(runner())
+
+    def test_empty_create(self):
+        """Testing error raised on no connection details provided"""
+        self.assertRaises(Enigma2Error, AsyncEnigma2Connection)
+
+    def test_status_and_about(self):
+        """Testing getting the status and about"""
+        async def test(device):
+            status = await device.get_status_info()
+            self.assertEqual('ITV2', status['currservice_station'])
+            self.assertFalse(device.is_box_in_standby())
+            about = await device.get_about()
+            self.assertEqual('Mock', about['brand'])
+            self.assertEqual(3, about['tuners'])
+            playback_type = await device.get_current_playback_type()
+            self.assertIs(enigma2.api.PlaybackType.live, playback_type)
+        self._run(test)
+
+    def test_concurrent_commands(self):
+        """Testing awaiting many commands at once"""
+        async def test(device):
+            results = await device.gather(device.set_volume(13), device.volume_up(),
+                                          device.channel_up(), device.channel_down(),
+                                          device.search_epg('werwe'))
+            self.assertEqual([True, True, True, True, []], results)
+        self._run(test)
+
+    def test_load_services(self):
+        """Testing parsing the source services JSON"""
+        async def test(device):
+            services = await device.load_services(bouquet_name='Children')
+            self.assertEqual(10, len(services))
+        self._run(test)
+
+    def test_get_picon(self):
+        """Test locate the picon"""
+        async def test(device):
+            url = await device.get_current_playing_picon_url()
+            self.assertTrue(url.endswith('/picon/itv2.png'))
+            self.assertIsNone(await device.get_current_playing_picon_url(channel_name='Missing HD'))
+        self._run(test)
+
+    def test_unauthorized(self):
+        """Test that unauth messsage is reported as an Enigma2Error"""
+        async def test(device):
+            with self.assertRaises(Enigma2Error):
+                await device._invoke_api('/api/timerlist')
+        self._run(test)
@@ -0,0 +1,127 @@
+"""
+tests.test_capture
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests streaming screen grabs and LCD images to disk
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import enigma2.api
+from enigma2.constants import GRAB_MODE_VIDEO
+from enigma2.fleet import Enigma2Fleet
+from enigma2.simulator import OpenWebIfSimulator, SimulatorFleet, PICON_PNG, FAULT_ERROR
+
+
+class CountingSink(object):
+    """ File-like sink remembering the largest write """
+
+    def __init__(self):
+        self.written = 0
+        self.largest = 0
+
+    def write(self, chunk):
+        self.written += len(chunk)
+        self.largest = max(self.largest, len(chunk))
+
+
+class TestCapture(unittest.TestCase):
+    """ Screen grabs and LCD images from a simulated box """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.box = OpenWebIfSimulator(num_services=5, num_events=0).start()
+        self.device = enigma2.api.Enigma2Connection(url=self.box.url, lazy=True)
+
+    def tearDown(self):
+        self.box.stop()
+        shutil.rmtree(self.directory)
+
+    def test_screenshot_to_file(self):
+        """ A grab is written to a file with the requested format and size """
+        path = os.path.join(self.directory, 'grab.jpg')
+        written = self.device.download_screenshot(path)
+        self.assertEqual(os.path.getsize(path), written)
+        with open(path, 'rb') as image_file:
+            self.assertEqual(b'\xff\xd8', image_file.read(2))
+        self.assertEqual(1920 * 1080 // 8 + 4, written)
+
+        path = os.path.join(self.directory, 'small.png')
+        written = self.device.download_screenshot(path, image_format='png', resolution=320,
+                                                  mode=GRAB_MODE_VIDEO)
+        self.assertEqual(8 + 320 * 180 // 8, written)
+        self.assertEqual(['grab.jpg', 'small.png'], sorted(os.listdir(self.directory)))
+
+    def test_streamed_in_chunks(self):
+        """ Only a chunk at a time is handed to the sink """
+        sink = CountingSink()
+        written = self.device.download_screenshot(sink, chunk_size=4096)
+        self.assertEqual(sink.written, written)
+        self.assertLessEqual(sink.largest, 4096)
+
+        lcd = io.BytesIO()
+        self.device.download_lcd_image(lcd)
+        self.assertEqual(PICON_PNG, lcd.getvalue())
+
+    def test_failed_download_keeps_old_file(self):
+        """ A failed grab leaves the previous image in place """
+        path = os.path.join(self.directory, 'grab.jpg')
+        self.device.download_screenshot(path, resolution=160)
+        self.box.inject_fault(FAULT_ERROR, path='/grab')
+        self.assertRaises(enigma2.api.Enigma2Error, self.device.download_screenshot, path)
+        self.assertEqual(2 + 160 * 90 // 8 + 2, os.path.getsize(path))
+        self.assertEqual(['grab.jpg'], os.listdir(self.directory))
+
+
+class TestFleetCapture(unittest.TestCase):
+    """ Capturing a whole fleet with bounded concurrency """
+
+    def test_capture(self):
+        """ Every box is captured, no more than max_concurrent at a time """
+        directory = tempfile.mkdtemp()
+        running = [0, 0]
+        lock = threading.Lock()
+
+        class CountingConnection(enigma2.api.Enigma2Connection):
+            """ Counts how many downloads run at once """
+
+            def download_screenshot(self, sink, **kwargs):
+                with lock:
+                    running[0] += 1
+                    running[1] = max(running)
+                try:
+                    return super(CountingConnection, self).download_screenshot(sink, **kwargs)
+                finally:
+                    with lock:
+                        running[0] -= 1
+
+        try:
+            with SimulatorFleet(8, latency=0.05) as boxes, Enigma2Fleet(max_workers=8) as fleet:
+                boxes.inject_fault(FAULT_ERROR, fraction=0.25, path='/grab')
+                list(fleet.connect(boxes.connection_kwargs(lazy=True), CountingConnection))
+                results = {r.name: r for r in fleet.capture(directory, max_concurrent=2, resolution=320)}
+                self.assertEqual(['box0', 'box1'], sorted(name for name, r in results.items() if r.error))
+                self.assertEqual(os.path.join(directory, 'box5.jpg'), results['box5'].result)
+                self.assertLessEqual(running[1], 2)
+                self.assertEqual(6, len(os.listdir(directory)))
+
+                results = {r.name: r for r in fleet.capture(directory, lcd=True)}
+                with open(results['box0'].result, 'rb') as image_file:
+                    self.assertEqual(PICON_PNG, image_file.read())
+        finally:
+            shutil.rmtree(directory)
+
+    def test_capture_bad_directory(self):
+        """ An unwritable directory is an error for each box, not for the whole capture """
+        with SimulatorFleet(3) as boxes, Enigma2Fleet(max_workers=3) as fleet:
+            list(fleet.connect(boxes.connection_kwargs(lazy=True)))
+            results = list(fleet.capture('/nonexistent/dir'))
+            self.assertEqual(['box0', 'box1', 'box2'], sorted(r.name for r in results))
+            self.assertTrue(all(isinstance(r.error, OSError) for r in results))
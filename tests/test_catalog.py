@@ -0,0 +1,134 @@
+"""
+tests.test_catalog
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the service catalog
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import copy
+import json
+import os
+import unittest
+import requests_mock
+from tests.sample_responses import SAMPLE_STATUS_INFO
+
+import enigma2.api
+from enigma2.catalog import ServiceCatalog
+from enigma2.picon import get_picon_name
+
+
+class TestCatalog(unittest.TestCase):
+    """ Tests enigma2.catalog module. """
+
+    @requests_mock.mock()
+    def setUp(self, m):  # pylint: disable=arguments-differ
+        m.register_uri('GET', '/api/statusinfo', json=SAMPLE_STATUS_INFO, status_code=200)
+        with open(os.path.join(os.path.dirname(__file__), 'getallservices.json')) as json_file:
+            m.register_uri('GET', '/api/getallservices', text=json_file.read(), status_code=200)
+
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123')
+        self.services = device.load_services()
+        self.catalog = device.load_catalog()
+
+    def test_matches_load_services(self):
+        """Test the catalog holds the same services as load_services"""
+        self.assertEqual(self.services, self.catalog.as_dict())
+        self.assertEqual(len(self.services), len(self.catalog))
+        self.assertIn('1:0:19:835:3EA:2174:EEEE0000:0:0:0:', self.catalog)
+
+    def test_lookups(self):
+        """Test looking services up by each index"""
+        service = self.catalog.get('1:0:19:835:3EA:2174:EEEE0000:0:0:0:')
+        self.assertEqual('RTÉ One', service.name)
+        self.assertEqual('rteone', service.picon_name)
+        self.assertIn('All channels', service.bouquets)
+
+        self.assertEqual([service], self.catalog.find_by_name('rte  ONE'))
+        self.assertEqual([service], self.catalog.find_by_picon('rteone'))
+        self.assertEqual(10, len(self.catalog.in_bouquet('Children')))
+        self.assertIn('Children', self.catalog.bouquet_names)
+
+    def test_prefix(self):
+        """Test searching by name prefix"""
+        matches = self.catalog.find_by_prefix('rté')
+        self.assertTrue(matches)
+        self.assertTrue(all(match.normalised_name.startswith('rte') for match in matches))
+        self.assertEqual(sorted(m.normalised_name for m in matches), [m.normalised_name for m in matches])
+        self.assertEqual(1, len(self.catalog.find_by_prefix('rte', limit=1)))
+        self.assertEqual([], self.catalog.find_by_prefix('zzzzzz'))
+
+
+def _rename(bouquets, service_ref, name):
+    for bouquet in bouquets:
+        for service in bouquet['subservices']:
+            if service['servicereference'] == service_ref:
+                service['servicename'] = name
+
+
+class TestCatalogDiff(unittest.TestCase):
+    """ Tests comparing catalogs and refresh_catalog """
+
+    def setUp(self):
+        with open(os.path.join(os.path.dirname(__file__), 'getallservices.json')) as json_file:
+            self.bouquets = json.load(json_file)['services']
+
+    def test_no_changes(self):
+        """Test identical catalogs have an empty diff"""
+        diff = ServiceCatalog(self.bouquets).diff(ServiceCatalog(copy.deepcopy(self.bouquets)))
+        self.assertFalse(diff)
+        self.assertEqual(set(), diff.changed_refs)
+
+    def test_changes(self):
+        """Test each kind of change is reported"""
+        previous = ServiceCatalog(self.bouquets)
+        bouquets = copy.deepcopy(self.bouquets)
+        children = [b for b in bouquets if b['servicename'] == 'Children'][0]
+        movies = [b for b in bouquets if b['servicename'] == 'Movies'][0]
+        erotic = [b for b in bouquets if b['servicename'] == 'Erotic'][0]
+
+        renamed = children['subservices'][1]
+        _rename(bouquets, renamed['servicereference'], 'Renamed')
+        movies['subservices'].reverse()
+        bouquets.remove(erotic)
+        new_service = {'servicereference': '1:0:1:FFFF:1:2:11A0000:0:0:0:', 'servicename': 'New'}
+        children['subservices'].append(new_service)
+        bouquets.append({'servicename': 'Brand new', 'servicereference': '1:7:1:', 'subservices': [new_service]})
+        bouquets[0], bouquets[1] = bouquets[1], bouquets[0]
+
+        diff = ServiceCatalog(bouquets).diff(previous)
+        self.assertTrue(diff)
+        self.assertEqual(['1:0:1:FFFF:1:2:11A0000:0:0:0:'], [s.ref for s in diff.added])
+        erotic_only = set(s.ref for s in previous.in_bouquet('Erotic') if s.bouquets == ['Erotic'])
+        self.assertEqual(erotic_only, set(s.ref for s in diff.removed))
+        self.assertEqual([(renamed['servicereference'], 'Renamed')],
+                         [(new.ref, new.name) for _, new in diff.renamed])
+        self.assertEqual(['Brand new'], diff.added_bouquets)
+        self.assertEqual(['Erotic'], diff.removed_bouquets)
+        self.assertIn('Children', diff.changed_bouquets)
+        self.assertEqual(['Movies'], diff.reordered_bouquets)
+        self.assertTrue(diff.bouquets_moved)
+
+    @requests_mock.mock()
+    def test_refresh_catalog(self, m):
+        """Test refresh_catalog diffs against the previous refresh and forgets stale picons"""
+        m.register_uri('GET', '/api/getallservices', json={'services': self.bouquets})
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123', lazy=True)
+        diff = device.refresh_catalog()
+        self.assertEqual(len(device.catalog), len(diff.added))
+
+        bouquets = copy.deepcopy(self.bouquets)
+        service = [b for b in bouquets if b['servicename'] == 'Children'][0]['subservices'][1]
+        old_name = service['servicename']
+        _rename(bouquets, service['servicereference'], 'Renamed')
+        stale = 'http://123.123.123.123/picon/%s.png' % get_picon_name(old_name)
+        device.picon_cache.set(stale, True)
+        device.picon_cache.set('http://123.123.123.123/picon/other.png', True)
+
+        m.register_uri('GET', '/api/getallservices', json={'services': bouquets})
+        diff = device.refresh_catalog()
+        self.assertEqual([service['servicereference']], list(diff.changed_refs))
+        self.assertNotIn(stale, device.picon_cache)
+        self.assertIn('http://123.123.123.123/picon/other.png', device.picon_cache)
+        self.assertFalse(device.refresh_catalog())
@@ -0,0 +1,159 @@
+"""
+tests.test_diskcache
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the persistent cache of the service list and box info
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import shutil
+import tempfile
+import threading
+import unittest
+import requests_mock
+from tests.sample_responses import SAMPLE_ABOUT
+
+import enigma2.api
+from enigma2.diskcache import DiskCache
+from enigma2.error import Enigma2Error
+from enigma2.instrumentation import MetricsRecorder
+from enigma2.simulator import OpenWebIfSimulator, FAULT_SLOW
+
+
+class TestDiskCache(unittest.TestCase):
+    """ DiskCache storage """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        """ Entries are keyed by host, kind and name """
+        now = [1000.0]
+        cache = DiskCache(self.directory, max_age=60, clock=lambda: now[0])
+        cache.set('http://a', 'services', 'TV', {'1:0:1:': 'One'}, 'abc', '"e1"')
+        entry = DiskCache(self.directory).get('http://a', 'services', 'TV')
+        self.assertEqual(entry['value'], {'1:0:1:': 'One'})
+        self.assertEqual((entry['hash'], entry['etag']), ('abc', '"e1"'))
+        self.assertIsNone(cache.get('http://b', 'services', 'TV'))
+        self.assertIsNone(cache.get('http://a', 'services', None))
+
+        self.assertTrue(cache.is_fresh(entry))
+        now[0] += 61
+        self.assertFalse(cache.is_fresh(entry))
+
+        # Revalidating only moves the timestamp, the file is not rewritten
+        path = cache._path('http://a', 'services', 'TV')  # pylint: disable=protected-access
+        with open(path, 'rb') as cache_file:
+            body = cache_file.read()
+        cache.touch(entry)
+        with open(path, 'rb') as cache_file:
+            self.assertEqual(cache_file.read(), body)
+        self.assertTrue(cache.is_fresh(cache.get('http://a', 'services', 'TV')))
+        cache.clear()
+        self.assertIsNone(cache.get('http://a', 'services', 'TV'))
+
+    @requests_mock.mock()
+    def test_not_modified_without_entry(self, m):
+        """ A 304 with nothing cached is a miss, fetched again without validators """
+        m.register_uri('GET', '/api/about', [{'status_code': 304},
+                                             {'json': SAMPLE_ABOUT, 'status_code': 200}])
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123', lazy=True,
+                                               disk_cache=DiskCache(self.directory))
+        self.assertEqual('Mock', device.get_about()['brand'])
+        self.assertEqual(2, m.call_count)
+        self.assertNotIn('If-None-Match', m.last_request.headers)
+
+        m.register_uri('GET', '/api/about', status_code=304)
+        DiskCache(self.directory).clear()
+        self.assertRaises(Enigma2Error, device.get_about)
+
+
+class TestCachedConnection(unittest.TestCase):
+    """ load_services and get_about through the disk cache """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.box = OpenWebIfSimulator(num_services=30, bouquet_size=10, num_events=0).start()
+
+    def tearDown(self):
+        self.box.stop()
+        shutil.rmtree(self.directory)
+
+    def _device(self, **kwargs):
+        return enigma2.api.Enigma2Connection(url=self.box.url, lazy=True,
+                                             disk_cache=DiskCache(self.directory), **kwargs)
+
+    def test_revalidate_by_hash(self):
+        """ Without an ETag an unchanged body is recognised by its hash """
+        metrics = MetricsRecorder()
+        device = self._device(instrumentation=metrics)
+        self.assertEqual(len(device.load_services('Bouquet 1')), 10)
+        self.assertEqual(device.get_about()['brand'], 'Simulator')
+        self.assertEqual(metrics.snapshot()['caches']['disk'], {'hits': 0, 'misses': 2})
+
+        self.assertEqual(len(device.load_services('Bouquet 1')), 10)
+        self.assertEqual(metrics.snapshot()['caches']['disk'], {'hits': 1, 'misses': 2})
+
+        ref = self.box.services[12][0]
+        self.box.rename_service(ref, 'Renamed')
+        self.assertEqual(device.load_services('Bouquet 1')[ref], 'Renamed')
+
+    def test_revalidate_by_etag(self):
+        """ With an ETag the box answers 304 and sends no body """
+        self.box.send_etags = True
+        metrics = MetricsRecorder()
+        device = self._device(instrumentation=metrics)
+        services = device.load_services()
+        self.assertEqual(device.load_services(), services)
+        stats = metrics.snapshot()['endpoints']['GET /api/getallservices']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['bytes'], len(self.box._all_services))  # pylint: disable=protected-access
+
+        ref = self.box.services[0][0]
+        self.box.rename_service(ref, 'Renamed')
+        self.assertEqual(device.load_services()[ref], 'Renamed')
+
+    def test_warm_start(self):
+        """ A new connection answers from disk and refreshes in the background """
+        self._device().load_services()
+        ref = self.box.services[0][0]
+        self.box.rename_service(ref, 'Renamed')
+        self.box.inject_fault(FAULT_SLOW, delay=0.3, path='/api/getallservices')
+
+        device = self._device(warm_start=True)
+        self.assertEqual(device.load_services()[ref], 'Channel 0')
+        refresh = device._refreshing[('services', None)]  # pylint: disable=protected-access
+        refresh.join()
+        self.assertEqual(device.load_services()[ref], 'Renamed')
+        for thread in list(device._refreshing.values()):  # pylint: disable=protected-access
+            thread.join()
+
+    def test_warm_start_box_down(self):
+        """ Warm start works while the box can't be reached """
+        self._device().get_about()
+        self.box.stop()
+        device = enigma2.api.Enigma2Connection(url=self.box.url, lazy=True, timeout=0.2,
+                                               disk_cache=DiskCache(self.directory), warm_start=True)
+        self.assertEqual(device.get_about()['brand'], 'Simulator')
+        threads = list(device._refreshing.values())  # pylint: disable=protected-access
+        for thread in threads:
+            thread.join()
+        self.assertRaises(Enigma2Error, self._device().get_about)
+
+    def test_fresh_entries_not_revalidated(self):
+        """ Entries younger than max_age are used without a request """
+        enigma2.api.Enigma2Connection(url=self.box.url, lazy=True,
+                                      disk_cache=DiskCache(self.directory)).get_about()
+        requests = self.box.requests
+        device = enigma2.api.Enigma2Connection(url=self.box.url, lazy=True,
+                                               disk_cache=DiskCache(self.directory, max_age=60))
+        threads = [threading.Thread(target=device.get_about) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.box.requests, requests)
@@ -0,0 +1,157 @@
+"""
+tests.test_epg
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the local EPG store
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import json
+import os
+import unittest
+import requests_mock
+from tests.sample_responses import SAMPLE_STATUS_INFO
+
+import enigma2.api
+from enigma2.epg import EpgStore
+
+
+def _file_path(file_name):
+    return os.path.join(os.path.dirname(__file__), file_name)
+
+
+class FakeBox(object):
+    """ Returns canned events, recording the EPG requests made """
+
+    def __init__(self, events):
+        self.events = events
+        self.requests = []
+
+    def iter_bouquets(self):
+        return [{'servicename': 'Children', 'servicereference': 'bouquet', 'subservices': [{}]}]
+
+    def iter_epg(self, bouquet_ref=None, service_ref=None, start=None, end=None):
+        self.requests.append((bouquet_ref, service_ref, start))
+        return [event for event in self.events
+                if (service_ref is None or event['sref'] == service_ref)
+                and (start is None or event['begin_timestamp'] + event['duration_sec'] > start)]
+
+
+class TestEpg(unittest.TestCase):
+    """ Tests enigma2.epg module. """
+
+    def setUp(self):
+        with open(_file_path('epgsearch_home_and_away.json')) as json_file:
+            self.events = json.load(json_file)['events']
+        self.store = EpgStore(self.events)
+
+    def test_search(self):
+        """Test title search returns search_epg shaped events"""
+        results = self.store.search('home and away', exact=True)
+        self.assertEqual(43, len(results))
+        results = self.store.search('AWAY')
+        self.assertEqual(44, len(results))
+        self.assertEqual([], self.store.search('werwe'))
+
+        original = {event['id']: event for event in self.events}
+        for result in results:
+            expected = original[result['id']]
+            self.assertEqual(set(expected), set(result))
+            for key in ('sref', 'sname', 'title', 'begin_timestamp', 'duration', 'duration_sec', 'picon'):
+                self.assertEqual(expected[key], result[key])
+        self.assertEqual(sorted(r['begin_timestamp'] for r in results), [r['begin_timestamp'] for r in results])
+
+    def test_at(self):
+        """Test what's on at a given time"""
+        event = self.events[1]
+        start = event['begin_timestamp']
+        self.assertEqual([event['id']], [e['id'] for e in self.store.at(start + 60)
+                                         if e['sref'] == event['sref']])
+        self.assertEqual([event['id']], [e['id'] for e in self.store.at(start, event['sref'])])
+        self.assertEqual([], self.store.at(start + event['duration_sec'], event['sref']))
+
+    def test_at_with_long_event(self):
+        """Test a very long event doesn't hide or add anything at other times"""
+        events = [dict(event) for event in self.events]
+        marathon = dict(events[0], id=999999, begin_timestamp=0, duration_sec=2 ** 40)
+        store = EpgStore(events + [marathon])
+        for event in events[:10]:
+            timestamp = event['begin_timestamp'] + 1
+            expected = sorted(e['id'] for e in events + [marathon]
+                              if e['begin_timestamp'] <= timestamp < e['begin_timestamp'] + e['duration_sec'])
+            self.assertEqual(expected, sorted(e['id'] for e in store.at(timestamp)))
+        self.assertEqual([], EpgStore().at(0))
+
+    def test_between(self):
+        """Test events on a service between two times"""
+        sref = '1:0:19:44E:3E9:2174:EEEE0000:0:0:0:'
+        expected = sorted(e['begin_timestamp'] for e in self.events if e['sref'] == sref)
+        results = self.store.between(sref, 0, 2 ** 40)
+        self.assertEqual(expected, [e['begin_timestamp'] for e in results])
+        # A window starting mid event still includes it
+        results = self.store.between(sref, expected[0] + 60, expected[1])
+        self.assertEqual([expected[0]], [e['begin_timestamp'] for e in results])
+        self.assertEqual([], self.store.between('1:0:0:', 0, 2 ** 40))
+
+    def test_sync(self):
+        """Test syncing only requests events past the high water mark"""
+        ordered = sorted(self.events, key=lambda event: event['begin_timestamp'])
+        box = FakeBox(ordered[:20])
+        store = EpgStore()
+        store.load(box)
+        self.assertEqual(20, len(store))
+
+        # The box now has more events, and the first ones have finished
+        box.events = ordered
+        now = ordered[5]['begin_timestamp']
+        result = store.sync(box, now=now)
+        self.assertEqual(('bouquet', None, ordered[19]['begin_timestamp']), box.requests[-1])
+        self.assertEqual(24, result.added)
+        self.assertEqual(0, result.updated)
+        self.assertEqual(len([e for e in ordered if e['begin_timestamp'] + e['duration_sec'] <= now]),
+                         result.expired)
+        self.assertEqual(44 - result.expired, len(store))
+
+        # Nothing to do while the guide reaches far enough ahead
+        result = store.sync(box, now=now, horizon=60)
+        self.assertEqual(0, result.requests)
+
+    def test_sync_services(self):
+        """Test syncing a store which was built from events"""
+        box = FakeBox(self.events)
+        result = self.store.sync(box, now=0)
+        self.assertEqual(len(self.store.service_refs), result.requests)
+        self.assertTrue(all(request[1] is not None for request in box.requests))
+        self.assertEqual((0, 0, 0), result[:3])
+
+    def test_load_dedupes_services(self):
+        """Test a service in many bouquets is downloaded once, unknown bouquets raise"""
+        refs = sorted(set(event['sref'] for event in self.events))
+        self.assertGreater(len(refs), 2)
+        box = FakeBox(self.events)
+        box.iter_bouquets = lambda: [
+            {'servicename': 'Favourites', 'servicereference': 'favourites',
+             'subservices': [{'servicereference': ref} for ref in refs[:2]]},
+            {'servicename': 'All', 'servicereference': 'all',
+             'subservices': [{'servicereference': ref} for ref in refs[1:]]}]
+        store = EpgStore()
+        store.load(box)
+        self.assertEqual([('all', None, None), (None, refs[0], None)], box.requests)
+        self.assertEqual(len(self.events), len(store))
+
+        self.assertRaises(enigma2.api.Enigma2Error, store.load, box, 'Missing')
+
+    @requests_mock.mock()
+    def test_load(self, m):
+        """Test loading the EPG of a bouquet from the box"""
+        m.register_uri('GET', '/api/statusinfo', json=SAMPLE_STATUS_INFO, status_code=200)
+        with open(_file_path('getallservices.json')) as json_file:
+            m.register_uri('GET', '/api/getallservices', text=json_file.read(), status_code=200)
+        m.register_uri('GET', '/api/epgmulti', json={'events': self.events, 'result': True}, status_code=200)
+
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123')
+        store = device.load_epg(bouquet_name='Children', start=1527690600)
+        self.assertEqual(44, len(store))
+        self.assertIn('time=1527690600', m.last_request.url)
+        self.assertIn('bRef=', m.last_request.url)
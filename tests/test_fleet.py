@@ -0,0 +1,64 @@
+"""
+tests.test_fleet
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the fleet executor
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import time
+import unittest
+import requests_mock
+from tests.sample_responses import SAMPLE_STATUS_INFO, SAMPLE_POWER_RESPONSE
+
+from enigma2.fleet import Enigma2Fleet
+
+
+class SlowBox(object):
+    """ Stand in for a box which takes a while to answer """
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def get_status_info(self):
+        time.sleep(self.delay)
+        return {'delay': self.delay}
+
+
+class TestFleet(unittest.TestCase):
+    """ Tests enigma2.fleet module. """
+
+    @requests_mock.mock()
+    def test_connect_and_call(self, m):
+        """Test connecting to boxes where one is dead"""
+        m.register_uri('GET', 'http://box1/api/statusinfo', json=SAMPLE_STATUS_INFO, status_code=200)
+        m.register_uri('GET', 'http://box2/api/statusinfo', json=SAMPLE_STATUS_INFO, status_code=200)
+        m.register_uri('GET', 'http://box2/api/powerstate?newstate=0', json=SAMPLE_POWER_RESPONSE, status_code=200)
+        m.register_uri('GET', 'http://box1/api/powerstate?newstate=0', status_code=500)
+        m.register_uri('GET', 'http://dead/api/statusinfo', status_code=404)
+
+        with Enigma2Fleet(max_workers=4) as fleet:
+            results = {r.name: r for r in fleet.connect({'box1': {'host': 'box1'},
+                                                         'box2': {'host': 'box2'},
+                                                         'dead': {'host': 'dead'}})}
+            self.assertIsNotNone(results['dead'].error)
+            self.assertIsNone(results['box1'].error)
+            self.assertEqual(2, len(fleet))
+
+            statuses = fleet.call_all('get_status_info')
+            self.assertEqual('ITV2', statuses['box1'].result['currservice_station'])
+
+            standby = fleet.call_all('toggle_standby')
+            self.assertTrue(standby['box2'].result)
+            self.assertIsNotNone(standby['box1'].error)
+
+    def test_results_as_completed(self):
+        """Test a slow box does not hold back the others"""
+        with Enigma2Fleet(max_workers=4) as fleet:
+            fleet.add('slow', SlowBox(0.5))
+            fleet.add('fast', SlowBox(0))
+            start = time.time()
+            first = next(fleet.get_status_info())
+            self.assertEqual('fast', first.name)
+            self.assertLess(time.time() - start, 0.4)
@@ -0,0 +1,75 @@
+"""
+tests.test_instrumentation
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the instrumentation hooks
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import unittest
+import requests_mock
+from tests.sample_responses import SAMPLE_STATUS_INFO
+
+import enigma2.api
+from enigma2.error import Enigma2Error
+from enigma2.instrumentation import Instrumentation, MetricsRecorder
+
+
+class Tracer(Instrumentation):
+    """ Records the order hooks are called in """
+
+    def __init__(self):
+        self.calls = []
+
+    def on_request_start(self, method, endpoint):
+        self.calls.append(('start', endpoint))
+        return len(self.calls)
+
+    def on_request_end(self, method, endpoint, context, elapsed, status_code=None,
+                       num_bytes=0, error=None):
+        self.calls.append(('end', endpoint, context, status_code))
+
+
+class TestInstrumentation(unittest.TestCase):
+    """ Tests enigma2.instrumentation module. """
+
+    @requests_mock.mock()
+    def test_metrics(self, m):
+        """Test latency, bytes, errors and cache counters are recorded"""
+        m.register_uri('GET', '/api/statusinfo', json=SAMPLE_STATUS_INFO, status_code=200)
+        m.register_uri('GET', '/api/about', status_code=500)
+        m.register_uri('HEAD', '/picon/itv2.png', status_code=200)
+        m.register_uri('HEAD', '/picon/bbcone.png', status_code=200)
+
+        metrics = MetricsRecorder()
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123', status_cache_ttl=60,
+                                               instrumentation=metrics)
+        device.get_current_playing_picon_url()
+        device.get_current_playing_picon_url()
+        device.get_current_playing_picon_url(channel_name='BBC One')
+        self.assertRaises(Enigma2Error, device.get_about)
+
+        snapshot = metrics.snapshot()
+        status = snapshot['endpoints']['GET /api/statusinfo']
+        self.assertEqual(1, status['requests'])
+        self.assertEqual(0, status['errors'])
+        self.assertGreater(status['bytes'], 0)
+        self.assertEqual(1, sum(status['histogram'].values()))
+        self.assertEqual(1, snapshot['endpoints']['GET /api/about']['errors'])
+        # Every picon is counted under one route
+        self.assertEqual(2, snapshot['endpoints']['HEAD /picon/*']['requests'])
+        self.assertEqual(1, len([key for key in snapshot['endpoints'] if 'picon' in key]))
+        self.assertEqual({'hits': 3, 'misses': 1}, snapshot['caches']['status'])
+        self.assertEqual({'hits': 1, 'misses': 2}, snapshot['caches']['picon'])
+
+        metrics.reset()
+        self.assertEqual({'endpoints': {}, 'caches': {}}, metrics.snapshot())
+
+    @requests_mock.mock()
+    def test_hooks(self, m):
+        """Test the start hook's context is handed to the end hook"""
+        m.register_uri('GET', '/api/statusinfo', json=SAMPLE_STATUS_INFO, status_code=200)
+        tracer = Tracer()
+        enigma2.api.Enigma2Connection(host='123.123.123.123', instrumentation=tracer)
+        self.assertEqual([('start', '/api/statusinfo'), ('end', '/api/statusinfo', 1, 200)], tracer.calls)
@@ -0,0 +1,56 @@
+"""
+tests.test_picon
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the picon name normalisation
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import json
+import os
+import re
+import unicodedata
+import unittest
+
+import enigma2.api
+from enigma2.picon import get_picon_name, get_picon_names
+
+
+def legacy_picon_name(channel_name):
+    """ The original Enigma2Connection.get_picon_name """
+    channel_name = unicodedata.normalize('NFKD', channel_name) \
+        .encode('ASCII', 'ignore')
+    channel_name = channel_name.decode("utf-8")
+    exclude_chars = ['/', '\\', '\'', '"', '`', '?', ' ', '(', ')', ':',
+                     '<', '>', '|', '.', '\n']
+    channel_name = re.sub('[%s]' % ''.join(exclude_chars), '',
+                          channel_name)
+    channel_name = channel_name.replace('&', 'and')
+    channel_name = channel_name.replace('+', 'plus')
+    channel_name = channel_name.replace('*', 'star')
+    channel_name = channel_name.lower()
+
+    return channel_name
+
+
+def channel_names():
+    """ Every channel name in the sample getallservices response """
+    with open(os.path.join(os.path.dirname(__file__), 'getallservices.json')) as json_file:
+        services = json.load(json_file)['services']
+    return [sub['servicename'] for bouquet in services for sub in bouquet['subservices']]
+
+
+class TestPicon(unittest.TestCase):
+    """ Tests enigma2.picon module. """
+
+    def test_get_picon_name(self):
+        """Test names are formatted as before"""
+        self.assertEqual('rteone', enigma2.api.Enigma2Connection.get_picon_name('RTÉ One'))
+        self.assertEqual('itv2plus1', get_picon_name('ITV2 +1'))
+        self.assertEqual('bandq\\tv', get_picon_name('B&Q\\TV'))
+
+    def test_matches_legacy(self):
+        """Test output is identical to the original implementation"""
+        names = channel_names() + ['Ｆｕｌｌ／Ｗｉｄｔｈ', 'a*b+c&d', 'x\ny.z:(1)', 'Ça va "TV"?', '½ ﬁ']
+        self.assertEqual([legacy_picon_name(name) for name in names], get_picon_names(names))
@@ -0,0 +1,137 @@
+"""
+tests.test_piconstore
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the content addressed picon image store
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+import enigma2.api
+from enigma2.piconstore import PiconStore
+from enigma2.simulator import OpenWebIfSimulator, PICON_PNG
+
+
+class FakeClock(object):
+    """ Clock which only moves when told to """
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+class TestPiconStore(unittest.TestCase):
+    """ Tests enigma2.piconstore.PiconStore """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_dedup_and_read(self):
+        """ Identical images are stored once and read without copies """
+        store = PiconStore(self.directory)
+        digest = store.put_stream('a', [b'abc', b'def'])
+        self.assertEqual(hashlib.sha256(b'abcdef').hexdigest(), digest)
+        self.assertEqual(digest, store.put('b', b'abcdef'))
+        self.assertIsNone(store.put('empty', b''))
+        self.assertEqual((1, 6), (len(store), store.total_bytes))
+        self.assertEqual(store.path('a'), store.path('b'))
+
+        with store.open('b') as image_file:
+            self.assertEqual(b'abcdef', image_file.read())
+        image_map = store.mmap('a')
+        self.assertEqual(b'cde', image_map[2:5])
+        image_map.close()
+        self.assertIsNone(store.open('c'))
+
+        store.remove('a')
+        self.assertTrue(os.path.exists(store.path('b')))
+        store.remove('b')
+        self.assertEqual(0, len(store))
+        self.assertEqual([], [name for name in os.listdir(self.directory) if name.endswith('.tmp')])
+
+    def test_batched_index_writes(self):
+        """ A batch writes the index once, keys sharing an image keep it alive """
+        store = PiconStore(self.directory)
+        index_path = os.path.join(self.directory, 'index.json')
+        with store.batch():
+            for number in range(50):
+                store.put('key%d' % number, b'image%d' % (number % 5))
+            self.assertFalse(os.path.exists(index_path))
+            store.put('key0', b'image0')
+        self.assertEqual((5, 30), (len(store), store.total_bytes))
+        self.assertEqual(50, len(PiconStore(self.directory)._keys))  # pylint: disable=protected-access
+
+        # Moving a key to another image only frees the old one with its last key
+        store.put('key1', b'image0')
+        self.assertEqual(5, len(store))
+        for number in range(6, 50, 5):
+            store.remove('key%d' % number)
+        self.assertEqual((4, 24), (len(store), store.total_bytes))
+        store.clear()
+        self.assertEqual((0, 0), (len(store), store.total_bytes))
+        self.assertEqual(0, len(PiconStore(self.directory)))
+
+    def test_eviction_and_reload(self):
+        """ Least recently used images go first, the index survives a restart """
+        store = PiconStore(self.directory, max_bytes=10, clock=FakeClock())
+        store.put('a', b'1111')
+        store.put('b', b'2222')
+        store.open('a').close()
+        store.put('c', b'3333')
+        self.assertEqual(['a', 'c'], sorted(key for key in 'abc' if key in store))
+        self.assertEqual(8, store.total_bytes)
+
+        reopened = PiconStore(self.directory, max_bytes=10)
+        self.assertEqual(store.digest('c'), reopened.digest('c'))
+        with reopened.open('c') as image_file:
+            self.assertEqual(b'3333', image_file.read())
+        self.assertNotIn('b', reopened)
+
+
+class TestPiconDownload(unittest.TestCase):
+    """ Downloading picons from a simulated box into a PiconStore """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.box = OpenWebIfSimulator(num_services=20, num_events=0, picon_ratio=1.0).start()
+        self.device = enigma2.api.Enigma2Connection(url=self.box.url, lazy=True,
+                                                    picon_store=PiconStore(self.directory))
+
+    def tearDown(self):
+        self.box.stop()
+        shutil.rmtree(self.directory)
+
+    def test_fetch_picons(self):
+        """ Every service gets a picon, identical images share one file """
+        services = self.device.load_services()
+        urls = self.device.fetch_picons(services)
+        self.assertEqual(len(services), len([url for url in urls.values() if url]))
+        store = self.device.picon_store
+        self.assertEqual(1, len(store))
+        with store.open(next(iter(urls.values()))) as image_file:
+            self.assertEqual(PICON_PNG, image_file.read())
+
+        # Already stored, so nothing is downloaded again
+        self.box.stop()
+        url = next(iter(urls.values()))
+        self.assertEqual(hashlib.sha256(PICON_PNG).hexdigest(), self.device.fetch_picon(url))
+
+    def test_current_playing_picon(self):
+        """ The playing channel's picon is stored under its URL """
+        url = self.device.get_current_playing_picon()
+        self.assertEqual(self.device.get_current_playing_picon_url(), url)
+        self.assertIn(url, self.device.picon_store)
+        device = enigma2.api.Enigma2Connection(url=self.box.url, lazy=True)
+        self.assertRaises(enigma2.api.Enigma2Error, device.fetch_picon, url)
@@ -0,0 +1,80 @@
+"""
+tests.test_recordings
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests streaming the movie list and the local recordings index
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import unittest
+
+import enigma2.api
+from enigma2.instrumentation import MetricsRecorder
+from enigma2.simulator import OpenWebIfSimulator, MOVIE_LOCATION
+
+ARCHIVE = '/media/hdd/archive/'
+
+
+class TestRecordings(unittest.TestCase):
+    """ Tests enigma2.recordings against a simulated box """
+
+    def setUp(self):
+        self.box = OpenWebIfSimulator(num_services=5, num_events=0, num_movies=300).start()
+        self.box.add_movie('Family Guy', service=1, begin=1400000000, size=10, location=ARCHIVE)
+        self.box.add_movie('Family Guy', service=1, begin=1400003600, size=20, location=ARCHIVE)
+        self.metrics = MetricsRecorder()
+        self.device = enigma2.api.Enigma2Connection(url=self.box.url, lazy=True, instrumentation=self.metrics)
+
+    def tearDown(self):
+        self.box.stop()
+
+    def test_stream(self):
+        """ Recordings are streamed per location """
+        self.assertEqual([ARCHIVE, MOVIE_LOCATION], self.device.get_recording_locations())
+        recordings = list(self.device.iter_recordings())
+        self.assertEqual(302, len(recordings))
+        self.assertEqual(['Family Guy', 'Family Guy'], [r.title for r in recordings[:2]])
+        self.assertEqual((ARCHIVE, 'Channel 1', 1400000000, 10),
+                         (recordings[0].location, recordings[0].channel, recordings[0].begin, recordings[0].size))
+
+    def test_index_queries(self):
+        """ Browse by page and search by title, channel, date and size """
+        index = self.device.load_recordings()
+        self.assertEqual(302, len(index))
+        self.assertEqual(2, len(index.find_by_title('family guy', exact=True)))
+        self.assertEqual(2, len(index.find_by_title('FAMILY GUY')))
+        self.assertEqual(3, len(index.find_by_title('Programme 96')))
+        self.assertEqual(300 // 5 + 2, len(index.find_by_channel('channel 1')))
+        self.assertEqual([1400000000], [r.begin for r in index.between(1400000000, 1400003600)])
+        self.assertEqual([10, 20], [r.size for r in index.by_size(maximum=20)])
+
+        newest = index.page(0, 10, reverse=True)
+        self.assertEqual(1500000000 + 299 * 3600, newest[0].begin)
+        self.assertEqual(index.page(10, 10, reverse=True)[0].begin, newest[-1].begin - 3600)
+        everything = [r.filename for r in index.page(0, None, order='title')]
+        self.assertEqual(302, len(set(everything)))
+        self.assertEqual(2, len(index.page(300, 50)))
+        self.assertRaises(ValueError, index.page, order='colour')
+
+    def test_incremental_scan(self):
+        """ Rescans only touch what changed, and skip unchanged lists """
+        index = self.device.load_recordings()
+        result = index.scan(self.device)
+        self.assertEqual((0, 0, 0, 2, 2), tuple(result))
+
+        family_guy = index.find_by_title('Family Guy')[0]
+        self.box.remove_movie(family_guy.filename)
+        self.box.add_movie('American Dad', service=2, location=ARCHIVE)
+        result = index.scan(self.device)
+        self.assertEqual((1, 0, 1, 2, 1), tuple(result))
+        self.assertNotIn(family_guy.filename, index)
+        self.assertEqual(1, len(index.find_by_title('american dad')))
+
+        # With ETags an unchanged list isn't downloaded again
+        self.box.send_etags = True
+        index.scan(self.device)
+        self.metrics.reset()
+        result = index.scan(self.device, [MOVIE_LOCATION])
+        self.assertEqual((0, 0, 0, 1, 1), tuple(result))
+        self.assertEqual(0, self.metrics.snapshot()['endpoints']['GET /api/movielist']['bytes'])
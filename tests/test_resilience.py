@@ -0,0 +1,115 @@
+"""
+tests.test_resilience
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests retries, the circuit breaker and the rate limiter
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import unittest
+import requests_mock
+from tests.sample_responses import SAMPLE_STATUS_INFO, SAMPLE_ABOUT, SAMPLE_VOL13_RESPONSE
+
+import enigma2.api
+from enigma2.error import Enigma2Error, Enigma2CircuitOpenError
+from enigma2.resilience import RetryPolicy, CircuitBreaker, RateLimiter
+
+
+class TestResilience(unittest.TestCase):
+    """ Tests enigma2.resilience module. """
+
+    def setUp(self):
+        self.sleeps = []
+        self.now = [0]
+        self.retry = RetryPolicy(retries=2, backoff=1, jitter=0, sleep=self.sleeps.append)
+        self.changes = []
+        self.breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30, clock=lambda: self.now[0],
+                                      on_state_change=lambda old, new: self.changes.append(new))
+
+    def _device(self, m):
+        m.register_uri('GET', '/api/statusinfo', json=SAMPLE_STATUS_INFO, status_code=200)
+        return enigma2.api.Enigma2Connection(host='123.123.123.123', retry_policy=self.retry,
+                                             circuit_breaker=self.breaker)
+
+    @requests_mock.mock()
+    def test_retry_reads(self, m):
+        """Test reads are retried with backoff, commands are not"""
+        device = self._device(m)
+        m.register_uri('GET', '/api/about', [{'status_code': 503}, {'status_code': 500},
+                                             {'json': SAMPLE_ABOUT, 'status_code': 200}])
+        self.assertEqual('Mock', device.get_about()['brand'])
+        self.assertEqual([1, 2], self.sleeps)
+
+        m.register_uri('GET', '/api/vol?set=up', [{'status_code': 500},
+                                                  {'json': SAMPLE_VOL13_RESPONSE, 'status_code': 200}])
+        self.assertRaises(Enigma2Error, device.volume_up)
+        self.assertEqual(1, len([r for r in m.request_history if r.path == '/api/vol']))
+        self.assertEqual('closed', device.circuit_state)
+
+    @requests_mock.mock()
+    def test_circuit_breaker(self, m):
+        """Test the circuit opens, fails fast and recovers via a probe"""
+        device = self._device(m)
+        m.register_uri('GET', '/api/about', status_code=500)
+        self.assertRaises(Enigma2Error, device.get_about)
+        self.assertEqual('closed', device.circuit_state)
+        self.assertRaises(Enigma2Error, device.get_about)
+        self.assertEqual('open', device.circuit_state)
+        self.assertTrue(self.breaker.is_open)
+
+        calls = m.call_count
+        self.assertRaises(Enigma2CircuitOpenError, device.get_status_info)
+        self.assertEqual(calls, m.call_count)
+
+        # Recovery probe fails, so the circuit re-opens
+        self.now[0] = 31
+        m.register_uri('GET', '/api/statusinfo', status_code=502)
+        self.assertFalse(self.breaker.is_open)
+        self.assertEqual('half_open', device.circuit_state)
+        self.assertEqual(['open'], self.changes)
+        self.assertRaises(Enigma2Error, device.get_about)
+        self.assertEqual('open', device.circuit_state)
+
+        # Box is back
+        self.now[0] = 62
+        self.assertEqual('half_open', self.breaker.state)
+        m.register_uri('GET', '/api/statusinfo', json=SAMPLE_STATUS_INFO, status_code=200)
+        m.register_uri('GET', '/api/about', json=SAMPLE_ABOUT, status_code=200)
+        self.assertEqual('Mock', device.get_about()['brand'])
+        self.assertEqual(['open', 'half_open', 'open', 'half_open', 'closed'], self.changes)
+
+    @requests_mock.mock()
+    def test_probe_unexpected_error(self, m):
+        """Test a probe failing with any exception re-opens the circuit"""
+        device = self._device(m)
+        m.register_uri('GET', '/api/about', status_code=500)
+        self.assertRaises(Enigma2Error, device.get_about)
+        self.assertRaises(Enigma2Error, device.get_about)
+        self.assertEqual('open', device.circuit_state)
+
+        self.now[0] = 31
+        m.register_uri('GET', '/api/statusinfo', exc=ValueError)
+        self.assertRaises(ValueError, device.get_about)
+        self.assertEqual('open', device.circuit_state)
+
+        self.now[0] = 62
+        m.register_uri('GET', '/api/statusinfo', json=SAMPLE_STATUS_INFO, status_code=200)
+        m.register_uri('GET', '/api/about', json=SAMPLE_ABOUT, status_code=200)
+        self.assertEqual('Mock', device.get_about()['brand'])
+        self.assertEqual('closed', device.circuit_state)
+
+    def test_rate_limiter(self):
+        """ Requests after the burst are spaced 1/rate apart """
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now[0] += seconds
+
+        limiter = RateLimiter(rate=4, burst=2, clock=lambda: self.now[0], sleep=sleep)
+        for _ in range(5):
+            limiter.acquire()
+        self.assertEqual([0.25, 0.25, 0.25], self.sleeps)
+        self.now[0] += 10
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(3, len(self.sleeps))
@@ -0,0 +1,152 @@
+"""
+tests.test_simulator
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the client against the OpenWebIf simulator
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import time
+import unittest
+
+import enigma2.api
+from enigma2.error import Enigma2Error
+from enigma2.picon import get_picon_name
+from enigma2.fleet import Enigma2Fleet
+from enigma2.simulator import (OpenWebIfSimulator, SimulatorFleet, FAULT_DROP, FAULT_ERROR,
+                               FAULT_SLOW, FAULT_UNAUTHORIZED)
+
+
+class TestSimulator(unittest.TestCase):
+    """ Client round trips against a simulated box """
+
+    def setUp(self):
+        self.box = OpenWebIfSimulator(num_services=1200, bouquet_size=500, num_events=2400).start()
+        self.device = enigma2.api.Enigma2Connection(url=self.box.url)
+
+    def tearDown(self):
+        self.box.stop()
+
+    def test_status_and_about(self):
+        """ Status and about have the OpenWebIf shape """
+        self.assertFalse(self.device.is_box_in_standby())
+        self.assertEqual(self.device.get_status_info()['currservice_station'], 'Channel 0')
+        self.assertEqual(self.device.get_about()['brand'], 'Simulator')
+
+    def test_services_and_bouquets(self):
+        """ Services are spread over bouquets of bouquet_size """
+        self.assertEqual(len(self.device.load_services()), 1200)
+        self.assertEqual(len(self.device.load_services('Bouquet 2')), 200)
+
+    def test_picons(self):
+        """ Only services with a picon resolve """
+        services = dict(list(self.device.load_services().items())[:50])
+        resolved = self.device.resolve_picon_urls(services)
+        found = set(url.rsplit('/', 1)[1] for url in resolved.values() if url)
+        self.assertEqual(found, set('%s.png' % get_picon_name(name)
+                                    for name in services.values()) & self.box.picons)
+
+    def test_epg(self):
+        """ EPG search and streamed EPG come from the same events """
+        self.assertEqual(len(self.device.search_epg('Programme 3')),
+                         len([e for e in self.box.events if 'programme 3' in e['title'].lower()]))
+        ref = self.box.services[7][0]
+        events = list(self.device.iter_epg(service_ref=ref, start=int(time.time()) - 86400))
+        self.assertEqual(len(events), 2)
+
+    def _count_errors(self, box, reads=20):
+        device = enigma2.api.Enigma2Connection(url=box.url, lazy=True)
+        errors = []
+        for number in range(reads):
+            try:
+                device.refresh_status_info()
+            except Enigma2Error:
+                errors.append(number)
+        return errors
+
+    def test_error_rate(self):
+        """ Injected errors surface as Enigma2Error, exactly as often as asked """
+        requests, errors = self.box.requests, self.box.errors
+        self.box.error_rate = 1.0
+        self.assertEqual(list(range(20)), self._count_errors(self.box))
+        self.assertEqual((requests + 20, errors + 20), (self.box.requests, self.box.errors))
+        self.box.error_rate = 0.0
+        self.assertEqual([], self._count_errors(self.box))
+        self.assertEqual((requests + 40, errors + 20), (self.box.requests, self.box.errors))
+
+        # A seeded box fails the same requests every time
+        patterns = []
+        for _ in range(2):
+            with OpenWebIfSimulator(num_services=5, num_events=0, error_rate=0.5, seed=3) as box:
+                patterns.append(self._count_errors(box))
+                self.assertEqual((20, len(patterns[-1])), (box.requests, box.errors))
+        self.assertEqual(patterns[0], patterns[1])
+        self.assertTrue(0 < len(patterns[0]) < 20)
+
+    def test_commands_change_state(self):
+        """ Volume, standby and channel commands change what status reports """
+        self.assertTrue(self.device.set_volume(13))
+        self.assertTrue(self.device.volume_up())
+        self.assertTrue(self.device.toggle_mute())
+        self.assertTrue(self.device.channel_up())
+        self.assertTrue(self.device.channel_up())
+        self.assertTrue(self.device.channel_down())
+        status = self.device.refresh_status_info()
+        self.assertEqual((status['volume'], status['muted']), (18, True))
+        self.assertEqual(status['currservice_station'], 'Channel 1')
+
+        self.box.record()
+        self.assertEqual(self.device.refresh_status_info()['isRecording'], 'true')
+        self.device.toggle_standby()
+        self.assertTrue(self.device.is_box_in_standby())
+        self.device.toggle_standby()
+        self.assertFalse(self.device.is_box_in_standby())
+
+    def test_faults(self):
+        """ Injected faults surface as Enigma2Error, only on the chosen path """
+        device = enigma2.api.Enigma2Connection(url=self.box.url, timeout=0.2)
+        self.box.inject_fault(FAULT_UNAUTHORIZED, path='/api/about')
+        with self.assertRaises(Enigma2Error) as context:
+            device.get_about()
+        self.assertIn('Authentication', context.exception.message)
+        self.assertFalse(device.is_box_in_standby())
+
+        self.box.clear_faults()
+        self.box.inject_fault(FAULT_DROP)
+        self.assertRaises(Enigma2Error, device.refresh_status_info)
+
+        self.box.clear_faults()
+        self.box.inject_fault(FAULT_SLOW, delay=0.5)
+        self.assertRaises(Enigma2Error, device.refresh_status_info)
+
+        self.box.clear_faults()
+        self.assertFalse(device.is_box_in_standby())
+
+    def test_credentials(self):
+        """ A box with credentials rejects requests without them """
+        with OpenWebIfSimulator(num_services=1, num_events=0, username='root', password='pw') as box:
+            self.assertRaises(Enigma2Error, enigma2.api.Enigma2Connection, url=box.url)
+            device = enigma2.api.Enigma2Connection(url=box.url, username='root', password='pw')
+            self.assertFalse(device.is_box_in_standby())
+
+
+class TestSimulatorFleet(unittest.TestCase):
+    """ Many simulated boxes with independent state """
+
+    def test_independent_state(self):
+        """ Commands to one box don't change another, faulty boxes fail alone """
+        with SimulatorFleet(6) as boxes, Enigma2Fleet() as fleet:
+            self.assertEqual(len(set(box.port for box in boxes.boxes.values())), 6)
+            failing = boxes.inject_fault(FAULT_ERROR, fraction=0.5, path='/api/statusinfo')
+
+            results = list(fleet.connect(boxes.connection_kwargs(lazy=True)))
+            self.assertEqual(len(results), 6)
+            fleet.connections['box5'].toggle_standby()
+
+            statuses = fleet.call_all('refresh_status_info')
+            self.assertEqual(set(name for name, result in statuses.items() if result.error), set(failing))
+            self.assertTrue(boxes['box5'].in_standby)
+            for name in set(boxes.boxes) - set(failing) - {'box5'}:
+                self.assertFalse(boxes[name].in_standby)
+                self.assertFalse(statuses[name].result['inStandby'])
@@ -0,0 +1,172 @@
+"""
+tests.test_timers
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the timer API and the local timer index
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import random
+import unittest
+import requests_mock
+from tests.sample_responses import SAMPLE_EMPTY_TIMER_LIST
+
+import enigma2.api
+from enigma2.error import Enigma2TimerConflictError
+from enigma2.simulator import OpenWebIfSimulator
+from enigma2.timers import (Timer, TimerIndex, OUTCOME_ADDED, OUTCOME_CONFLICT, OUTCOME_DUPLICATE,
+                            OUTCOME_FAILED)
+
+REF_A = '1:0:1:2756:7FC:2:11A0000:0:0:0:'
+REF_B = '1:0:1:2757:7FC:2:11A0000:0:0:0:'
+
+
+def _timer(service_ref, begin, end, disabled=False, justplay=False):
+    return Timer(service_ref, '', 'Show', '', begin, end, 0, disabled, justplay)
+
+
+class TestTimerIndex(unittest.TestCase):
+    """ Tests enigma2.timers.TimerIndex """
+
+    def test_overlaps_and_conflicts(self):
+        """ Overlapping timers are found, disabled and zap timers hold no tuner """
+        index = TimerIndex([_timer(REF_A, 100, 200), _timer(REF_B, 150, 300),
+                            _timer(REF_B, 400, 500, disabled=True), _timer(REF_A, 450, 460, justplay=True)],
+                           tuners=2)
+        self.assertEqual([(100, 200), (150, 300)], [(t.begin, t.end) for t in index.overlapping(120, 160)])
+        self.assertEqual([REF_B], [t.service_ref for t in index.overlapping(120, 160, REF_B)])
+        self.assertEqual([], index.overlapping(300, 400))
+        self.assertEqual(2, index.max_concurrent(0, 1000))
+        self.assertEqual(1, index.max_concurrent(200, 300))
+        self.assertEqual(0, index.max_concurrent(400, 500))
+        self.assertTrue(index.has_conflict(160, 170))
+        self.assertEqual(2, len(index.conflicts(160, 170)))
+        self.assertEqual([], index.conflicts(200, 250))
+
+        index.remove(REF_A, 100, 200)
+        self.assertFalse(index.has_conflict(160, 170))
+        index.add(_timer(REF_B, 400, 500))
+        self.assertEqual(1, index.max_concurrent(0, 1000))
+        self.assertEqual(3, len(index))
+
+    def test_matches_brute_force(self):
+        """ Range maximum queries agree with counting every second """
+        rand = random.Random(1)
+        timers = []
+        for number in range(60):
+            begin = rand.randrange(0, 1000)
+            timers.append(_timer('1:0:1:%X:' % number, begin, begin + rand.randrange(1, 120)))
+        index = TimerIndex(timers, tuners=3)
+        for _ in range(200):
+            begin = rand.randrange(-50, 1100)
+            end = begin + rand.randrange(1, 200)
+            expected = max(sum(1 for t in timers if t.begin <= second < t.end) for second in range(begin, end))
+            self.assertEqual(expected, index.max_concurrent(begin, end))
+            self.assertEqual(sorted(t.key for t in timers if t.begin < end and t.end > begin),
+                             sorted(t.key for t in index.overlapping(begin, end)))
+
+
+    def test_updates_match_brute_force(self):
+        """ Adding and removing timers one at a time keeps every query right """
+        rand = random.Random(2)
+        index = TimerIndex(tuners=2)
+        live = {}
+        # One very long timer must not slow down or upset the other queries
+        index.add(_timer('1:0:1:FFFF:', -100000, 100000, disabled=True))
+        live[('1:0:1:FFFF:', -100000, 100000)] = _timer('1:0:1:FFFF:', -100000, 100000, disabled=True)
+        for number in range(300):
+            if live and rand.random() < 0.3:
+                key = rand.choice(sorted(live))
+                self.assertEqual(live.pop(key), index.remove(*key))
+            else:
+                begin = rand.randrange(0, 1000)
+                timer = _timer('1:0:1:%X:' % rand.randrange(10), begin, begin + rand.randrange(0, 120),
+                               disabled=rand.random() < 0.1, justplay=rand.random() < 0.1)
+                index.add(timer)
+                live[timer.key] = timer
+            begin = rand.randrange(-50, 1100)
+            end = begin + rand.randrange(1, 200)
+            recording = [t for t in live.values() if t.uses_tuner]
+            expected = max(sum(1 for t in recording if t.begin <= second < t.end) for second in range(begin, end))
+            self.assertEqual(expected, index.max_concurrent(begin, end))
+            self.assertEqual(sorted(t.key for t in live.values() if t.begin < end and t.end > begin),
+                             sorted(t.key for t in index.overlapping(begin, end)))
+        self.assertEqual(sorted((t.begin, t.end) for t in live.values()), [(t.begin, t.end) for t in index])
+
+
+class TestTimerApi(unittest.TestCase):
+    """ Timer commands against a simulated box """
+
+    def setUp(self):
+        self.box = OpenWebIfSimulator(num_services=5, num_events=0, tuners=1).start()
+        self.device = enigma2.api.Enigma2Connection(url=self.box.url, lazy=True)
+
+    def tearDown(self):
+        self.box.stop()
+
+    @requests_mock.mock()
+    def test_empty_timer_list(self, m):
+        """ Parsing the sample timer list """
+        m.register_uri('GET', '/api/timerlist', json=SAMPLE_EMPTY_TIMER_LIST, status_code=200)
+        device = enigma2.api.Enigma2Connection(host='123.123.123.123', lazy=True)
+        self.assertEqual([], device.get_timers())
+        self.assertEqual(0, len(device.load_timers(tuners=2)))
+
+    def test_add_toggle_delete(self):
+        """ Timers round trip through the box and the local index """
+        ref = self.box.services[0][0]
+        self.assertTrue(self.device.add_timer(ref, 1000, 2000, 'News', eit=7))
+        index = self.device.load_timers()
+        self.assertEqual(1, index.tuners)
+        timer = self.device.get_timers()[0]
+        self.assertEqual((ref, 1000, 2000, 'News', 7, False), (timer.service_ref, timer.begin, timer.end,
+                                                               timer.name, timer.eit, timer.disabled))
+
+        with self.assertRaises(Enigma2TimerConflictError) as context:
+            self.device.add_timer(self.box.services[1][0], 1500, 2500, 'Film')
+        self.assertEqual([timer.key], [t.key for t in context.exception.conflicts])
+        self.assertEqual(1, len(self.box.timers))
+        # Without the local check the box refuses it
+        self.assertFalse(self.device.add_timer(self.box.services[1][0], 1500, 2500, 'Film',
+                                               check_conflicts=False))
+
+        self.assertTrue(self.device.toggle_timer(ref, 1000, 2000))
+        self.assertTrue(index.get(ref, 1000, 2000).disabled)
+        self.assertEqual([], self.device.find_timer_conflicts(1500, 2500))
+        self.assertTrue(self.device.add_timer(self.box.services[1][0], 1500, 2500, 'Film'))
+        self.assertEqual(2, len(index))
+
+        self.assertTrue(self.device.delete_timer(ref, 1000, 2000))
+        self.assertFalse(self.device.delete_timer(ref, 1000, 2000))
+        self.assertEqual([(1500, 2500)], [(t.begin, t.end) for t in index])
+        self.assertEqual([(1500, 2500)], [(t.begin, t.end) for t in self.device.get_timers()])
+
+    def test_add_timers_from_epg(self):
+        """ A series becomes timers, skipping duplicates and conflicts """
+        def event(number, service, begin):
+            return {'id': number, 'sref': self.box.services[service][0], 'sname': 'Channel %d' % service,
+                    'title': 'Episode %d' % number, 'shortdesc': '', 'begin_timestamp': begin,
+                    'duration_sec': 1800}
+
+        self.assertTrue(self.device.add_timer(self.box.services[2][0], 9000, 9900, 'Existing', eit=5))
+        series = [event(1, 0, 1000), event(2, 0, 5000), event(1, 0, 1000), event(3, 1, 1500),
+                  event(4, 0, 20000), event(5, 2, 9000), event(6, 3, 30000)]
+        # The box has a timer the client doesn't know about yet
+        self.box.timers.append({'serviceref': self.box.services[3][0], 'begin': 29000, 'end': 40000,
+                                'name': 'Hidden', 'disabled': 0, 'justplay': 0, 'eit': 0})
+        outcomes = self.device.add_timers_from_epg(series, margin_before=60, margin_after=120, rate=50)
+        self.assertEqual([OUTCOME_ADDED, OUTCOME_ADDED, OUTCOME_DUPLICATE, OUTCOME_CONFLICT,
+                          OUTCOME_ADDED, OUTCOME_DUPLICATE, OUTCOME_DUPLICATE],
+                         [outcome.status for outcome in outcomes])
+        self.assertEqual((940, 2920), (outcomes[0].timer.begin, outcomes[0].timer.end))
+        self.assertIn('Episode 1', outcomes[3].message)
+        self.assertEqual(5, len(self.box.timers))
+
+        # Added behind the client's back, so only the box can refuse the clash
+        self.box.timers.append({'serviceref': self.box.services[4][0], 'begin': 50000, 'end': 60000,
+                                'name': 'Hidden', 'disabled': 0, 'justplay': 0, 'eit': 0})
+        outcomes = self.device.add_timers_from_epg([event(8, 0, 40000), event(9, 1, 51000)], rate=None)
+        self.assertEqual([OUTCOME_ADDED, OUTCOME_FAILED], [outcome.status for outcome in outcomes])
+        self.assertIn('Conflicting', outcomes[1].message)
+        self.assertNotIn(outcomes[1].timer.key, self.device.timers)
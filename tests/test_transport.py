@@ -0,0 +1,136 @@
+"""
+tests.test_transport
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the transports against a local http server
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+# pylint: disable=protected-access
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tests.sample_responses import SAMPLE_STATUS_INFO
+
+import enigma2.api
+from enigma2.error import Enigma2Error
+
+with open(os.path.join(os.path.dirname(__file__), 'getallservices.json'), 'rb') as _json_file:
+    ALL_SERVICES = _json_file.read()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """ Serves a few OpenWebIf urls """
+
+    protocol_version = 'HTTP/1.1'
+    seen = []
+
+    def _send(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.seen.append((self.path, self.headers.get('Authorization')))
+        if self.path.startswith('/api/statusinfo'):
+            self._send(200, json.dumps(SAMPLE_STATUS_INFO).encode('utf-8'))
+        elif self.path.startswith('/api/getallservices'):
+            self._send(200, ALL_SERVICES)
+        elif self.path.startswith('/api/about'):
+            self._send(401)
+        elif self.path.startswith('/api/epgmulti'):
+            # Headers and part of the body, then nothing more
+            self.send_response(200)
+            self.send_header('Content-Length', '1000')
+            self.end_headers()
+            self.wfile.write(b'{"events": [')
+            self.wfile.flush()
+            time.sleep(0.5)
+        else:
+            self._send(404)
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        self._send(200 if self.path == '/picon/itv2.png' else 404)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class TestTransport(unittest.TestCase):
+    """ Tests enigma2.transport module. """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        cls.port = cls.server.server_address[1]
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def _check_transport(self, transport):
+        del Handler.seen[:]
+        device = enigma2.api.Enigma2Connection(host='127.0.0.1', port=self.port, username='user',
+                                               password='pass', transport=transport)
+        other = enigma2.api.Enigma2Connection(host='127.0.0.1', port=self.port, transport=transport, lazy=True)
+
+        self.assertEqual('ITV2', device.get_status_info()['currservice_station'])
+        self.assertEqual(10, len(device.load_services(bouquet_name='Children')))
+        self.assertEqual('http://127.0.0.1:%d/picon/itv2.png' % self.port, device.get_current_playing_picon_url())
+        self.assertIsNone(device.get_current_playing_picon_url(channel_name='Missing'))
+        self.assertRaises(Enigma2Error, device.get_about)
+        self.assertRaises(Enigma2Error, device.search_epg, 'x')
+
+        # Only the connection with credentials sends them
+        self.assertTrue(all(auth is not None for _, auth in Handler.seen))
+        other.get_status_info()
+        self.assertIsNone(Handler.seen[-1][1])
+        return device, other
+
+    def test_requests_transport(self):
+        """Test the requests transport shares a session per host"""
+        device, other = self._check_transport('requests')
+        self.assertIs(device._transport.session, other._transport.session)
+
+    def test_urllib3_transport(self):
+        """Test the urllib3 transport shares a pool per host"""
+        device, other = self._check_transport('urllib3')
+        self.assertIs(device._transport.pool, other._transport.pool)
+
+    def test_pool_settings_not_shared(self):
+        """Test clients with different ssl or pool settings get their own pool"""
+        url = 'https://127.0.0.1:%d' % self.port
+        insecure = enigma2.api.Enigma2Connection(url=url, verify_ssl=False, transport='urllib3', lazy=True)
+        secure = enigma2.api.Enigma2Connection(url=url, verify_ssl=True, transport='urllib3', lazy=True)
+        self.assertIsNot(insecure._transport.pool, secure._transport.pool)
+        self.assertEqual('CERT_NONE', insecure._transport.pool.cert_reqs)
+        self.assertNotEqual('CERT_NONE', secure._transport.pool.cert_reqs)
+
+        larger = enigma2.api.Enigma2Connection(url=url, verify_ssl=True, transport='urllib3',
+                                               pool_size=20, lazy=True)
+        self.assertIsNot(secure._transport.pool, larger._transport.pool)
+        self.assertEqual(20, larger._transport.pool.pool.maxsize)
+        self.assertIs(secure._transport.pool, enigma2.api.Enigma2Connection(
+            url=url, transport='urllib3', lazy=True)._transport.pool)
+
+    def test_timeout_reading_body(self):
+        """Test a box which stalls part way through a streamed body raises Enigma2Error"""
+        for transport in ('requests', 'urllib3'):
+            device = enigma2.api.Enigma2Connection(host='127.0.0.1', port=self.port, transport=transport,
+                                                   timeout=0.2, lazy=True)
+            self.assertRaises(Enigma2Error, list, device.iter_epg(bouquet_ref='x'))
+
+    def test_unreachable(self):
+        """Test connection failures are reported as Enigma2Error"""
+        for transport in ('requests', 'urllib3'):
+            self.assertRaises(Enigma2Error, enigma2.api.Enigma2Connection,
+                              host='127.0.0.1', port=1, transport=transport, timeout=1)
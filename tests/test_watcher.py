@@ -0,0 +1,95 @@
+"""
+tests.test_watcher
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Tests the status watcher
+
+Copyright (c) 2018 Ronan Murray <https://github.com/ronanmu>
+Licensed under the MIT license.
+"""
+import asyncio
+import unittest
+from tests.sample_responses import SAMPLE_STATUS_INFO, SAMPLE_STANDBY_STATUS_INFO
+
+from enigma2.error import Enigma2Error
+from enigma2.watcher import StatusWatcher, AsyncStatusWatcher
+
+
+class FakeClock(object):
+    """ A clock which only moves when slept on """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeBox(object):
+    """ Returns a scripted sequence of statuses """
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.last_command_time = None
+
+    def refresh_status_info(self):
+        status = self.statuses.pop(0)
+        if isinstance(status, Exception):
+            raise status
+        return status
+
+
+class TestWatcher(unittest.TestCase):
+    """ Tests enigma2.watcher module. """
+
+    def test_changes(self):
+        """Test changes are yielded and polling adapts to standby"""
+        louder = dict(SAMPLE_STATUS_INFO, volume=60)
+        box = FakeBox([SAMPLE_STATUS_INFO, SAMPLE_STATUS_INFO, louder, Enigma2Error('down'),
+                       SAMPLE_STANDBY_STATUS_INFO])
+        clock = FakeClock()
+        watcher = StatusWatcher(box, sleep=clock.sleep, clock=clock,
+                                active_interval=2, standby_interval=30, boost_interval=0.5)
+        changes = watcher.watch()
+
+        change = next(changes)
+        self.assertEqual(('volume', 52, 60), change[:3])
+        self.assertEqual(4.0, clock.now)
+
+        fields = {change.field: change.new for change in [next(changes) for _ in range(3)]}
+        self.assertEqual({'currservice_serviceref': None, 'inStandby': 'true', 'volume': 50}, fields)
+        # Active interval, then the failed poll backed off
+        self.assertEqual(36.0, clock.now)
+        self.assertEqual(30, watcher.next_interval())
+
+    def test_boost_after_command(self):
+        """Test polling speeds up after a command"""
+        clock = FakeClock()
+        box = FakeBox([SAMPLE_STANDBY_STATUS_INFO])
+        watcher = StatusWatcher(box, sleep=clock.sleep, clock=clock)
+        watcher.poll()
+        self.assertEqual(30, watcher.next_interval())
+
+        box.last_command_time = clock.now
+        self.assertEqual(0.5, watcher.next_interval())
+        clock.now += 11
+        self.assertEqual(30, watcher.next_interval())
+
+    def test_async(self):
+        """Test the async iterator"""
+        class AsyncBox(FakeBox):
+            async def refresh_status_info(self):  # pylint: disable=invalid-overridden-method
+                return FakeBox.refresh_status_info(self)
+
+        async def run():
+            box = AsyncBox([SAMPLE_STATUS_INFO, dict(SAMPLE_STATUS_INFO, muted=False)])
+            async for change in AsyncStatusWatcher(box, active_interval=0.01):
+                return change
+
+        change = asyncio.run(run())
+        self.assertEqual(('muted', True, False), change[:3])